@@ -0,0 +1,585 @@
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+import numpy as np
+
+from vector_search import VectorIndex, normalize_rows, top_k_indices
+
+ANN_FORMAT_VERSION = 1
+# Inverted lists (0 picks ~4 * sqrt(n)), lists scanned per query, PQ
+# sub-vectors per embedding and courses sampled to train the quantizers
+ANN_NLIST = int(os.getenv('ANN_NLIST', 0))
+ANN_NPROBE = int(os.getenv('ANN_NPROBE', 16))
+ANN_PQ_SUBVECTORS = int(os.getenv('ANN_PQ_SUBVECTORS', 64))
+ANN_TRAIN_SAMPLE = int(os.getenv('ANN_TRAIN_SAMPLE', 50000))
+# Candidates per requested result re-scored with the full vectors (0: PQ scores only)
+ANN_REFINE = int(os.getenv('ANN_REFINE', 4))
+ANN_INDEX_PATH = os.getenv(
+    'ANN_INDEX_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'ann')
+)
+# Share of courses new or changed since the index was trained above which a
+# load retrains instead of re-encoding them against the old quantizers
+ANN_RETRAIN_STALE_FRACTION = float(os.getenv('ANN_RETRAIN_STALE_FRACTION', 0.5))
+# Rows scored per block during k-means assignment
+ASSIGN_CHUNK_ROWS = 16384
+
+
+def assign_nearest(data, centroids):
+    """Index of the nearest centroid (squared L2) for every row of data"""
+    centroid_norms = (centroids ** 2).sum(axis=1)
+    assignments = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), ASSIGN_CHUNK_ROWS):
+        block = data[start:start + ASSIGN_CHUNK_ROWS]
+        # ||x||^2 is the same for every centroid, so it can be left out
+        distances = centroid_norms - 2.0 * (block @ centroids.T)
+        assignments[start:start + ASSIGN_CHUNK_ROWS] = distances.argmin(axis=1)
+    return assignments
+
+
+def kmeans(data, k, iterations=20, seed=0):
+    """
+    Lloyd's k-means on float32 rows
+    Returns:
+        (k, dimension) centroids; empty clusters are re-seeded from random rows
+    """
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_nearest(data, centroids)
+        order = np.argsort(assignments, kind='stable')
+        counts = np.bincount(assignments, minlength=k)
+        filled = np.flatnonzero(counts)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[filled]
+        centroids[filled] = np.add.reduceat(data[order], starts, axis=0) / counts[filled, None]
+        empty = np.flatnonzero(counts == 0)
+        if empty.size:
+            centroids[empty] = data[rng.choice(len(data), empty.size, replace=False)]
+    return centroids
+
+
+def vector_fingerprints(matrix):
+    """64-bit digest per row, to spot courses whose embedding changed"""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    return np.array([
+        int.from_bytes(hashlib.blake2b(row.tobytes(), digest_size=8).digest(), 'little')
+        for row in matrix
+    ], dtype=np.uint64)
+
+
+def pick_subvectors(dimension, requested=ANN_PQ_SUBVECTORS):
+    """Largest sub-vector count up to `requested` that divides the dimension"""
+    for m in range(min(requested, dimension), 0, -1):
+        if dimension % m == 0:
+            return m
+    return 1
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product quantization over unit-length vectors.
+
+    A coarse k-means quantizer splits the vectors into `nlist` lists. Each
+    vector's residual from its list centroid is compressed to `m` one-byte
+    codes, one per sub-vector, against per-sub-space codebooks. A query scans
+    the `nprobe` closest lists and scores their codes with lookup tables, so
+    each course costs m bytes instead of 4 * dimension.
+
+    Rows are identified by key (course code) so the index can be updated in
+    place: changed vectors are re-encoded, new ones appended and removed ones
+    tombstoned, all without retraining.
+    """
+
+    def __init__(self, dimension, nlist, m, ksub=256, nprobe=ANN_NPROBE, model=None):
+        self.dimension = dimension
+        # Embedding model the quantizers were trained on (None if unknown)
+        self.model = model
+        self.nlist = nlist
+        self.m = m
+        self.dsub = dimension // m
+        self.ksub = ksub
+        self.nprobe = nprobe
+        self.centroids = None
+        self.codebooks = None
+        self.keys = []
+        self.positions = {}
+        self.assignments = np.zeros(0, dtype=np.int32)
+        self.codes = np.zeros((0, m), dtype=np.uint8)
+        self.fingerprints = np.zeros(0, dtype=np.uint64)
+        self.deleted = np.zeros(0, dtype=bool)
+        self._lists = None
+
+    def __len__(self):
+        return int((~self.deleted).sum())
+
+    @classmethod
+    def train(cls, vectors, nlist=ANN_NLIST, m=ANN_PQ_SUBVECTORS, nprobe=ANN_NPROBE,
+              sample=ANN_TRAIN_SAMPLE, iterations=20, seed=0):
+        """
+        Fit the coarse quantizer and PQ codebooks on a sample of the vectors
+        Args:
+            vectors: (n, dimension) embeddings; they are normalized here
+            nlist: number of inverted lists, 0 for ~4 * sqrt(n)
+            m: requested sub-vectors per embedding (must divide the dimension)
+            nprobe: default lists scanned per query
+            sample: maximum vectors used for training
+        Returns:
+            Trained, empty IVFPQIndex
+        """
+        vectors = normalize_rows(vectors)
+        n, dimension = vectors.shape
+        rng = np.random.default_rng(seed)
+        if n > sample:
+            vectors = vectors[rng.choice(n, sample, replace=False)]
+        nlist = nlist or int(4 * np.sqrt(n))
+        nlist = max(1, min(nlist, len(vectors)))
+        index = cls(dimension, nlist, pick_subvectors(dimension, m),
+                    ksub=min(256, len(vectors)), nprobe=nprobe)
+
+        index.centroids = kmeans(vectors, nlist, iterations=iterations, seed=seed)
+        residuals = vectors - index.centroids[assign_nearest(vectors, index.centroids)]
+        index.codebooks = np.stack([
+            kmeans(residuals[:, j * index.dsub:(j + 1) * index.dsub], index.ksub,
+                   iterations=iterations, seed=seed + j + 1)
+            for j in range(index.m)
+        ])
+        return index
+
+    def _encode(self, vectors):
+        assignments = assign_nearest(vectors, self.centroids)
+        residuals = vectors - self.centroids[assignments]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = assign_nearest(residuals[:, j * self.dsub:(j + 1) * self.dsub], self.codebooks[j])
+        return assignments.astype(np.int32), codes
+
+    def upsert(self, keys, vectors):
+        """
+        Insert or re-encode vectors by key
+        Returns:
+            (number added, number updated)
+        """
+        vectors = normalize_rows(vectors)
+        if not len(keys):
+            return 0, 0
+        assignments, codes = self._encode(vectors)
+        fingerprints = vector_fingerprints(vectors)
+        existing = np.array([self.positions.get(key, -1) for key in keys], dtype=np.int64)
+        update = existing >= 0
+
+        rows = existing[update]
+        self.assignments[rows] = assignments[update]
+        self.codes[rows] = codes[update]
+        self.fingerprints[rows] = fingerprints[update]
+        self.deleted[rows] = False
+
+        new = np.flatnonzero(~update)
+        for i in new:
+            self.positions[keys[i]] = len(self.keys)
+            self.keys.append(keys[i])
+        self.assignments = np.concatenate([self.assignments, assignments[new]])
+        self.codes = np.concatenate([self.codes, codes[new]])
+        self.fingerprints = np.concatenate([self.fingerprints, fingerprints[new]])
+        self.deleted = np.concatenate([self.deleted, np.zeros(new.size, dtype=bool)])
+        self._lists = None
+        return int(new.size), int(rows.size)
+
+    def remove(self, keys):
+        rows = [self.positions[key] for key in keys if key in self.positions]
+        self.deleted[rows] = True
+        self._lists = None
+        return len(rows)
+
+    def sync(self, catalog, stale=None):
+        """
+        Bring the index in line with a catalog: add new courses, re-encode
+        courses whose vector changed and drop courses no longer present
+        Args:
+            catalog: CourseCatalog to match
+            stale: stale_rows(catalog) if already computed
+        Returns:
+            Dict with added, updated and removed counts
+        """
+        matrix = normalize_rows(catalog.embeddings)
+        if stale is None:
+            stale = self.stale_rows(catalog, matrix)
+        added, updated = self.upsert([catalog.codes[i] for i in stale], matrix[stale])
+        current = set(catalog.codes)
+        removed = self.remove([
+            key for key, row in self.positions.items()
+            if key not in current and not self.deleted[row]
+        ])
+        return {'added': added, 'updated': updated, 'removed': removed}
+
+    def stale_rows(self, catalog, matrix=None):
+        """Catalog rows that are new to the index or whose vector changed"""
+        if matrix is None:
+            matrix = normalize_rows(catalog.embeddings)
+        fingerprints = vector_fingerprints(matrix)
+        return [
+            i for i, code in enumerate(catalog.codes)
+            if code not in self.positions
+            or self.deleted[self.positions[code]]
+            or self.fingerprints[self.positions[code]] != fingerprints[i]
+        ]
+
+    def _inverted_lists(self):
+        """CSR view of the live rows grouped by list: (offsets, rows)"""
+        if self._lists is None:
+            live = np.flatnonzero(~self.deleted)
+            order = live[np.argsort(self.assignments[live], kind='stable')]
+            offsets = np.zeros(self.nlist + 1, dtype=np.int64)
+            np.cumsum(np.bincount(self.assignments[live], minlength=self.nlist), out=offsets[1:])
+            self._lists = (offsets, order)
+        return self._lists
+
+    def search(self, query_vector, top_k=10, nprobe=None, allowed=None):
+        """
+        Approximate top-k by inner product
+        Args:
+            query_vector: query embedding; normalized here
+            top_k: number of rows to return
+            nprobe: lists to scan (default: the index's nprobe)
+            allowed: optional boolean array over index rows eligible for results
+        Returns:
+            (rows, approximate cosine scores), best first
+        """
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        offsets, order = self._inverted_lists()
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_scores = self.centroids @ query
+        probed = top_k_indices(centroid_scores, nprobe)
+
+        rows = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in probed])
+        if allowed is not None:
+            rows = rows[allowed[rows]]
+        if rows.size == 0:
+            return rows, np.zeros(0, dtype=np.float32)
+
+        # Inner product with a residual-coded vector: q.c + sum_j q_j.codebook_j[code_j]
+        tables = np.einsum('mkd,md->mk', self.codebooks, query.reshape(self.m, self.dsub))
+        scores = centroid_scores[self.assignments[rows]]
+        scores = scores + tables[np.arange(self.m), self.codes[rows]].sum(axis=1)
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    def memory_bytes(self):
+        """Bytes held for codes, assignments and quantizers"""
+        return int(
+            self.codes.nbytes + self.assignments.nbytes + self.fingerprints.nbytes
+            + self.centroids.nbytes + self.codebooks.nbytes
+        )
+
+    def save(self, path=ANN_INDEX_PATH):
+        """Write the index as a directory of .npy arrays, replacing it atomically"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for name in ('centroids', 'codebooks', 'assignments', 'codes', 'fingerprints', 'deleted'):
+            np.save(os.path.join(tmp_path, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(tmp_path, 'keys.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.keys, f, ensure_ascii=False)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'formatVersion': ANN_FORMAT_VERSION,
+                'createdAt': time.time(),
+                'dimension': self.dimension,
+                'nlist': self.nlist,
+                'm': self.m,
+                'ksub': self.ksub,
+                'nprobe': self.nprobe,
+                'model': self.model,
+                'count': len(self),
+            }, f, indent=2)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path=ANN_INDEX_PATH):
+        with open(os.path.join(path, 'manifest.json'), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('formatVersion') != ANN_FORMAT_VERSION:
+            raise ValueError(
+                f"ANN index {path} has format version {manifest.get('formatVersion')}, "
+                f"expected {ANN_FORMAT_VERSION}"
+            )
+        index = cls(manifest['dimension'], manifest['nlist'], manifest['m'],
+                    ksub=manifest['ksub'], nprobe=manifest['nprobe'], model=manifest.get('model'))
+        for name in ('centroids', 'codebooks', 'assignments', 'codes', 'fingerprints', 'deleted'):
+            setattr(index, name, np.load(os.path.join(path, f"{name}.npy")))
+        with open(os.path.join(path, 'keys.json'), encoding='utf-8') as f:
+            index.keys = json.load(f)
+        index.positions = {key: row for row, key in enumerate(index.keys)}
+        return index
+
+
+class ANNVectorIndex:
+    """
+    Search interface of VectorIndex backed by an IVFPQIndex, so CourseQuery
+    can swap it in as its vector_index. With refine > 0 the top
+    top_k * refine PQ candidates are re-scored against the catalog's full
+    vectors, recovering most of the ranking quality lost to quantization.
+    Scores use the same (1 + cosine) / 2 scale as VectorIndex.
+    """
+
+    def __init__(self, catalog, index, nprobe=None, refine=ANN_REFINE):
+        self.catalog = catalog
+        self.index = index
+        self.nprobe = nprobe or index.nprobe
+        self.refine = refine if catalog.embeddings is not None else 0
+        # Catalog row of each index row, -1 where the course is not in the catalog
+        self.catalog_rows = np.array(
+            [-1 if catalog.index_of(key) is None else catalog.index_of(key) for key in index.keys],
+            dtype=np.int64
+        )
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def search_rows(self, query_vector, top_k=2, mask=None):
+        """Catalog rows and cosine scores of the approximate top_k, best first"""
+        allowed = self.catalog_rows >= 0
+        if mask is not None:
+            allowed &= np.asarray(mask)[np.maximum(self.catalog_rows, 0)]
+        depth = top_k * self.refine if self.refine else top_k
+        nprobe = self.nprobe
+        rows, scores = self.index.search(query_vector, top_k=depth, nprobe=nprobe, allowed=allowed)
+        if mask is not None and rows.size < depth:
+            # A selective filter can leave too few matches in the probed lists:
+            # probe more lists until enough match or every list is scanned
+            matching = int(allowed.sum())
+            while rows.size < min(depth, matching) and nprobe < self.index.nlist:
+                nprobe = min(nprobe * 4, self.index.nlist)
+                rows, scores = self.index.search(query_vector, top_k=depth, nprobe=nprobe, allowed=allowed)
+        rows = self.catalog_rows[rows]
+        if self.refine and rows.size:
+            # Sorted rows read a memory-mapped snapshot front to back
+            rows = np.sort(rows)
+            query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+            scores = normalize_rows(self.catalog.embeddings[rows]) @ query
+            best = top_k_indices(scores, top_k)
+            rows, scores = rows[best], scores[best]
+        return rows, np.minimum(scores, 1.0)
+
+    def search(self, query_vector, top_k=2, mask=None):
+        rows, scores = self.search_rows(query_vector, top_k=top_k, mask=mask)
+        results = []
+        for row, score in zip(rows, scores):
+            result = {'score': float((1.0 + score) / 2.0)}
+            result.update(self.catalog.record(int(row)))
+            results.append(result)
+        return results
+
+    def search_batch(self, query_vectors, top_k=2, mask=None):
+        return [self.search(query_vector, top_k=top_k, mask=mask) for query_vector in query_vectors]
+
+
+def retrain_reason(index, catalog, model=None, max_stale=ANN_RETRAIN_STALE_FRACTION, stale=None):
+    """
+    Why a saved index no longer fits a catalog and must be retrained, or
+    None if it can be updated in place. Quantizers trained on another
+    embedding space cannot encode the new vectors faithfully.
+    Args:
+        index: IVFPQIndex loaded from disk
+        catalog: CourseCatalog to search
+        model: embedding model name of the catalog vectors (None skips the check)
+        max_stale: share of new or changed courses above which to retrain
+        stale: index.stale_rows(catalog) if already computed
+    """
+    dimension = catalog.embeddings.shape[1]
+    if index.dimension != dimension:
+        return f"dimension changed from {index.dimension} to {dimension}"
+    if model is not None and index.model != model:
+        return f"embedding model changed from {index.model} to {model}"
+    if stale is None:
+        stale = index.stale_rows(catalog)
+    if len(catalog) and len(stale) > max_stale * len(catalog):
+        return f"{len(stale)} of {len(catalog)} courses are new or changed"
+    return None
+
+
+def load_ann_index(catalog, path=ANN_INDEX_PATH, nprobe=None, model=None, save=False):
+    """
+    Open the saved ANN index for a catalog, training one if there is none.
+    Courses added, changed or removed since it was saved are applied
+    incrementally; an index trained on another embedding model or dimension,
+    or on mostly outdated vectors, is retrained. Changes stay in memory unless
+    save is set: app processes share the saved index and only the
+    `ann_index.py build` command should write it.
+    """
+    index = None
+    if os.path.exists(path):
+        index = IVFPQIndex.load(path)
+        # Fingerprinting every vector is the costly part, so it is done once
+        stale = None
+        if index.dimension == catalog.embeddings.shape[1]:
+            stale = index.stale_rows(catalog)
+        reason = retrain_reason(index, catalog, model=model, stale=stale)
+        if reason:
+            print(f"Retraining ANN index: {reason}")
+            index = None
+        else:
+            changes = index.sync(catalog, stale=stale)
+            if any(changes.values()):
+                print(f"Updated ANN index: {changes}")
+                if save:
+                    index.save(path)
+    if index is None:
+        start = time.perf_counter()
+        index = build_ann_index(catalog, model=model)
+        print(f"Built ANN index over {len(index)} courses in {time.perf_counter() - start:.1f}s")
+        if save:
+            index.save(path)
+        else:
+            print(f"Run 'python ann_index.py build' to save it to {path} for the next start")
+    return ANNVectorIndex(catalog, index, nprobe=nprobe)
+
+
+def build_ann_index(catalog, nlist=ANN_NLIST, m=ANN_PQ_SUBVECTORS, nprobe=ANN_NPROBE,
+                    sample=ANN_TRAIN_SAMPLE, model=None):
+    """Train an IVFPQIndex on the catalog embeddings and add every course"""
+    index = IVFPQIndex.train(catalog.embeddings, nlist=nlist, m=m, nprobe=nprobe, sample=sample)
+    index.model = model
+    index.upsert(catalog.codes, catalog.embeddings)
+    return index
+
+
+def recall_report(catalog, index, nprobes=(1, 2, 4, 8, 16, 32, 64), num_queries=200, top_k=10, seed=0):
+    """
+    Recall@k and latency of the ANN index against exact search, per nprobe.
+    Queries are catalog vectors with Gaussian noise, so no embedding calls
+    are needed.
+    """
+    rng = np.random.default_rng(seed)
+    exact = VectorIndex(catalog)
+    rows = rng.choice(len(catalog), min(num_queries, len(catalog)), replace=False)
+    queries = normalize_rows(
+        exact.matrix[rows] + rng.normal(0, 0.02, (rows.size, exact.matrix.shape[1])).astype(np.float32)
+    )
+
+    exact_latencies, truth = [], []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append(set(top_k_indices(exact._scores(query[None, :])[0], top_k).tolist()))
+        exact_latencies.append(time.perf_counter() - start)
+
+    ann = ANNVectorIndex(catalog, index)
+    report = {
+        'courses': len(catalog),
+        'top_k': top_k,
+        'queries': int(rows.size),
+        'nlist': index.nlist,
+        'm': index.m,
+        'refine': ANN_REFINE,
+        'ann_bytes': index.memory_bytes(),
+        'exact_bytes': int(exact.matrix.nbytes),
+        'exact': {
+            'p50_ms': float(np.percentile(exact_latencies, 50) * 1000),
+            'p95_ms': float(np.percentile(exact_latencies, 95) * 1000),
+        },
+        'ann': [],
+    }
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            continue
+        ann.nprobe = nprobe
+        entry = {'nprobe': nprobe}
+        for label, refine in (('pq', 0), ('refined', ANN_REFINE)):
+            if label == 'refined' and not refine:
+                continue
+            ann.refine = refine
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found, _ = ann.search_rows(query, top_k=top_k)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & set(found.tolist()))
+            entry[label] = {
+                'recall': hits / (len(truth) * min(top_k, len(catalog))),
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p95_ms': float(np.percentile(latencies, 95) * 1000),
+            }
+        report['ann'].append(entry)
+    return report
+
+
+def load_catalog(snapshot_path):
+    """Catalog from the snapshot if there is one, otherwise from Neo4j"""
+    from embedding_snapshot import load_snapshot
+
+    if snapshot_path and os.path.exists(snapshot_path):
+        return load_snapshot(snapshot_path)
+    from catalog import CourseCatalog
+    from db_setup import connect_graph
+
+    return CourseCatalog.from_graph(connect_graph())
+
+
+def main(argv=None):
+    from embedding_providers import create_embeddings, embedding_model_name
+    from embedding_snapshot import SNAPSHOT_PATH
+
+    parser = argparse.ArgumentParser(description="Build and evaluate the approximate course index")
+    parser.add_argument('--path', default=ANN_INDEX_PATH, help="ANN index directory")
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="read vectors from this snapshot if it exists")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="train the index, or update it in place")
+    build_parser.add_argument('--nlist', type=int, default=ANN_NLIST, help="inverted lists (0: ~4*sqrt(n))")
+    build_parser.add_argument('--m', type=int, default=ANN_PQ_SUBVECTORS, help="PQ sub-vectors per embedding")
+    build_parser.add_argument('--nprobe', type=int, default=ANN_NPROBE, help="default lists scanned per query")
+    build_parser.add_argument(
+        '--incremental', action='store_true',
+        help="apply added, changed and removed courses to the existing index without retraining"
+    )
+
+    report_parser = subparsers.add_parser('report', help="recall and latency against exact search")
+    report_parser.add_argument('--nprobe', default='1,2,4,8,16,32,64', help="comma-separated nprobe values")
+    report_parser.add_argument('--queries', type=int, default=200)
+    report_parser.add_argument('--top-k', type=int, default=10)
+
+    args = parser.parse_args(argv)
+    catalog = load_catalog(args.snapshot)
+    # The configured provider's model name tags the index with its embedding space
+    model = embedding_model_name(create_embeddings())
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        index = None
+        if args.incremental and os.path.exists(args.path):
+            index = IVFPQIndex.load(args.path)
+            reason = retrain_reason(index, catalog, model=model)
+            if reason:
+                print(f"Retraining: {reason}")
+                index = None
+            else:
+                print(f"Applied {index.sync(catalog)}")
+        if index is None:
+            index = build_ann_index(catalog, nlist=args.nlist, m=args.m, nprobe=args.nprobe, model=model)
+        index.save(args.path)
+        print(
+            f"Saved ANN index of {len(index)} courses ({index.nlist} lists, {index.m} sub-vectors, "
+            f"{index.memory_bytes() / 1e6:.1f} MB) to {args.path} in {time.perf_counter() - start:.1f}s"
+        )
+        return
+
+    index = load_ann_index(catalog, args.path, model=model, save=True).index
+    report = recall_report(
+        catalog, index,
+        nprobes=[int(value) for value in args.nprobe.split(',') if value.strip()],
+        num_queries=args.queries, top_k=args.top_k
+    )
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,11 @@
+import html
+import os
+import re
+from collections import deque
+
 import streamlit as st
 from query import CourseQuery
-import pandas as pd
+from metrics import METRICS_FILE, METRICS_PORT, registry as metrics, start_http_server
 
 # Page configuration
 st.set_page_config(
@@ -120,14 +125,51 @@ st.markdown("""
         font-size: 1rem;
         line-height: 1.5;
     }
+    
+    .course-prereqs {
+        color: #4a4a4a;
+        font-size: 0.9rem;
+        margin-top: 0.75rem;
+        padding-top: 0.5rem;
+        border-top: 1px solid #e1e4e8;
+    }
 </style>
 """, unsafe_allow_html=True)
 
+# Course properties behind the "Offered in" filter
+TERM_LABELS = {
+    'winterTerm1': "Winter Term 1",
+    'winterTerm2': "Winter Term 2",
+    'summerTerm1': "Summer Term 1",
+    'summerTerm2': "Summer Term 2",
+}
+HONOURS_CHOICES = {"Any": None, "Honours only": True, "Non-honours only": False}
+
+# Searches kept per browser session, how many of the latest are shown in full,
+# and how many older ones each page of the collapsed history shows
+CHAT_HISTORY_MAX_TURNS = int(os.getenv('CHAT_HISTORY_MAX_TURNS', 50))
+CHAT_RECENT_TURNS = int(os.getenv('CHAT_RECENT_TURNS', 3))
+CHAT_PAGE_SIZE = int(os.getenv('CHAT_PAGE_SIZE', 10))
+# Whether "Write an answer" starts ticked (1) or not (0)
+GENERATE_ANSWERS = int(os.getenv('GENERATE_ANSWERS', 0))
+
+@st.cache_resource
+def get_querier():
+    """One CourseQuery per process, shared by every browser session"""
+    return CourseQuery()
+
+@st.cache_resource
+def start_metrics_endpoint():
+    """Start the Prometheus endpoint once per process, if METRICS_PORT is set"""
+    return start_http_server(METRICS_PORT) if METRICS_PORT else None
+
 def initialize_session_state():
-    if 'messages' not in st.session_state:
-        st.session_state.messages = []
+    if 'turns' not in st.session_state:
+        # Oldest searches fall off once a session reaches the cap
+        st.session_state.turns = deque(maxlen=CHAT_HISTORY_MAX_TURNS)
     if 'querier' not in st.session_state:
-        st.session_state.querier = CourseQuery()
+        st.session_state.querier = get_querier()
+    start_metrics_endpoint()
 
 def display_message(message, is_user=False):
     message_class = "user-message" if is_user else "bot-message"
@@ -137,20 +179,137 @@ def display_message(message, is_user=False):
         </div>
     """, unsafe_allow_html=True)
 
-def format_course_result(result):
+def parse_course_codes(text):
+    """Split a comma-separated list of course codes typed by the user"""
+    return [code.strip().upper() for code in text.split(',') if code.strip()]
+
+def prerequisite_info(querier, code, completed):
+    """Prerequisite summary shown on a course card"""
+    info = {
+        'direct': querier.prerequisites(code, transitive=False),
+        'unlocks': len(querier.unlocks(code)),
+    }
+    if completed:
+        info['remaining'] = querier.remaining_prerequisites(code, completed)
+        info['path'] = querier.path_to(code, completed)
+    else:
+        info['remaining'] = querier.prerequisites(code)
+    return info
+
+def format_prerequisite_info(info):
+    lines = [f"<b>Prerequisites:</b> {', '.join(info['direct']) or 'None'}"]
+    if info['remaining']:
+        lines.append(f"<b>Still needed:</b> {', '.join(info['remaining'])}")
+    if len(info.get('path', [])) > 1:
+        lines.append(f"<b>Shortest path:</b> {' → '.join(info['path'])}")
+    if info['unlocks']:
+        lines.append(f"<b>Leads to:</b> {info['unlocks']} courses")
+    return f"<div class='course-prereqs'>{'<br>'.join(lines)}</div>"
+
+def course_details(querier, code):
+    """Name and description of a course from the process-wide catalog"""
+    row = querier.catalog.index_of(code)
+    if row is None:
+        return {'courseCode': code, 'name': '', 'description': "No longer in the course catalog."}
+    return querier.catalog.record(row)
+
+def format_course_result(result, prereq_info=None):
     score = result['score']
     code = result['courseCode']
     name = result['name']
     description = result['description']
+    prereqs = format_prerequisite_info(prereq_info) if prereq_info else ""
     
     return f"""
     <div class="course-card">
         <div class="score-badge">Match: {score:.2f}</div>
         <div class="course-title">{code}: {name}</div>
         <div class="course-description">{description}</div>
+        {prereqs}
     </div>
     """
 
+def make_turn(question, results, completed=(), answer=None):
+    """
+    Chat history entry for one search. Only codes and scores are kept (plus
+    the completed courses searched with and the generated answer, if any);
+    names, descriptions and prerequisites come from the querier's shared
+    catalog and prerequisite graph when the turn is rendered.
+    """
+    return {
+        'question': question,
+        'answer': answer,
+        'completed': list(completed),
+        'results': [
+            {'courseCode': result['courseCode'], 'score': round(float(result['score']), 4)}
+            for result in results
+        ],
+    }
+
+def render_turn(querier, turn):
+    """Show a search and its course cards"""
+    display_message(html.escape(turn['question']), is_user=True)
+    if turn.get('answer'):
+        display_message(html.escape(turn['answer']))
+    response = "<div class='response-container'>"
+    for result in turn['results']:
+        course = course_details(querier, result['courseCode'])
+        course['score'] = result['score']
+        with metrics.timer('app_request_stage_seconds', stage='prerequisites'):
+            info = prerequisite_info(querier, result['courseCode'], turn['completed'])
+        response += format_course_result(course, info)
+    response += "</div>"
+    display_message(response)
+
+def escape_markdown(text):
+    """Backslash-escape Markdown syntax so user text renders literally"""
+    return re.sub(r'([\\`*_{}\[\]()#+\-.!|<>~$])', r'\\\1', str(text))
+
+def render_turn_summary(querier, turn):
+    """One line per course for a collapsed older search"""
+    lines = [f"**{escape_markdown(turn['question'])}**"]
+    for result in turn['results']:
+        course = course_details(querier, result['courseCode'])
+        lines.append(
+            f"- {escape_markdown(course['courseCode'])} {escape_markdown(course['name'])} "
+            f"({result['score']:.2f})"
+        )
+    st.markdown('\n'.join(lines))
+
+def render_history(querier, turns):
+    """
+    Render the latest CHAT_RECENT_TURNS searches in full and one page of the
+    older ones as summaries, so a rerun costs the same however long the
+    session has been running
+    """
+    turns = list(turns)
+    split = max(len(turns) - CHAT_RECENT_TURNS, 0)
+    older, recent = turns[:split], turns[split:]
+    if older:
+        with st.expander(f"Earlier searches ({len(older)})"):
+            pages = (len(older) + CHAT_PAGE_SIZE - 1) // CHAT_PAGE_SIZE
+            page = 1
+            if pages > 1:
+                page = st.number_input("Page", min_value=1, max_value=pages, value=1, key="history_page")
+            # Page 1 holds the most recent of the older searches
+            end = len(older) - (page - 1) * CHAT_PAGE_SIZE
+            for turn in reversed(older[max(end - CHAT_PAGE_SIZE, 0):end]):
+                render_turn_summary(querier, turn)
+    for turn in recent:
+        render_turn(querier, turn)
+
+def build_filters(campuses, years, credits, terms, honours):
+    """Turn the filter widgets' selections into search_courses filters"""
+    filters = {
+        'campus': campuses,
+        'year': years,
+        'credits': credits,
+        'isHonours': HONOURS_CHOICES[honours],
+    }
+    for term in terms:
+        filters[term] = True
+    return {name: value for name, value in filters.items() if value not in (None, [])}
+
 def main():
     initialize_session_state()
     
@@ -174,9 +333,8 @@ def main():
         
         # Chat history container
         chat_container = st.container()
-        with chat_container:
-            for message in st.session_state.messages:
-                display_message(message['content'], message['is_user'])
+        with chat_container, metrics.timer('app_request_stage_seconds', stage='render'):
+            render_history(st.session_state.querier, st.session_state.turns)
         
         # Input form
         with st.form(key="chat_form", clear_on_submit=True):
@@ -186,6 +344,22 @@ def main():
                 key="user_input"
             )
             
+            filter_options = st.session_state.querier.filter_options()
+            with st.expander("Filters"):
+                filter_cols = st.columns(5)
+                with filter_cols[0]:
+                    campuses = st.multiselect("Campus", filter_options['campus'])
+                with filter_cols[1]:
+                    years = st.multiselect("Year", filter_options['year'])
+                with filter_cols[2]:
+                    credits = st.multiselect("Credits", filter_options['credits'])
+                with filter_cols[3]:
+                    terms = st.multiselect(
+                        "Offered in", list(TERM_LABELS), format_func=TERM_LABELS.get
+                    )
+                with filter_cols[4]:
+                    honours = st.selectbox("Honours", list(HONOURS_CHOICES))
+            
             cols = st.columns([1, 3, 1])
             with cols[0]:
                 num_results = st.number_input(
@@ -194,36 +368,52 @@ def main():
                     max_value=10,
                     value=2
                 )
+            with cols[1]:
+                generate_answer = st.checkbox(
+                    "Write an answer", value=bool(GENERATE_ANSWERS),
+                    help="Stream a short written answer based on the matching courses"
+                )
             with cols[2]:
                 submit_button = st.form_submit_button("🔍 Search")
     
     if submit_button and user_input:
-        # Add user message to chat
-        st.session_state.messages.append({
-            "content": user_input,
-            "is_user": True
-        })
-        
-        # Get course recommendations
-        results = st.session_state.querier.search_courses(user_input, top_k=num_results)
-        
-        # Format response
-        response = "<div class='response-container'>"
-        for result in results:
-            response += format_course_result(result)
-        response += "</div>"
-        
-        # Add bot response to chat
-        st.session_state.messages.append({
-            "content": response,
-            "is_user": False
-        })
+        with metrics.timer('app_request_stage_seconds', stage='total'):
+            # Get course recommendations
+            filters = build_filters(campuses, years, credits, terms, honours)
+            # Completed courses rerank results toward what the student can take next,
+            # and prerequisites are shown as of the time of the search
+            completed = parse_course_codes(st.session_state.get('completed_courses', ''))
+            with metrics.timer('app_request_stage_seconds', stage='search'):
+                results = st.session_state.querier.search_courses(
+                    user_input, top_k=num_results, filters=filters, completed=completed
+                )
+            
+            # Stream the answer below the history as soon as retrieval is done
+            answer = None
+            if generate_answer:
+                with chat_container, metrics.timer('app_request_stage_seconds', stage='answer'):
+                    display_message(html.escape(user_input), is_user=True)
+                    answer = st.write_stream(st.session_state.querier.stream_answer(
+                        user_input, results=results, completed=completed
+                    ))
+            
+            st.session_state.turns.append(make_turn(user_input, results, completed, answer))
+        if METRICS_FILE:
+            metrics.write_prometheus(METRICS_FILE)
         
         # Rerun to update chat display
         st.rerun()
 
     # Sidebar with additional information
     with st.sidebar:
+        st.markdown("### Your Courses")
+        st.text_input(
+            "Courses you've completed:",
+            placeholder="E.g., COSC 111, MATH 100",
+            key="completed_courses",
+            help="Used to rank courses you can take next higher and to show which prerequisites you still need"
+        )
+        
         st.markdown("### About")
         st.markdown("""
         This chatbot uses AI to help you find relevant UBC courses. 
@@ -236,8 +426,38 @@ def main():
         - Ask about specific topics or skills
         """)
         
+        pool = st.session_state.querier.pool_stats()
+        st.markdown("### Connection Pool")
+        st.progress(
+            min(pool['in_use'] / pool['max_size'], 1.0),
+            text=f"Neo4j: {pool['in_use']}/{pool['max_size']} in use (peak {pool['peak_in_use']})"
+        )
+        st.caption(f"{pool['queries']} queries served by this process")
+        if st.session_state.querier.result_cache is not None:
+            cached = st.session_state.querier.result_cache.stats()['memory']
+            st.caption(
+                f"Result cache: {cached['hit_rate']:.0%} hit rate, "
+                f"{cached['size']}/{cached['max_entries']} entries"
+            )
+        
+        with st.expander("Debug: latency"):
+            import pandas as pd
+
+            st.caption("Recent p50/p95 per stage, in milliseconds")
+            for title, name in (
+                ("Request", 'app_request_stage_seconds'),
+                ("Search", 'course_search_stage_seconds'),
+                ("Answer", 'answer_generation_seconds'),
+            ):
+                rows = metrics.summary(name)
+                if rows:
+                    st.markdown(f"**{title}**")
+                    st.dataframe(pd.DataFrame(rows).set_index('stage').round(2))
+            if METRICS_PORT:
+                st.caption(f"Prometheus metrics on port {METRICS_PORT} at /metrics")
+        
         if st.button("Clear Chat History"):
-            st.session_state.messages = []
+            st.session_state.turns.clear()
             st.rerun()
 
 if __name__ == "__main__":
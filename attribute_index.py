@@ -0,0 +1,78 @@
+import math
+
+import numpy as np
+
+from catalog import ATTRIBUTE_PROPERTIES
+
+
+def normalize_value(value):
+    """Canonical form of an attribute value, so 3, 3.0 and '3' share one bitmap"""
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        if math.isnan(value):
+            return None
+        return int(value) if float(value).is_integer() else float(value)
+    if isinstance(value, str):
+        text = value.strip()
+        if text.upper() in ('TRUE', 'FALSE'):
+            return text.upper() == 'TRUE'
+        try:
+            return normalize_value(float(text))
+        except ValueError:
+            return text
+    return value
+
+
+class AttributeIndex:
+    """
+    One boolean array per (attribute, value) over the catalog rows, so a set of
+    filters resolves to a row mask with a few vectorized ORs and ANDs before
+    any vector is scored.
+    """
+
+    def __init__(self, catalog):
+        self.size = len(catalog)
+        self.bitmaps = {}
+        for name in ATTRIBUTE_PROPERTIES:
+            values = [normalize_value(value) for value in catalog.attributes[name]]
+            bitmaps = {}
+            for row, value in enumerate(values):
+                if value is None:
+                    continue
+                if value not in bitmaps:
+                    bitmaps[value] = np.zeros(self.size, dtype=bool)
+                bitmaps[value][row] = True
+            self.bitmaps[name] = bitmaps
+
+    def values(self, name):
+        """Distinct values of an attribute, for building filter choices"""
+        return sorted(self.bitmaps[name], key=lambda value: (str(type(value)), value))
+
+    def mask(self, filters):
+        """
+        Resolve filters to a row mask
+        Args:
+            filters: dict of attribute name to a value or list of accepted values;
+                attributes are ANDed, the values of one attribute are ORed, and
+                None or an empty list leaves the attribute unfiltered
+        Returns:
+            Boolean array over catalog rows, or None when there is nothing to filter
+        """
+        mask = None
+        for name, accepted in (filters or {}).items():
+            if name not in self.bitmaps:
+                raise ValueError(f"Unknown filter attribute: {name}")
+            if accepted is None:
+                continue
+            if not isinstance(accepted, (list, tuple, set)):
+                accepted = [accepted]
+            if not accepted:
+                continue
+            attribute_mask = np.zeros(self.size, dtype=bool)
+            for value in accepted:
+                bitmap = self.bitmaps[name].get(normalize_value(value))
+                if bitmap is not None:
+                    attribute_mask |= bitmap
+            mask = attribute_mask if mask is None else mask & attribute_mask
+        return mask
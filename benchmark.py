@@ -0,0 +1,384 @@
+"""
+Offline performance benchmark for ingestion, embedding and search.
+
+Runs db_setup.py's ingestion and embedding code and query.py's CourseQuery
+(search and streamed answers) against the stand-ins in offline.py, over synthetic catalogs, and prints one
+JSON document so runs can be diffed over time. It also starts a fresh
+interpreter to time importing query.py and the first search, and lists any
+heavy client library that was loaded at import:
+
+    python benchmark.py --sizes 1000,10000,100000 --output bench.json
+
+The in-memory graph scans vectors exactly instead of using Neo4j's HNSW
+index, so absolute numbers measure this project's client-side code, not the
+database. Compare runs made on the same machine with the same options.
+"""
+from dotenv import load_dotenv
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from db_setup import (
+    EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_TOKENS, INGEST_BATCH_SIZE,
+    estimate_tokens, merge_course_batch_query, update_embeddings, write_course_batches
+)
+from embedding_executor import EmbeddingExecutor
+from embedding_providers import HASHING_EMBEDDING_DIMENSIONS
+from offline import ExtractiveChatModel, HashingEmbeddings, InMemoryGraph
+from query import CourseQuery
+from query_cache import LRUCache
+from result_cache import ResultCache
+
+load_dotenv('.env', override=True)
+BENCHMARK_SIZES = os.getenv('BENCHMARK_SIZES', '1000,10000')
+BENCHMARK_QUERIES = int(os.getenv('BENCHMARK_QUERIES', 200))
+
+SUBJECTS = (
+    'CPSC', 'MATH', 'STAT', 'PHYS', 'CHEM', 'BIOL', 'ECON', 'PSYC', 'ENGL', 'HIST',
+    'PHIL', 'COMM', 'EECE', 'MECH', 'CIVL', 'GEOG', 'LING', 'ASTR', 'EOSC', 'MICB',
+)
+TOPICS = (
+    'algorithms', 'data', 'structures', 'systems', 'networks', 'security', 'learning',
+    'statistics', 'probability', 'calculus', 'algebra', 'geometry', 'mechanics',
+    'thermodynamics', 'chemistry', 'genetics', 'ecology', 'evolution', 'markets',
+    'policy', 'cognition', 'language', 'literature', 'history', 'ethics', 'logic',
+    'design', 'analysis', 'modelling', 'optimization', 'computation', 'theory',
+    'signals', 'circuits', 'materials', 'climate', 'oceans', 'planets', 'cells',
+    'microbes', 'society', 'culture', 'finance', 'accounting', 'management',
+)
+FILLER = (
+    'introduction', 'to', 'the', 'of', 'and', 'methods', 'principles', 'advanced',
+    'topics', 'in', 'applied', 'foundations', 'students', 'will', 'study', 'with',
+    'emphasis', 'on', 'practical', 'projects', 'seminar', 'laboratory', 'survey',
+)
+
+
+def synthetic_courses(count, seed=0):
+    """
+    Course rows shaped like prepare_course_params output, with prerequisites
+    pointing at lower-numbered courses of the same subject
+    """
+    rng = random.Random(seed)
+    per_subject = {}
+    courses = []
+    for i in range(count):
+        subject = SUBJECTS[i % len(SUBJECTS)]
+        number = 100 + i // len(SUBJECTS)
+        code = f"{subject}_V {number}"
+        topics = rng.sample(TOPICS, 3)
+        words = [rng.choice(TOPICS if rng.random() < 0.4 else FILLER) for _ in range(rng.randint(25, 60))]
+        earlier = per_subject.setdefault(subject, [])
+        prerequisites = rng.sample(earlier[-50:], min(len(earlier[-50:]), rng.randint(0, 2)))
+        earlier.append(code)
+        courses.append({
+            "courseCode": code,
+            "id": i,
+            "campus": rng.choice(('UBCV', 'UBCO')),
+            "year": 1 + min(3, (number - 100) // 100),
+            "name": f"{topics[0].title()} and {topics[1].title()}",
+            "description": f"{' '.join(topics)} {' '.join(words)}",
+            "credits": rng.choice((1, 3, 3, 3, 4, 6)),
+            "isHonours": rng.random() < 0.05,
+            "restrictions": None,
+            "winterTerm1": rng.random() < 0.6,
+            "winterTerm2": rng.random() < 0.6,
+            "summerTerm1": rng.random() < 0.2,
+            "summerTerm2": rng.random() < 0.2,
+            "durationTerms": 1,
+            "prerequisites": prerequisites,
+            "corequisites": [],
+            "equivalents": [],
+        })
+    return courses
+
+
+def synthetic_questions(count, seed=1):
+    rng = random.Random(seed)
+    return [
+        f"{rng.choice(('intro to', 'advanced', 'courses about', 'learn'))} "
+        f"{' '.join(rng.sample(TOPICS, rng.randint(1, 3)))}"
+        for _ in range(count)
+    ]
+
+
+def latency_summary(samples):
+    """Percentiles of per-call latencies, in milliseconds"""
+    samples = np.asarray(samples, dtype=np.float64) * 1000.0
+    return {
+        'count': int(samples.size),
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'p99_ms': float(np.percentile(samples, 99)),
+    }
+
+
+def bench_ingest(kg, courses, batch_size):
+    start = time.perf_counter()
+    written, failed = write_course_batches(kg, courses, batch_size=batch_size, batch_query=merge_course_batch_query)
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': written,
+        'failed': len(failed),
+        'seconds': elapsed,
+        'rows_per_second': written / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def bench_embedding(kg, embeddings, courses, batch_size, max_tokens, concurrency):
+    # Quotas far above what the stand-in can use, so only the executor's overhead shows
+    executor = EmbeddingExecutor(
+        embeddings, concurrency=concurrency,
+        requests_per_minute=10 ** 9, tokens_per_minute=10 ** 12
+    )
+    start = time.perf_counter()
+    embedded = update_embeddings(kg, embeddings, batch_size=batch_size, max_tokens=max_tokens, executor=executor)
+    elapsed = time.perf_counter() - start
+    tokens = sum(estimate_tokens(course['description']) for course in courses)
+    return {
+        'courses': embedded,
+        'requests': executor.requests,
+        'seconds': elapsed,
+        'courses_per_second': embedded / elapsed if elapsed > 0 else 0.0,
+        'tokens_per_second': tokens / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def scratch_ann_index_path():
+    """
+    Index path that does not exist yet, so the 'ann' backend trains on the
+    synthetic catalog instead of reading (or replacing) the real ANN_INDEX_PATH
+    """
+    return os.path.join(tempfile.mkdtemp(prefix='benchmark-ann-'), 'ann')
+
+
+def bench_queries(kg, embeddings, questions, backend, mode, top_k):
+    """Cold start (construction plus first search) and per-query latency"""
+    start = time.perf_counter()
+    querier = CourseQuery(
+        embedding_cache=LRUCache(max_entries=len(questions)),
+        backend=backend, snapshot_path=None, search_mode=mode,
+        kg=kg, embeddings=embeddings,
+        # A zero-entry result cache, so repeated questions are timed end to end
+        result_cache=ResultCache(max_entries=0),
+        ann_index_path=scratch_ann_index_path()
+    )
+    constructed = time.perf_counter()
+    querier.search_courses(questions[0], top_k=top_k)
+    first_query = time.perf_counter()
+
+    latencies = []
+    for question in questions:
+        query_start = time.perf_counter()
+        querier.search_courses(question, top_k=top_k)
+        latencies.append(time.perf_counter() - query_start)
+    return {
+        'backend': backend,
+        'mode': mode,
+        'cold_start': {
+            'construct_seconds': constructed - start,
+            'first_query_seconds': first_query - constructed,
+            'total_seconds': first_query - start,
+        },
+        'latency': latency_summary(latencies),
+    }
+
+
+def bench_answers(kg, embeddings, questions, top_k, backend='numpy'):
+    """
+    Time to first token and total time of streamed answers from the
+    zero-latency stand-in model, i.e. retrieval plus context building
+    """
+    llm = ExtractiveChatModel()
+    querier = CourseQuery(
+        embedding_cache=LRUCache(max_entries=len(questions)), backend=backend, snapshot_path=None,
+        kg=kg, embeddings=embeddings, result_cache=ResultCache(max_entries=0), llm=llm,
+        ann_index_path=scratch_ann_index_path()
+    )
+    first_tokens, totals = [], []
+    for question in questions:
+        start = time.perf_counter()
+        stream = querier.stream_answer(question, top_k=top_k)
+        next(stream)
+        first_tokens.append(time.perf_counter() - start)
+        for _ in stream:
+            pass
+        totals.append(time.perf_counter() - start)
+    return {
+        'backend': backend,
+        'first_token': latency_summary(first_tokens),
+        'total': latency_summary(totals),
+    }
+
+
+# Modules a query-only start should not have loaded yet
+HEAVY_MODULES = (
+    'pandas', 'langchain', 'langchain_community', 'langchain_openai',
+    'langchain_text_splitters', 'httpx', 'neo4j', 'openai',
+)
+
+# Runs in a fresh interpreter so the import time is not hidden by this process
+STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import query
+imported = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+
+import contextlib
+import benchmark
+from offline import ExtractiveChatModel, HashingEmbeddings, InMemoryGraph
+kg, embeddings = InMemoryGraph(), HashingEmbeddings({dimensions})
+with contextlib.redirect_stdout(sys.stderr):
+    benchmark.bench_ingest(kg, benchmark.synthetic_courses({size}), 500)
+    benchmark.bench_embedding(kg, embeddings, [], 100, 8000, 4)
+
+first_start = time.perf_counter()
+querier = query.CourseQuery(
+    backend={backend!r}, snapshot_path=None, kg=kg, embeddings=embeddings,
+    ann_index_path={ann_index_path!r}
+)
+querier.search_courses('introduction to algorithms')
+first_query = time.perf_counter() - first_start
+
+client_start = time.perf_counter()
+import langchain_community.graphs, langchain_openai
+clients = time.perf_counter() - client_start
+print(json.dumps({{
+    'import_seconds': imported - start,
+    'heavy_modules_at_import': heavy,
+    'first_query_seconds': first_query,
+    'client_import_seconds': clients,
+}}))
+"""
+
+
+def bench_startup(size=1000, dimensions=HASHING_EMBEDDING_DIMENSIONS, backend='numpy'):
+    """
+    Import time of query.py and time to the first search, measured in a new
+    interpreter. client_import_seconds is what the Neo4j and OpenAI clients
+    add once a real CourseQuery connects.
+    """
+    script = STARTUP_PROBE.format(
+        heavy=HEAVY_MODULES, dimensions=dimensions, size=size, backend=backend,
+        ann_index_path=scratch_ann_index_path()
+    )
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True, text=True, check=True
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result['process_seconds'] = time.perf_counter() - start
+    result['backend'] = backend
+    return result
+
+
+def run_benchmark(size, num_queries=BENCHMARK_QUERIES, top_k=5, dimensions=HASHING_EMBEDDING_DIMENSIONS,
+                  batch_size=INGEST_BATCH_SIZE, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                  embedding_max_tokens=EMBEDDING_MAX_TOKENS, concurrency=4,
+                  backends=('neo4j', 'numpy'), modes=('vector', 'hybrid'), seed=0):
+    """
+    Benchmark one synthetic catalog size
+    Returns:
+        Dict with ingest, embedding and per backend/mode query results
+    """
+    courses = synthetic_courses(size, seed=seed)
+    questions = synthetic_questions(num_queries, seed=seed + 1)
+    kg = InMemoryGraph()
+    embeddings = HashingEmbeddings(dimensions)
+
+    # Progress lines from db_setup go to stderr so stdout stays valid JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        ingest = bench_ingest(kg, courses, batch_size)
+        embedding = bench_embedding(
+            kg, embeddings, courses, embedding_batch_size, embedding_max_tokens, concurrency
+        )
+        queries = [
+            bench_queries(kg, embeddings, questions, backend, mode, top_k)
+            for backend in backends for mode in modes
+        ]
+        answers = bench_answers(kg, embeddings, questions, top_k)
+    return {'size': size, 'ingest': ingest, 'embedding': embedding, 'queries': queries, 'answers': answers}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline ingestion and search benchmark")
+    parser.add_argument(
+        '--sizes', default=BENCHMARK_SIZES,
+        help="comma-separated synthetic catalog sizes, e.g. 1000,100000,1000000"
+    )
+    parser.add_argument('--queries', type=int, default=BENCHMARK_QUERIES, help="searches timed per backend and mode")
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument(
+        '--dimensions', type=int, default=HASHING_EMBEDDING_DIMENSIONS,
+        help="embedding size; lower it for 1M-course runs on small machines"
+    )
+    parser.add_argument('--batch-size', type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument('--embedding-batch-size', type=int, default=EMBEDDING_BATCH_SIZE)
+    parser.add_argument('--concurrency', type=int, default=4, help="embedding worker threads")
+    parser.add_argument('--backends', default='neo4j,numpy')
+    parser.add_argument('--modes', default='vector,hybrid')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--skip-startup', action='store_true', help="skip the fresh-interpreter startup probe")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        'createdAt': time.time(),
+        'environment': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'options': {
+            'queries': args.queries,
+            'top_k': args.top_k,
+            'dimensions': args.dimensions,
+            'batch_size': args.batch_size,
+            'embedding_batch_size': args.embedding_batch_size,
+            'concurrency': args.concurrency,
+            'seed': args.seed,
+        },
+        'runs': [],
+    }
+    if not args.skip_startup:
+        print("Measuring startup time...", file=sys.stderr)
+        report['startup'] = bench_startup(dimensions=args.dimensions)
+    for size in (int(size) for size in args.sizes.split(',') if size.strip()):
+        print(f"Benchmarking {size} courses...", file=sys.stderr)
+        report['runs'].append(run_benchmark(
+            size,
+            num_queries=args.queries,
+            top_k=args.top_k,
+            dimensions=args.dimensions,
+            batch_size=args.batch_size,
+            embedding_batch_size=args.embedding_batch_size,
+            concurrency=args.concurrency,
+            backends=args.backends.split(','),
+            modes=args.modes.split(','),
+            seed=args.seed,
+        ))
+
+    encoded = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(encoded + '\n')
+        print(f"Wrote benchmark report to {args.output}", file=sys.stderr)
+    else:
+        print(encoded)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+import numpy as np
+
+# Course node properties loaded alongside each course for filtering
+ATTRIBUTE_PROPERTIES = (
+    'campus', 'year', 'credits', 'isHonours',
+    'winterTerm1', 'winterTerm2', 'summerTerm1', 'summerTerm2',
+)
+
+# Page through Course nodes by course code so large catalogs are not
+# returned in a single result set. Without embeddings, every course with a
+# description is returned (placeholder prerequisite nodes have none).
+catalog_page_query = """
+MATCH (course:Course)
+WHERE course.courseCode > $after
+AND CASE WHEN $withEmbeddings
+    THEN course.embedding IS NOT NULL
+    ELSE course.description IS NOT NULL
+END
+RETURN
+    course.courseCode AS courseCode,
+    course.name AS name,
+    course.description AS description,
+    course {.campus, .year, .credits, .isHonours,
+            .winterTerm1, .winterTerm2, .summerTerm1, .summerTerm2} AS attributes,
+    CASE WHEN $withEmbeddings THEN course.embedding END AS embedding
+ORDER BY course.courseCode
+LIMIT $limit
+"""
+
+
+class CourseCatalog:
+    """
+    In-process copy of the embedded Course nodes, used by the local search
+    backends. Row i of `embeddings` belongs to codes[i], names[i],
+    descriptions[i] and attributes[name][i].
+    """
+
+    def __init__(self, codes, names, descriptions, embeddings=None, attributes=None):
+        self.codes = list(codes)
+        self.names = list(names)
+        self.descriptions = list(descriptions)
+        self.embeddings = embeddings
+        attributes = attributes or {}
+        self.attributes = {
+            name: list(attributes.get(name) or [None] * len(self.codes))
+            for name in ATTRIBUTE_PROPERTIES
+        }
+        self._positions = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_graph(cls, kg, page_size=5000, with_embeddings=True):
+        """
+        Load every embedded course from Neo4j
+        Args:
+            kg: Neo4jGraph connection
+            page_size: courses fetched per round trip
+            with_embeddings: also load vectors; if False, load all described courses
+        Returns:
+            CourseCatalog with a contiguous float32 embedding matrix (or None)
+        """
+        codes, names, descriptions, vectors = [], [], [], []
+        attributes = {name: [] for name in ATTRIBUTE_PROPERTIES}
+        after = ''
+        while True:
+            page = kg.query(catalog_page_query, params={
+                'after': after, 'limit': page_size, 'withEmbeddings': with_embeddings
+            })
+            for row in page:
+                codes.append(row['courseCode'])
+                names.append(row['name'])
+                descriptions.append(row['description'])
+                vectors.append(row['embedding'])
+                for name in ATTRIBUTE_PROPERTIES:
+                    attributes[name].append(row['attributes'].get(name))
+            if len(page) < page_size:
+                break
+            after = page[-1]['courseCode']
+
+        embeddings = None
+        if with_embeddings:
+            embeddings = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+        return cls(codes, names, descriptions, embeddings, attributes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def index_of(self, code):
+        """Row of a course code, or None if the course is not in the catalog"""
+        return self._positions.get(code)
+
+    def record(self, i):
+        """Course fields for row i in the shape returned by search_courses"""
+        return {
+            'courseCode': self.codes[i],
+            'name': self.names[i],
+            'description': self.descriptions[i],
+        }
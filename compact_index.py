@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from vector_search import SCORE_CHUNK_ROWS, VectorIndex, normalize_rows, top_k_indices
+
+# Leading dimensions kept in the compact vectors, their storage type, and the
+# candidates the compact pass hands to the exact rerank
+COMPACT_DIMENSIONS = int(os.getenv('COMPACT_DIMENSIONS', 256))
+COMPACT_DTYPE = os.getenv('COMPACT_DTYPE', 'int8')
+COMPACT_CANDIDATES = int(os.getenv('COMPACT_CANDIDATES', 100))
+COMPACT_DTYPES = ('int8', 'float16', 'float32')
+
+
+def compact_vectors(matrix, dimensions=COMPACT_DIMENSIONS, dtype=COMPACT_DTYPE):
+    """
+    Truncate embeddings to their leading dimensions, renormalize, and store
+    them in a smaller type
+    Args:
+        matrix: (n, full dimension) embeddings
+        dimensions: leading dimensions to keep
+        dtype: 'int8' (symmetric per-row scale), 'float16' or 'float32'
+    Returns:
+        (codes, scales): codes is (n, dimensions) of dtype; scales is the
+        float32 per-row factor that maps int8 codes back to floats, or None
+    """
+    if dtype not in COMPACT_DTYPES:
+        raise ValueError(f"Unsupported compact dtype: {dtype}")
+    codes = np.empty((len(matrix), min(dimensions, matrix.shape[1])), dtype=dtype)
+    scales = np.empty(len(matrix), dtype=np.float32) if dtype == 'int8' else None
+    for start in range(0, len(matrix), SCORE_CHUNK_ROWS):
+        block = normalize_rows(np.asarray(matrix[start:start + SCORE_CHUNK_ROWS, :dimensions], dtype=np.float32))
+        if dtype != 'int8':
+            codes[start:start + SCORE_CHUNK_ROWS] = block
+            continue
+        block_scales = np.abs(block).max(axis=1) / 127.0
+        block_scales[block_scales == 0] = 1.0
+        codes[start:start + SCORE_CHUNK_ROWS] = np.round(block / block_scales[:, None]).astype(np.int8)
+        scales[start:start + SCORE_CHUNK_ROWS] = block_scales
+    return codes, scales
+
+
+class TwoStageIndex:
+    """
+    Two-pass search: every course is scored on compact vectors (leading
+    dimensions only, int8 by default), then only the best `candidates` are
+    re-scored with the full-precision embeddings. With a memory-mapped
+    snapshot only the compact vectors and the rerank rows need to be resident.
+    Scores use the same (1 + cosine) / 2 scale as VectorIndex.
+    """
+
+    def __init__(self, catalog, dimensions=COMPACT_DIMENSIONS, dtype=COMPACT_DTYPE,
+                 candidates=COMPACT_CANDIDATES, codes=None, scales=None):
+        """
+        Args:
+            catalog: CourseCatalog with full embeddings for the rerank
+            dimensions, dtype: compact vector shape, used if codes are not given
+            candidates: courses passed from the compact pass to the rerank
+            codes, scales: precomputed compact vectors, e.g. from a snapshot
+        """
+        self.catalog = catalog
+        self.candidates = candidates
+        if codes is None:
+            codes, scales = compact_vectors(catalog.embeddings, dimensions, dtype)
+        self.codes = codes
+        self.scales = scales
+        self.dimensions = codes.shape[1]
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def compact_scores(self, query_vector, rows=None):
+        """First-pass cosine estimates for every course, or only for `rows`"""
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[:self.dimensions])
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_CHUNK_ROWS):
+            block = np.asarray(codes[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[start:start + SCORE_CHUNK_ROWS] = block @ query
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def search_rows(self, query_vector, top_k=2, mask=None, candidates=None):
+        """Catalog rows and exact cosine scores of the reranked top_k, best first"""
+        rows = None if mask is None else np.flatnonzero(mask)
+        pool = max(candidates or self.candidates, top_k)
+        shortlist = top_k_indices(self.compact_scores(query_vector, rows), pool)
+        if rows is not None:
+            shortlist = rows[shortlist]
+        # Sorted rows read a memory-mapped snapshot front to back
+        shortlist = np.sort(shortlist)
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        exact = normalize_rows(self.catalog.embeddings[shortlist]) @ query
+        best = top_k_indices(exact, top_k)
+        return shortlist[best], exact[best]
+
+    def search(self, query_vector, top_k=2, mask=None):
+        rows, scores = self.search_rows(query_vector, top_k=top_k, mask=mask)
+        results = []
+        for row, score in zip(rows, scores):
+            result = {'score': float((1.0 + score) / 2.0)}
+            result.update(self.catalog.record(int(row)))
+            results.append(result)
+        return results
+
+    def search_batch(self, query_vectors, top_k=2, mask=None):
+        return [self.search(query_vector, top_k=top_k, mask=mask) for query_vector in query_vectors]
+
+    def memory_report(self):
+        """Bytes scanned per query by the compact pass against a full exact scan"""
+        full_bytes = len(self.catalog) * self.catalog.embeddings.shape[1] * 4
+        compact_bytes = self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+        return {
+            'full_bytes': int(full_bytes),
+            'compact_bytes': int(compact_bytes),
+            'saved_bytes': int(full_bytes - compact_bytes),
+            'compression': full_bytes / compact_bytes if compact_bytes else 0.0,
+        }
+
+
+def load_two_stage_index(catalog, snapshot_path=None, candidates=COMPACT_CANDIDATES):
+    """Two-stage index using the snapshot's compact vectors if it has them"""
+    from embedding_snapshot import load_compact
+
+    compact = load_compact(snapshot_path) if snapshot_path and os.path.exists(snapshot_path) else None
+    if compact is not None and compact[0].shape[1] == min(COMPACT_DIMENSIONS, catalog.embeddings.shape[1]):
+        codes, scales = compact
+        return TwoStageIndex(catalog, candidates=candidates, codes=codes, scales=scales)
+    return TwoStageIndex(catalog, candidates=candidates)
+
+
+def recall_report(catalog, dimensions=(128, 256, 512), candidates=(50, 100, 200), dtype=COMPACT_DTYPE,
+                  num_queries=200, top_k=10, seed=0):
+    """
+    Recall@k of the compact pass alone and after the exact rerank, with
+    latency and memory, for each truncation depth and candidate pool size.
+    Queries are catalog vectors with Gaussian noise.
+    """
+    rng = np.random.default_rng(seed)
+    exact = VectorIndex(catalog)
+    rows = rng.choice(len(catalog), min(num_queries, len(catalog)), replace=False)
+    queries = normalize_rows(
+        exact.matrix[rows] + rng.normal(0, 0.02, (rows.size, exact.matrix.shape[1])).astype(np.float32)
+    )
+    exact_latencies, truth = [], []
+    for query in queries:
+        start = time.perf_counter()
+        truth.append(set(top_k_indices(exact._scores(query[None, :])[0], top_k).tolist()))
+        exact_latencies.append(time.perf_counter() - start)
+
+    report = {
+        'courses': len(catalog),
+        'top_k': top_k,
+        'queries': int(rows.size),
+        'dtype': dtype,
+        'exact': {
+            'p50_ms': float(np.percentile(exact_latencies, 50) * 1000),
+            'p95_ms': float(np.percentile(exact_latencies, 95) * 1000),
+        },
+        'runs': [],
+    }
+    expected_hits = len(truth) * min(top_k, len(catalog))
+    for depth in dimensions:
+        index = TwoStageIndex(catalog, dimensions=depth, dtype=dtype)
+        first_pass_hits = sum(
+            len(expected & set(top_k_indices(index.compact_scores(query), top_k).tolist()))
+            for query, expected in zip(queries, truth)
+        )
+        for pool in candidates:
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                found, _ = index.search_rows(query, top_k=top_k, candidates=pool)
+                latencies.append(time.perf_counter() - start)
+                hits += len(expected & set(found.tolist()))
+            report['runs'].append({
+                'dimensions': index.dimensions,
+                'candidates': pool,
+                'compact_recall': first_pass_hits / expected_hits,
+                'recall': hits / expected_hits,
+                'p50_ms': float(np.percentile(latencies, 50) * 1000),
+                'p95_ms': float(np.percentile(latencies, 95) * 1000),
+                **index.memory_report(),
+            })
+    return report
+
+
+def main(argv=None):
+    from ann_index import load_catalog
+    from embedding_snapshot import SNAPSHOT_PATH
+
+    parser = argparse.ArgumentParser(description="Recall and memory of two-stage compact-vector search")
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="read vectors from this snapshot if it exists")
+    parser.add_argument('--dimensions', default='128,256,512', help="comma-separated truncation depths")
+    parser.add_argument('--candidates', default='50,100,200', help="comma-separated rerank pool sizes")
+    parser.add_argument('--dtype', choices=COMPACT_DTYPES, default=COMPACT_DTYPE)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args(argv)
+
+    report = recall_report(
+        load_catalog(args.snapshot),
+        dimensions=[int(value) for value in args.dimensions.split(',') if value.strip()],
+        candidates=[int(value) for value in args.candidates.split(',') if value.strip()],
+        dtype=args.dtype, num_queries=args.queries, top_k=args.top_k
+    )
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
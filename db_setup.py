@@ -1,8 +1,25 @@
 from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
 import os
-import pandas as pd
-from langchain_community.graphs import Neo4jGraph
-from langchain_openai import OpenAIEmbeddings
+import threading
+import time
+
+from catalog import ATTRIBUTE_PROPERTIES, CourseCatalog
+from compact_index import COMPACT_DIMENSIONS, COMPACT_DTYPE, COMPACT_DTYPES
+from embedding_cache import EmbeddingCache, text_hash
+from embedding_executor import EMBEDDING_RETRY_QUEUE_PATH, EmbeddingExecutor, RetryQueue
+from embedding_providers import (
+    EMBEDDING_PROVIDER, LOCAL_EMBEDDING_PATH, create_embeddings, embedding_dimensions, embedding_model_name,
+    fit_local_embeddings
+)
+from embedding_snapshot import SNAPSHOT_DTYPES, SNAPSHOT_PATH, write_snapshot
+from graph_snapshot import (
+    GRAPH_EXPORT_PAGE_SIZE, GRAPH_RESTORE_BATCH_SIZE, GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE,
+    GRAPH_SNAPSHOT_PATH, export_graph, restore_graph
+)
+from result_cache import read_dataset_stamp, write_dataset_stamp
 
 # Load environment variables
 load_dotenv('.env', override=True)
@@ -10,49 +27,167 @@ NEO4J_URI = os.getenv('NEO4J_URI')
 NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 NEO4J_DATABASE = os.getenv('NEO4J_DATABASE')
-OPENAI_API_KEY = os.getenv('OPENAIAPIKEY')
 
-# Neo4j Cypher query for creating course nodes and relationships
-merge_course_node_query = """
-MERGE (course:Course {courseCode: $courseParam.courseCode})
+# Number of courses sent to Neo4j per transaction during ingestion
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))
+# Limits for a single bulk embedding request
+EMBEDDING_BATCH_SIZE = int(os.getenv('EMBEDDING_BATCH_SIZE', 100))
+EMBEDDING_MAX_TOKENS = int(os.getenv('EMBEDDING_MAX_TOKENS', 8000))
+# Per-course row hashes from the last incremental sync
+INGEST_MANIFEST_PATH = os.getenv(
+    'INGEST_MANIFEST_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'ingest_manifest.json')
+)
+MANIFEST_FORMAT_VERSION = 1
+# Course catalog exported from the UBC calendar
+COURSES_CSV_PATH = os.path.join(os.path.dirname(__file__), 'courses_info copy.csv')
+
+# Neo4j Cypher query for creating course nodes and relationships, one
+# transaction per list of course parameter dicts. FOREACH keeps a course with
+# no prerequisites from dropping out of the row stream before its other
+# relationships are created.
+merge_course_batch_query = """
+UNWIND $courseParams AS courseParam
+MERGE (course:Course {courseCode: courseParam.courseCode})
     ON CREATE SET 
-        course.id = $courseParam.id,
-        course.campus = $courseParam.campus,
-        course.year = $courseParam.year,
-        course.name = $courseParam.name,
-        course.description = $courseParam.description,
-        course.credits = $courseParam.credits,
-        course.isHonours = $courseParam.isHonours,
-        course.restrictions = $courseParam.restrictions,
-        course.winterTerm1 = $courseParam.winterTerm1,
-        course.winterTerm2 = $courseParam.winterTerm2,
-        course.summerTerm1 = $courseParam.summerTerm1,
-        course.summerTerm2 = $courseParam.summerTerm2,
-        course.durationTerms = $courseParam.durationTerms
+        course.id = courseParam.id,
+        course.campus = courseParam.campus,
+        course.year = courseParam.year,
+        course.name = courseParam.name,
+        course.description = courseParam.description,
+        course.credits = courseParam.credits,
+        course.isHonours = courseParam.isHonours,
+        course.restrictions = courseParam.restrictions,
+        course.winterTerm1 = courseParam.winterTerm1,
+        course.winterTerm2 = courseParam.winterTerm2,
+        course.summerTerm1 = courseParam.summerTerm1,
+        course.summerTerm2 = courseParam.summerTerm2,
+        course.durationTerms = courseParam.durationTerms
 
 // Create prerequisite relationships
-WITH course
-UNWIND $courseParam.prerequisites AS prereq
-MERGE (prereqCourse:Course {courseCode: prereq})
-MERGE (prereqCourse)-[:PREREQ_OF]->(course)
+FOREACH (prereq IN courseParam.prerequisites |
+    MERGE (prereqCourse:Course {courseCode: prereq})
+    MERGE (prereqCourse)-[:PREREQ_OF]->(course)
+)
 
 // Create corequisite relationships
-WITH course
-UNWIND $courseParam.corequisites AS coreq
-MERGE (coreqCourse:Course {courseCode: coreq})
-MERGE (course)-[:COREQ_WITH]->(coreqCourse)
+FOREACH (coreq IN courseParam.corequisites |
+    MERGE (coreqCourse:Course {courseCode: coreq})
+    MERGE (course)-[:COREQ_WITH]->(coreqCourse)
+)
 
 // Create equivalent course relationships
-WITH course
-UNWIND $courseParam.equivalents AS equiv
-MERGE (equivCourse:Course {courseCode: equiv})
-MERGE (course)-[:EQUIVALENT_TO]->(equivCourse)
+FOREACH (equiv IN courseParam.equivalents |
+    MERGE (equivCourse:Course {courseCode: equiv})
+    MERGE (course)-[:EQUIVALENT_TO]->(equivCourse)
+)
+
+RETURN count(course) AS courseCount
+"""
+
+# Incremental-sync upsert: unlike merge_course_batch_query it overwrites the
+# properties of existing courses and replaces their relationship sets
+upsert_course_batch_query = """
+UNWIND $courseParams AS courseParam
+MERGE (course:Course {courseCode: courseParam.courseCode})
+SET 
+    course.id = courseParam.id,
+    course.campus = courseParam.campus,
+    course.year = courseParam.year,
+    course.name = courseParam.name,
+    course.description = courseParam.description,
+    course.credits = courseParam.credits,
+    course.isHonours = courseParam.isHonours,
+    course.restrictions = courseParam.restrictions,
+    course.winterTerm1 = courseParam.winterTerm1,
+    course.winterTerm2 = courseParam.winterTerm2,
+    course.summerTerm1 = courseParam.summerTerm1,
+    course.summerTerm2 = courseParam.summerTerm2,
+    course.durationTerms = courseParam.durationTerms
+
+// Drop the relationships this course row defines before re-creating them
+WITH course, courseParam
+CALL {
+    WITH course
+    OPTIONAL MATCH (:Course)-[prereq:PREREQ_OF]->(course)
+    DELETE prereq
+}
+CALL {
+    WITH course
+    OPTIONAL MATCH (course)-[other:COREQ_WITH|EQUIVALENT_TO]->(:Course)
+    DELETE other
+}
+
+FOREACH (prereq IN courseParam.prerequisites |
+    MERGE (prereqCourse:Course {courseCode: prereq})
+    MERGE (prereqCourse)-[:PREREQ_OF]->(course)
+)
+FOREACH (coreq IN courseParam.corequisites |
+    MERGE (coreqCourse:Course {courseCode: coreq})
+    MERGE (course)-[:COREQ_WITH]->(coreqCourse)
+)
+FOREACH (equiv IN courseParam.equivalents |
+    MERGE (equivCourse:Course {courseCode: equiv})
+    MERGE (course)-[:EQUIVALENT_TO]->(equivCourse)
+)
+
+RETURN course.courseCode AS courseCode, course.embeddingHash AS embeddingHash
+"""
 
-RETURN course
+# Remove courses dropped from the CSV. A course other rows still point at
+# (e.g. as a prerequisite) is reduced to a bare placeholder node instead.
+delete_courses_query = """
+UNWIND $courseCodes AS code
+MATCH (course:Course {courseCode: code})
+CALL {
+    WITH course
+    OPTIONAL MATCH (:Course)-[prereq:PREREQ_OF]->(course)
+    DELETE prereq
+}
+CALL {
+    WITH course
+    OPTIONAL MATCH (course)-[other:COREQ_WITH|EQUIVALENT_TO]->(:Course)
+    DELETE other
+}
+WITH course, code, EXISTS { (course)--() } AS referenced
+FOREACH (_ IN CASE WHEN referenced THEN [1] ELSE [] END |
+    SET course = {courseCode: code}
+)
+FOREACH (_ IN CASE WHEN referenced THEN [] ELSE [1] END |
+    DELETE course
+)
+"""
+
+# Write back one batch of embeddings in a single statement
+write_embeddings_query = """
+UNWIND $rows AS row
+MATCH (course:Course {courseCode: row.courseCode})
+SET course.embedding = row.embedding,
+    course.embeddingHash = row.embeddingHash
+"""
+
+# Record the description hash of embeddings created before hashes were tracked
+stamp_embedding_hash_query = """
+UNWIND $rows AS row
+MATCH (course:Course {courseCode: row.courseCode})
+SET course.embeddingHash = row.embeddingHash
+"""
+
+# Described courses with their embedding state, optionally limited to some codes
+embedding_candidates_query = """
+MATCH (course:Course) 
+WHERE course.description IS NOT NULL 
+AND course.description <> ''
+AND ($courseCodes IS NULL OR course.courseCode IN $courseCodes)
+RETURN course.courseCode AS courseCode, course.description AS description,
+    course.embeddingHash AS embeddingHash,
+    course.embedding IS NOT NULL AS hasEmbedding
 """
 
 def prepare_course_params(row):
     """Prepare course parameters for Neo4j"""
+    import pandas as pd
+
     return {
         "courseCode": row['course_code'],
         "id": row['id'],
@@ -73,88 +208,623 @@ def prepare_course_params(row):
         "equivalents": row['courses_in_equivalent_string'].split(',') if pd.notna(row['courses_in_equivalent_string']) else []
     }
 
-def update_embeddings(kg, embeddings):
-    """Create embeddings for courses that don't have them"""
-    embedding_query = """
-    MATCH (course:Course) 
-    WHERE course.embedding IS NULL 
-    AND course.description IS NOT NULL 
-    AND course.description <> ''
-    RETURN course.courseCode AS courseCode, course.description AS description
-    """
-    
-    courses_to_embed = kg.query(embedding_query)
-    success_count = 0
-    
-    for course in courses_to_embed:
+def ingest_courses_single(kg, course_params, batch_query=merge_course_batch_query):
+    """
+    Write courses one transaction at a time
+    Returns:
+        Tuple of (course codes that failed, rows returned by the successful writes)
+    """
+    failed = []
+    rows = []
+    for course_data in course_params:
+        try:
+            rows.extend(kg.query(batch_query, params={"courseParams": [course_data]}) or [])
+        except Exception as e:
+            print(f"Error writing course {course_data['courseCode']}: {e}")
+            failed.append(course_data['courseCode'])
+    return failed, rows
+
+def write_course_batches(kg, course_params, batch_size=INGEST_BATCH_SIZE,
+                         batch_query=merge_course_batch_query):
+    """
+    Send course parameter dicts to Neo4j in batches of UNWIND-ed parameters
+    Args:
+        kg: Neo4jGraph connection
+        course_params: dicts from prepare_course_params
+        batch_size: number of courses written per transaction
+        batch_query: Cypher statement taking the batch as $courseParams
+    Returns:
+        Tuple of (number written, list of course codes that failed)
+    """
+    total = len(course_params)
+    written = 0
+    failed = []
+    start = time.perf_counter()
+
+    for offset in range(0, total, batch_size):
+        batch = course_params[offset:offset + batch_size]
+        try:
+            kg.query(batch_query, params={"courseParams": batch})
+            written += len(batch)
+        except Exception as e:
+            # Replay the batch row by row so one bad course does not sink the rest
+            print(f"Batch at row {offset} failed ({e}); retrying row by row...")
+            batch_failed, _ = ingest_courses_single(kg, batch, batch_query)
+            failed.extend(batch_failed)
+            written += len(batch) - len(batch_failed)
+
+        elapsed = time.perf_counter() - start
+        done = min(offset + batch_size, total)
+        rate = done / elapsed if elapsed > 0 else float('inf')
+        print(f"Processed {done}/{total} courses ({rate:.1f} rows/s)")
+
+    if failed:
+        print(f"Failed to write {len(failed)} courses: {', '.join(map(str, failed))}")
+    return written, failed
+
+def ingest_courses(kg, courses_df, batch_size=INGEST_BATCH_SIZE):
+    """
+    Create course nodes and relationships in batches of UNWIND-ed parameters
+    Args:
+        kg: Neo4jGraph connection
+        courses_df: DataFrame loaded from the course CSV
+        batch_size: number of courses written per transaction
+    Returns:
+        Number of courses written successfully
+    """
+    course_params = [prepare_course_params(row) for _, row in courses_df.iterrows()]
+    written, _ = write_course_batches(kg, course_params, batch_size=batch_size)
+    return written
+
+def read_courses_csv(path=COURSES_CSV_PATH):
+    """Load the course CSV; pandas is only imported by commands that ingest"""
+    import pandas as pd
+
+    return pd.read_csv(path)
+
+def estimate_tokens(text):
+    """Rough token count for an embedding request (about 4 characters per token)"""
+    return len(text) // 4 + 1
+
+def batch_courses_for_embedding(courses, batch_size, max_tokens):
+    """Group courses into embedding requests bounded by count and estimated tokens"""
+    batch = []
+    batch_tokens = 0
+    for course in courses:
+        tokens = estimate_tokens(course['description'])
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(course)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def write_embeddings(kg, rows, batch_size=INGEST_BATCH_SIZE):
+    """Write {courseCode, embedding, embeddingHash} rows back in UNWIND batches"""
+    for start in range(0, len(rows), batch_size):
+        kg.query(write_embeddings_query, params={"rows": rows[start:start + batch_size]})
+
+def embed_courses(kg, embeddings, courses, batch_size=EMBEDDING_BATCH_SIZE,
+                  max_tokens=EMBEDDING_MAX_TOKENS, cache=None, executor=None):
+    """
+    Embed course descriptions in bulk and write the vectors back per batch
+    Args:
+        kg: Neo4jGraph connection
+        embeddings: LangChain embeddings client
+        courses: dicts with courseCode and description keys
+        batch_size: maximum descriptions per embedding request
+        max_tokens: maximum estimated tokens per embedding request
+        cache: optional EmbeddingCache consulted before calling the provider
+        executor: EmbeddingExecutor pacing the requests; batches that still
+            fail go to its retry queue
+    Returns:
+        Number of courses whose embedding was written
+    """
+    if executor is None:
+        executor = create_embedding_executor(embeddings)
+
+    valid_courses = []
+    for course in courses:
         description = course['description']
         # Skip if description is not a string or is empty
         if not isinstance(description, str) or not description.strip():
             print(f"Skipping {course['courseCode']}: Invalid or empty description")
             continue
-            
+        valid_courses.append({**course, 'embeddingHash': embedding_hash(embeddings, description)})
+
+    # Only codes whose vectors reached the graph leave the retry queue
+    written = set()
+    failed_codes = set()
+    courses_to_embed = valid_courses
+
+    if cache is not None:
+        cached = cache.get_many(course['embeddingHash'] for course in valid_courses)
+        cached_rows = [
+            {
+                "courseCode": course['courseCode'],
+                "embedding": cached[course['embeddingHash']],
+                "embeddingHash": course['embeddingHash']
+            }
+            for course in valid_courses if course['embeddingHash'] in cached
+        ]
         try:
-            embedding_vector = embeddings.embed_query(description)
-            kg.query(
-                """
-                MATCH (course:Course {courseCode: $courseCode})
-                SET course.embedding = $embedding
-                """,
-                params={
-                    "courseCode": course['courseCode'],
-                    "embedding": embedding_vector
-                }
-            )
-            success_count += 1
-            print(f"Created embedding for {course['courseCode']}")
+            write_embeddings(kg, cached_rows)
+            written.update(row['courseCode'] for row in cached_rows)
+            print(f"Reused {len(cached_rows)} cached embeddings")
         except Exception as e:
-            print(f"Error creating embedding for {course['courseCode']}: {e}")
-    
-    return success_count
+            print(f"Error writing cached embeddings: {e}")
+            cached_courses = [course for course in valid_courses if course['embeddingHash'] in cached]
+            failed_codes.update(course['courseCode'] for course in cached_courses)
+            if executor.retry_queue is not None:
+                executor.retry_queue.add(cached_courses, e)
+        courses_to_embed = [
+            course for course in valid_courses if course['embeddingHash'] not in cached
+        ]
+
+    progress = {'courses': 0, 'tokens': 0}
+    progress_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def batch_tokens(batch):
+        return sum(estimate_tokens(course['description']) for course in batch)
+
+    def write_batch(batch, vectors):
+        # Cache first, so a failed graph write is retried without a second API call
+        if cache is not None:
+            cache.put_many(
+                (course['embeddingHash'], vector) for course, vector in zip(batch, vectors)
+            )
+        write_embeddings(kg, [
+            {
+                "courseCode": course['courseCode'],
+                "embedding": vector,
+                "embeddingHash": course['embeddingHash']
+            }
+            for course, vector in zip(batch, vectors)
+        ])
+        with progress_lock:
+            written.update(course['courseCode'] for course in batch)
+            progress['courses'] += len(batch)
+            progress['tokens'] += batch_tokens(batch)
+            elapsed = time.perf_counter() - start
+            print(
+                f"Embedded {progress['courses']}/{len(courses_to_embed)} courses "
+                f"({progress['courses'] / elapsed:.1f} courses/s, "
+                f"~{progress['tokens'] / elapsed:.0f} tokens/s)"
+            )
+
+    failed = executor.run(
+        batch_courses_for_embedding(courses_to_embed, batch_size, max_tokens),
+        texts=lambda batch: [course['description'] for course in batch],
+        tokens=batch_tokens,
+        on_result=write_batch
+    )
+    for batch, error in failed:
+        codes = [course['courseCode'] for course in batch]
+        failed_codes.update(codes)
+        print(f"Error creating embeddings for {', '.join(codes)}: {error}")
+        if executor.retry_queue is not None:
+            executor.retry_queue.add(batch, error)
+
+    if executor.retry_queue is not None:
+        executor.retry_queue.remove(written)
+    if failed_codes:
+        print(f"{len(failed_codes)} courses could not be embedded; re-run them with `retry-embeddings`")
+
+    return len(written)
+
+def update_embeddings(kg, embeddings, batch_size=EMBEDDING_BATCH_SIZE,
+                      max_tokens=EMBEDDING_MAX_TOKENS, cache=None, course_codes=None,
+                      executor=None):
+    """
+    Create embeddings for courses that don't have them or whose description changed,
+    optionally only among the given course codes
+    """
+    courses_to_embed = []
+    legacy_rows = []
+    for course in kg.query(embedding_candidates_query, params={"courseCodes": course_codes}):
+        description = course['description']
+        if course['hasEmbedding'] and isinstance(description, str):
+            current_hash = embedding_hash(embeddings, description)
+            if course['embeddingHash'] == current_hash:
+                continue
+            if course['embeddingHash'] is None:
+                # Embedded before hashes were tracked; adopt it as-is
+                legacy_rows.append({"courseCode": course['courseCode'], "embeddingHash": current_hash})
+                continue
+        courses_to_embed.append(course)
+
+    if legacy_rows:
+        kg.query(stamp_embedding_hash_query, params={"rows": legacy_rows})
+        print(f"Recorded description hashes for {len(legacy_rows)} existing embeddings")
+
+    return embed_courses(
+        kg, embeddings, courses_to_embed,
+        batch_size=batch_size, max_tokens=max_tokens, cache=cache, executor=executor
+    )
+
+def course_row_hash(course_data):
+    """Content hash of a prepared course row, relationships included"""
+    encoded = json.dumps(course_data, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+def load_manifest(path=INGEST_MANIFEST_PATH):
+    """Course code -> row hash from the last sync, empty if there is none"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('formatVersion') != MANIFEST_FORMAT_VERSION:
+        print(f"Ignoring manifest {path} with unknown format version")
+        return {}
+    return manifest['courses']
+
+def write_manifest(course_hashes, path=INGEST_MANIFEST_PATH):
+    """Atomically replace the manifest with the given course hashes"""
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(
+            {'formatVersion': MANIFEST_FORMAT_VERSION, 'updatedAt': time.time(), 'courses': course_hashes},
+            f, sort_keys=True
+        )
+    os.replace(tmp_path, path)
+
+def diff_manifest(previous, current):
+    """Split course codes into added, changed, removed and unchanged lists"""
+    added = [code for code in current if code not in previous]
+    changed = [code for code in current if code in previous and previous[code] != current[code]]
+    removed = [code for code in previous if code not in current]
+    unchanged = [code for code in current if previous.get(code) == current[code]]
+    return added, changed, removed, unchanged
+
+def embedding_hash(embeddings, description):
+    """
+    Hash stored next to a course's embedding. The model name and vector size
+    are mixed in with the description, so switching provider or model (or
+    refitting the local one) re-embeds every course.
+    """
+    return text_hash(
+        f"{embedding_model_name(embeddings)}\n{embedding_dimensions(embeddings)}\n{description}"
+    )
+
+def open_embedding_cache(embeddings):
+    """On-disk embedding cache keyed to this embeddings client's model"""
+    return EmbeddingCache(
+        model=embedding_model_name(embeddings),
+        dimension=embedding_dimensions(embeddings)
+    )
 
-def setup_database():
+def connect_embeddings(fit_texts=None):
+    """
+    Embeddings client for bulk jobs from EMBEDDING_PROVIDER. The OpenAI SDK's
+    own retries are turned off because EmbeddingExecutor handles backoff
+    across all of its workers. If the local provider has no fitted model yet,
+    it is fitted on fit_texts when they are given.
+    """
+    if EMBEDDING_PROVIDER == 'local' and fit_texts is not None and not os.path.exists(LOCAL_EMBEDDING_PATH):
+        fit_local_embeddings(fit_texts)
+    return create_embeddings(max_retries=0)
+
+def create_embedding_executor(embeddings, retry_queue_path=EMBEDDING_RETRY_QUEUE_PATH):
+    """Rate-limited executor for an embeddings client, with the shared retry queue"""
+    return EmbeddingExecutor(embeddings, retry_queue=RetryQueue(retry_queue_path))
+
+# Dimension of the existing course_embeddings index, if there is one
+vector_index_dimensions_query = """
+SHOW INDEXES YIELD name, options
+WHERE name = 'course_embeddings'
+RETURN options.indexConfig.`vector.dimensions` AS dimensions
+"""
+
+def create_vector_index(kg, dimensions):
+    """
+    Create the course_embeddings index for the provider's vector size. An
+    existing index of another size is dropped and recreated, since vectors
+    that do not match its dimension are left out of it.
+    """
+    rows = kg.query(vector_index_dimensions_query)
+    if rows and rows[0]['dimensions'] is not None and int(rows[0]['dimensions']) != dimensions:
+        print(
+            f"Vector index course_embeddings has {rows[0]['dimensions']} dimensions; "
+            f"recreating it for {dimensions}"
+        )
+        kg.query("DROP INDEX course_embeddings IF EXISTS")
+    kg.query("""
+        CREATE VECTOR INDEX course_embeddings IF NOT EXISTS
+        FOR (c:Course) ON (c.embedding)
+        OPTIONS { indexConfig: {
+            `vector.dimensions`: %d,
+            `vector.similarity_function`: 'cosine'
+        }}
+    """ % dimensions)
+
+def create_property_indexes(kg):
+    """
+    Range indexes on courseCode and each filterable attribute, so MERGEs,
+    course-code lookups and filter predicates seek instead of scanning Course
+    """
+    kg.query("CREATE INDEX course_code IF NOT EXISTS FOR (c:Course) ON (c.courseCode)")
+    for name in ATTRIBUTE_PROPERTIES:
+        kg.query(f"CREATE INDEX course_{name} IF NOT EXISTS FOR (c:Course) ON (c.{name})")
+
+def connect_graph():
+    """Open a Neo4jGraph connection from the .env settings"""
+    from langchain_community.graphs import Neo4jGraph
+
+    return Neo4jGraph(
+        url=NEO4J_URI, 
+        username=NEO4J_USERNAME, 
+        password=NEO4J_PASSWORD, 
+        database=NEO4J_DATABASE
+    )
+
+def export_snapshot(path=SNAPSHOT_PATH, dtype='float32', compact_dimensions=COMPACT_DIMENSIONS,
+                    compact_dtype=COMPACT_DTYPE):
+    """
+    Export course embeddings and metadata as a memory-mappable snapshot, with
+    compact vectors for two-stage search unless compact_dimensions is 0
+    """
+    print("Connecting to Neo4j...")
+    kg = connect_graph()
+    print("Reading course embeddings...")
+    start = time.perf_counter()
+    # Read the stamp first: if an ingest lands mid-export, the snapshot is
+    # tagged with the older stamp and cached results are refreshed on reload
+    stamp = read_dataset_stamp(kg)
+    catalog = CourseCatalog.from_graph(kg)
+    manifest = write_snapshot(
+        catalog, path=path, dtype=dtype, dataset_stamp=stamp,
+        compact_dimensions=compact_dimensions, compact_dtype=compact_dtype
+    )
+    print(
+        f"Wrote {manifest['count']} x {manifest['dimension']} {dtype} snapshot to {path} "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+    if manifest['compact']:
+        print(f"Included {manifest['compact']['dimension']}-dimension {compact_dtype} compact vectors")
+    return manifest
+
+def sync_database(batch_size=INGEST_BATCH_SIZE, manifest_path=INGEST_MANIFEST_PATH,
+                  embedding_batch_size=EMBEDDING_BATCH_SIZE, embedding_max_tokens=EMBEDDING_MAX_TOKENS,
+                  use_embedding_cache=True):
+    """
+    Apply only the CSV rows that changed since the last sync: upsert added and
+    changed courses with their relationship sets, remove deleted courses and
+    re-embed changed descriptions. Without a manifest every row counts as added.
+    """
+    print("Connecting to Neo4j...")
+    kg = connect_graph()
+
+    print("Loading course data...")
+    courses_df = read_courses_csv()
+    course_params = {}
+    for _, row in courses_df.iterrows():
+        course_data = prepare_course_params(row)
+        course_params[course_data['courseCode']] = course_data
+    current = {code: course_row_hash(course_data) for code, course_data in course_params.items()}
+
+    previous = load_manifest(manifest_path)
+    added, changed, removed, unchanged = diff_manifest(previous, current)
+    print(f"{len(added)} added, {len(changed)} changed, {len(removed)} removed, {len(unchanged)} unchanged")
+
+    upserts = [course_params[code] for code in added + changed]
+    _, failed = write_course_batches(kg, upserts, batch_size=batch_size, batch_query=upsert_course_batch_query)
+    for start in range(0, len(removed), batch_size):
+        kg.query(delete_courses_query, params={"courseCodes": removed[start:start + batch_size]})
+
+    # Failed rows keep their old hash so the next sync retries them
+    synced = dict(current)
+
+    def keep_previous(codes):
+        for code in codes:
+            if code in previous:
+                synced[code] = previous[code]
+            else:
+                synced.pop(code, None)
+
+    keep_previous(failed)
+
+    num_embeddings = 0
+    touched = [code for code in added + changed if code not in failed]
+    if touched:
+        cache = None
+        try:
+            embeddings = connect_embeddings()
+            cache = open_embedding_cache(embeddings) if use_embedding_cache else None
+            executor = create_embedding_executor(embeddings)
+            num_embeddings = update_embeddings(
+                kg, embeddings,
+                batch_size=embedding_batch_size,
+                max_tokens=embedding_max_tokens,
+                cache=cache,
+                course_codes=touched,
+                executor=executor
+            )
+            # A database only ever loaded through sync needs its indexes too
+            print("Creating indexes...")
+            create_vector_index(kg, embedding_dimensions(embeddings))
+            create_property_indexes(kg)
+            # Courses whose embedding failed stay unsynced so the next sync retries them
+            queued = set(executor.retry_queue.codes())
+            keep_previous([code for code in touched if code in queued])
+        except BaseException:
+            # Embedding did not finish, so these rows are not synced yet: the
+            # next sync upserts and re-embeds them instead of skipping them
+            keep_previous(touched)
+            write_manifest(synced, manifest_path)
+            raise
+        finally:
+            if cache is not None:
+                cache.close()
+    # Written only after embedding so a crash never marks stale vectors as synced
+    write_manifest(synced, manifest_path)
+
+    if touched or removed:
+        print(f"Dataset version is now {write_dataset_stamp(kg)}")
+
+    print(
+        f"Sync complete: touched {len(touched) + len(removed)} courses "
+        f"({len(added)} added, {len(changed)} changed, {len(removed)} removed, "
+        f"{len(failed)} failed), skipped {len(unchanged)} unchanged, "
+        f"re-embedded {num_embeddings}"
+    )
+    return {
+        'added': len(added),
+        'changed': len(changed),
+        'removed': len(removed),
+        'unchanged': len(unchanged),
+        'failed': len(failed),
+        'embedded': num_embeddings,
+    }
+
+def stream_database(batch_size=INGEST_BATCH_SIZE, chunk_size=None,
+                    embedding_batch_size=EMBEDDING_BATCH_SIZE, embedding_max_tokens=EMBEDDING_MAX_TOKENS,
+                    use_embedding_cache=True):
+    """Load the CSV through the streaming pipeline: parsing, graph writes and embedding overlap"""
+    # Imported here because the pipeline module builds on this one
+    from ingest_pipeline import INGEST_CHUNK_SIZE, IngestPipeline
+
+    print("Connecting to Neo4j...")
+    kg = connect_graph()
+    embeddings = connect_embeddings()
+    print("Creating indexes...")
+    create_vector_index(kg, embedding_dimensions(embeddings))
+    create_property_indexes(kg)
+
+    cache = open_embedding_cache(embeddings) if use_embedding_cache else None
+    pipeline = IngestPipeline(
+        kg, embeddings,
+        chunk_size=chunk_size or INGEST_CHUNK_SIZE,
+        batch_size=batch_size,
+        embedding_batch_size=embedding_batch_size,
+        embedding_max_tokens=embedding_max_tokens,
+        cache=cache,
+        executor=create_embedding_executor(embeddings)
+    )
+    try:
+        summary = pipeline.run()
+    finally:
+        if cache is not None:
+            cache.close()
+
+    print(f"Dataset version is now {write_dataset_stamp(kg)}")
+    for name, stage in summary['stages'].items():
+        print(
+            f"{name:>6}: {stage['rows']} rows in {stage['batches']} batches "
+            f"({stage['rows_per_second']:.1f} rows/s, busy {stage['busy_seconds']:.1f}s)"
+        )
+    print(f"Peak queue depths: {summary['max_queue_depth']}")
+    print(
+        f"Streaming ingest complete in {summary['elapsed_seconds']:.1f}s: "
+        f"{summary['invalid_rows']} invalid rows, {summary['failed']} failed, "
+        f"{summary['embedded']} embedded"
+    )
+    return summary
+
+def retry_embeddings(retry_queue_path=EMBEDDING_RETRY_QUEUE_PATH,
+                     embedding_batch_size=EMBEDDING_BATCH_SIZE, embedding_max_tokens=EMBEDDING_MAX_TOKENS,
+                     use_embedding_cache=True):
+    """Re-run the courses left in the embedding retry queue by earlier runs"""
+    retry_queue = RetryQueue(retry_queue_path)
+    codes = retry_queue.codes()
+    if not codes:
+        print("Embedding retry queue is empty")
+        return 0
+
+    print(f"Retrying embeddings for {len(codes)} courses...")
+    started = time.time()
+    kg = connect_graph()
+    embeddings = connect_embeddings()
+    cache = open_embedding_cache(embeddings) if use_embedding_cache else None
+    executor = EmbeddingExecutor(embeddings, retry_queue=retry_queue)
+    try:
+        num_embeddings = update_embeddings(
+            kg, embeddings,
+            batch_size=embedding_batch_size,
+            max_tokens=embedding_max_tokens,
+            cache=cache,
+            course_codes=codes,
+            executor=executor
+        )
+    finally:
+        if cache is not None:
+            cache.close()
+    if num_embeddings:
+        write_dataset_stamp(kg)
+    # Courses that were already up to date (or removed) were not re-embedded
+    # and did not fail again, so they no longer need retrying
+    retry_queue.prune(codes, started)
+    print(
+        f"Re-embedded {num_embeddings} courses; {len(retry_queue)} still queued "
+        f"({executor.stats()})"
+    )
+    return num_embeddings
+
+def export_graph_snapshot(path=GRAPH_SNAPSHOT_PATH, page_size=GRAPH_EXPORT_PAGE_SIZE):
+    """Back up every course node, embedding and relationship to a Parquet snapshot"""
+    print("Connecting to Neo4j...")
+    kg = connect_graph()
+    return export_graph(kg, path=path, page_size=page_size)
+
+def restore_graph_snapshot(path=GRAPH_SNAPSHOT_PATH, batch_size=GRAPH_RESTORE_BATCH_SIZE,
+                           relationship_batch_size=GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE):
+    """Load a Parquet graph snapshot without re-running the ingest or any embedding call"""
+    print("Connecting to Neo4j...")
+    kg = connect_graph()
+    return restore_graph(
+        kg, path=path, batch_size=batch_size, relationship_batch_size=relationship_batch_size
+    )
+
+def setup_database(batch_size=INGEST_BATCH_SIZE, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                   embedding_max_tokens=EMBEDDING_MAX_TOKENS, use_embedding_cache=True):
     """Initialize the Neo4j database with course data and embeddings"""
     try:
         # Connect to Neo4j
         print("Connecting to Neo4j...")
-        kg = Neo4jGraph(
-            url=NEO4J_URI, 
-            username=NEO4J_USERNAME, 
-            password=NEO4J_PASSWORD, 
-            database=NEO4J_DATABASE
-        )
-
-        # Create vector index
-        print("Creating vector index...")
-        kg.query("""
-            CREATE VECTOR INDEX course_embeddings IF NOT EXISTS
-            FOR (c:Course) ON (c.embedding)
-            OPTIONS { indexConfig: {
-                `vector.dimensions`: 1536,
-                `vector.similarity_function`: 'cosine'
-            }}
-        """)
+        kg = connect_graph()
 
         # Load and process CSV
         print("Loading course data...")
-        csv_path = os.path.join(os.path.dirname(__file__), 'courses_info copy.csv')
-        courses_df = pd.read_csv(csv_path)
+        courses_df = read_courses_csv()
+
+        # Initialize embeddings; the local provider is fitted on the catalog if needed
+        print(f"Initializing {EMBEDDING_PROVIDER} embeddings...")
+        embeddings = connect_embeddings(fit_texts=courses_df['description'].tolist())
+
+        # Create vector and property indexes
+        print("Creating indexes...")
+        create_vector_index(kg, embedding_dimensions(embeddings))
+        create_property_indexes(kg)
 
         # Create course nodes and relationships
         print("Creating course nodes and relationships...")
-        for _, row in courses_df.iterrows():
-            course_data = prepare_course_params(row)
-            kg.query(merge_course_node_query, params={"courseParam": course_data})
+        num_courses = ingest_courses(kg, courses_df, batch_size=batch_size)
+        print(f"Created {num_courses} course nodes")
 
-        # Initialize embeddings
-        print("Initializing OpenAI embeddings...")
-        embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
+        cache = open_embedding_cache(embeddings) if use_embedding_cache else None
+        executor = create_embedding_executor(embeddings)
         
-        # Create embeddings for courses without them
+        # Create embeddings for new courses and courses whose description changed
         print("Creating course embeddings...")
-        num_embeddings = update_embeddings(kg, embeddings)
+        num_embeddings = update_embeddings(
+            kg, embeddings,
+            batch_size=embedding_batch_size,
+            max_tokens=embedding_max_tokens,
+            cache=cache,
+            executor=executor
+        )
         print(f"Created embeddings for {num_embeddings} courses")
+        print(f"Embedding requests: {executor.stats()}")
+        if cache is not None:
+            print(f"Embedding cache: {cache.stats()}")
+            cache.close()
 
+        # Invalidates search results cached against the previous data
+        print(f"Dataset version is now {write_dataset_stamp(kg)}")
         print("Database setup complete!")
         
     except Exception as e:
@@ -164,5 +834,141 @@ def setup_database():
             kg.refresh_schema()
         raise
 
+def positive_int(value):
+    """argparse type for sizes that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load UBC course data into Neo4j")
+    parser.add_argument(
+        '--batch-size', type=positive_int, default=INGEST_BATCH_SIZE,
+        help="courses written per transaction (1 writes row by row)"
+    )
+    parser.add_argument(
+        '--embedding-batch-size', type=positive_int, default=EMBEDDING_BATCH_SIZE,
+        help="descriptions sent per embedding request"
+    )
+    parser.add_argument(
+        '--embedding-max-tokens', type=positive_int, default=EMBEDDING_MAX_TOKENS,
+        help="estimated token budget per embedding request"
+    )
+    parser.add_argument(
+        '--no-embedding-cache', action='store_true',
+        help="always call the embedding provider instead of the local cache"
+    )
+    subparsers = parser.add_subparsers(dest='command')
+
+    snapshot_parser = subparsers.add_parser(
+        'export-snapshot', help="write a memory-mappable embedding snapshot"
+    )
+    snapshot_parser.add_argument('--path', default=SNAPSHOT_PATH, help="snapshot directory")
+    snapshot_parser.add_argument(
+        '--dtype', choices=SNAPSHOT_DTYPES, default='float32',
+        help="storage precision of the embedding matrix"
+    )
+    snapshot_parser.add_argument(
+        '--compact-dimensions', type=int, default=COMPACT_DIMENSIONS,
+        help="leading dimensions kept for two-stage search (0 skips compact vectors)"
+    )
+    snapshot_parser.add_argument(
+        '--compact-dtype', choices=COMPACT_DTYPES, default=COMPACT_DTYPE,
+        help="storage precision of the compact vectors"
+    )
+
+    sync_parser = subparsers.add_parser(
+        'sync', help="apply only CSV rows that changed since the last sync"
+    )
+    sync_parser.add_argument(
+        '--manifest', default=INGEST_MANIFEST_PATH, help="row-hash manifest from the last sync"
+    )
+
+    stream_parser = subparsers.add_parser(
+        'stream', help="load the CSV through the streaming ingestion pipeline"
+    )
+    stream_parser.add_argument(
+        '--chunk-size', type=positive_int, default=None, help="CSV rows read per chunk"
+    )
+
+    retry_parser = subparsers.add_parser(
+        'retry-embeddings', help="re-run courses whose embedding failed in an earlier run"
+    )
+    retry_parser.add_argument(
+        '--queue', default=EMBEDDING_RETRY_QUEUE_PATH, help="retry queue written by failed runs"
+    )
+
+    export_graph_parser = subparsers.add_parser(
+        'export-graph', help="back up the whole course graph to a Parquet snapshot"
+    )
+    export_graph_parser.add_argument('--path', default=GRAPH_SNAPSHOT_PATH, help="snapshot directory")
+    export_graph_parser.add_argument(
+        '--page-size', type=positive_int, default=GRAPH_EXPORT_PAGE_SIZE, help="courses read per query"
+    )
+
+    restore_graph_parser = subparsers.add_parser(
+        'restore-graph', help="load a Parquet graph snapshot written by export-graph"
+    )
+    restore_graph_parser.add_argument('--path', default=GRAPH_SNAPSHOT_PATH, help="snapshot directory")
+    restore_graph_parser.add_argument(
+        '--restore-batch-size', type=positive_int, default=GRAPH_RESTORE_BATCH_SIZE,
+        help="courses per UNWIND transaction"
+    )
+    restore_graph_parser.add_argument(
+        '--relationship-batch-size', type=positive_int, default=GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE,
+        help="relationships per UNWIND transaction"
+    )
+
+    args = parser.parse_args(argv)
+    if args.command == 'export-graph':
+        export_graph_snapshot(path=args.path, page_size=args.page_size)
+        return
+    if args.command == 'restore-graph':
+        restore_graph_snapshot(
+            path=args.path, batch_size=args.restore_batch_size,
+            relationship_batch_size=args.relationship_batch_size
+        )
+        return
+    if args.command == 'retry-embeddings':
+        retry_embeddings(
+            retry_queue_path=args.queue,
+            embedding_batch_size=args.embedding_batch_size,
+            embedding_max_tokens=args.embedding_max_tokens,
+            use_embedding_cache=not args.no_embedding_cache
+        )
+        return
+    if args.command == 'stream':
+        stream_database(
+            batch_size=args.batch_size,
+            chunk_size=args.chunk_size,
+            embedding_batch_size=args.embedding_batch_size,
+            embedding_max_tokens=args.embedding_max_tokens,
+            use_embedding_cache=not args.no_embedding_cache
+        )
+        return
+    if args.command == 'export-snapshot':
+        export_snapshot(
+            path=args.path, dtype=args.dtype,
+            compact_dimensions=args.compact_dimensions, compact_dtype=args.compact_dtype
+        )
+        return
+    if args.command == 'sync':
+        sync_database(
+            batch_size=args.batch_size,
+            manifest_path=args.manifest,
+            embedding_batch_size=args.embedding_batch_size,
+            embedding_max_tokens=args.embedding_max_tokens,
+            use_embedding_cache=not args.no_embedding_cache
+        )
+        return
+
+    setup_database(
+        batch_size=args.batch_size,
+        embedding_batch_size=args.embedding_batch_size,
+        embedding_max_tokens=args.embedding_max_tokens,
+        use_embedding_cache=not args.no_embedding_cache
+    )
+
 if __name__ == "__main__":
-    setup_database()
+    main()
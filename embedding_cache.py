@@ -0,0 +1,191 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Default location and size limit of the on-disk embedding cache
+EMBEDDING_CACHE_PATH = os.getenv(
+    'EMBEDDING_CACHE_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'embeddings.sqlite')
+)
+EMBEDDING_CACHE_MAX_MB = float(os.getenv('EMBEDDING_CACHE_MAX_MB', 512))
+
+
+def normalize_text(text):
+    """Collapse whitespace so formatting-only edits map to the same cache entry"""
+    return ' '.join(text.split())
+
+
+def text_hash(text):
+    """Content hash of the normalized text, used as the cache key"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache stored in SQLite as float32 blobs.
+    Entries are keyed by (model, dimension, text hash) and the least recently
+    used ones are evicted once the stored vectors exceed max_bytes.
+    """
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH, model='default', dimension=1536,
+                 max_bytes=int(EMBEDDING_CACHE_MAX_MB * 1024 * 1024)):
+        self.path = path
+        self.model = model
+        self.dimension = dimension
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                dimension INTEGER NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, dimension, text_hash)
+            )
+        """)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)"
+        )
+        # Bytes of stored vectors, shared by every process using this file and
+        # updated in the same transaction as each insert and eviction
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_size (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_bytes INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO cache_size (id, total_bytes) "
+            "SELECT 0, COALESCE(SUM(length(vector)), 0) FROM embeddings"
+        )
+        self._conn.commit()
+
+    def get_many(self, hashes):
+        """
+        Look up cached vectors
+        Args:
+            hashes: text hashes as returned by text_hash
+        Returns:
+            Dict mapping each cached hash to its vector as a list of floats
+        """
+        hashes = list(dict.fromkeys(hashes))
+        found = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})",
+                    [self.model, self.dimension, *chunk]
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? "
+                    "WHERE model = ? AND dimension = ? AND text_hash = ?",
+                    [(now, self.model, self.dimension, key) for key in found]
+                )
+                self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(hashes) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store (text hash, vector) pairs and evict old entries if over the size limit"""
+        now = time.time()
+        blobs = {key: np.asarray(vector, dtype=np.float32).tobytes() for key, vector in items}
+        rows = [(self.model, self.dimension, key, blob, now) for key, blob in blobs.items()]
+        with self._lock:
+            # Take the write lock up front so no other process changes the
+            # size between reading the replaced rows and updating the total
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Replaced entries give back their old size
+                added = sum(len(blob) for blob in blobs.values())
+                keys = list(blobs)
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    added -= self._conn.execute(
+                        f"SELECT COALESCE(SUM(length(vector)), 0) FROM embeddings "
+                        f"WHERE model = ? AND dimension = ? AND text_hash IN ({placeholders})",
+                        [self.model, self.dimension, *chunk]
+                    ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, dimension, text_hash, vector, last_used) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._conn.execute(
+                    "UPDATE cache_size SET total_bytes = total_bytes + ? WHERE id = 0", (added,)
+                )
+                self._evict()
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes.
+        Runs inside the caller's transaction so the shared total stays exact.
+        """
+        size = self._size_bytes()
+        total = size
+        while total > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT rowid, length(vector) FROM embeddings ORDER BY last_used LIMIT 256"
+            ).fetchall()
+            if not rows:
+                total = 0
+                break
+            victims = []
+            for rowid, length in rows:
+                victims.append((rowid,))
+                total -= length
+                if total <= self.max_bytes:
+                    break
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+            self.evictions += len(victims)
+        if total != size:
+            self._conn.execute("UPDATE cache_size SET total_bytes = ? WHERE id = 0", (total,))
+
+    def _size_bytes(self):
+        return self._conn.execute("SELECT total_bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters for this session plus the current size on disk"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            size_bytes = self._size_bytes()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'size_bytes': size_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,270 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Provider quota the executor paces itself to, and how hard it retries
+EMBEDDING_CONCURRENCY = int(os.getenv('EMBEDDING_CONCURRENCY', 4))
+EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv('EMBEDDING_REQUESTS_PER_MINUTE', 3000))
+EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv('EMBEDDING_TOKENS_PER_MINUTE', 1000000))
+EMBEDDING_MAX_RETRIES = int(os.getenv('EMBEDDING_MAX_RETRIES', 6))
+# Courses whose embedding failed for good, re-run with `db_setup.py retry-embeddings`
+EMBEDDING_RETRY_QUEUE_PATH = os.getenv(
+    'EMBEDDING_RETRY_QUEUE_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'embedding_retry.json')
+)
+RETRY_QUEUE_FORMAT_VERSION = 1
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+# Client errors the OpenAI SDK raises without an HTTP status attached
+RETRYABLE_ERROR_NAMES = {
+    'APIConnectionError', 'APITimeoutError', 'RateLimitError',
+    'ConnectError', 'ConnectTimeout', 'ReadTimeout', 'Timeout',
+}
+
+
+def status_code(error):
+    """HTTP status attached to a provider error, if any"""
+    code = getattr(error, 'status_code', None)
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(error):
+    """Rate limits, server errors and timeouts are retried; anything else is final"""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES or code >= 500
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, from a Retry-After header"""
+    headers = getattr(getattr(error, 'response', None), 'headers', None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=0.5, cap=60.0):
+    """Exponential backoff with full jitter for the given retry attempt (0-based)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at `rate_per_minute`. `acquire` blocks
+    until enough tokens are available, so callers are paced to the rate instead
+    of bursting into the provider's limit.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        # Ten seconds of burst by default: enough to keep every worker busy
+        # without spending a whole minute's quota at once
+        self.capacity = capacity or max(1.0, rate_per_minute / 6.0)
+        self.tokens = self.capacity
+        self.waited_seconds = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount=1):
+        """Take `amount` tokens, capped at the bucket capacity, waiting if needed"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+
+class RetryQueue:
+    """
+    Courses whose embedding failed after every retry, persisted as JSON keyed
+    by course code so repeated failures of one course keep a single entry.
+    """
+
+    def __init__(self, path=EMBEDDING_RETRY_QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._items = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('formatVersion') != RETRY_QUEUE_FORMAT_VERSION:
+            print(f"Ignoring retry queue {self.path} with unknown format version")
+            return {}
+        return data['items']
+
+    def _save(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(
+                {'formatVersion': RETRY_QUEUE_FORMAT_VERSION, 'items': self._items},
+                f, indent=2, sort_keys=True
+            )
+        os.replace(tmp_path, self.path)
+
+    def __len__(self):
+        return len(self._items)
+
+    def codes(self):
+        with self._lock:
+            return list(self._items)
+
+    def add(self, courses, error):
+        """Record courses that failed, with the error and a running attempt count"""
+        now = time.time()
+        with self._lock:
+            for course in courses:
+                previous = self._items.get(course['courseCode'], {})
+                self._items[course['courseCode']] = {
+                    'error': f"{type(error).__name__}: {error}",
+                    'attempts': previous.get('attempts', 0) + 1,
+                    'failedAt': now,
+                }
+            self._save()
+
+    def remove(self, codes):
+        """Drop entries for courses that have since been embedded"""
+        with self._lock:
+            removed = [code for code in codes if self._items.pop(code, None) is not None]
+            if removed:
+                self._save()
+        return len(removed)
+
+    def prune(self, codes, since):
+        """Drop entries among `codes` that did not fail again after `since`"""
+        with self._lock:
+            stale = [
+                code for code in codes
+                if code in self._items and self._items[code]['failedAt'] < since
+            ]
+        return self.remove(stale)
+
+
+class EmbeddingExecutor:
+    """
+    Runs embedding requests on a thread pool, paced by token buckets on both
+    requests and tokens per minute. Retryable errors (429, 5xx, timeouts) back
+    off exponentially with jitter; a rate-limit response also pauses the other
+    workers so they do not pile onto the same limit. Batches that still fail
+    are returned to the caller and recorded in the retry queue.
+    """
+
+    def __init__(self, embeddings, concurrency=EMBEDDING_CONCURRENCY,
+                 requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+                 max_retries=EMBEDDING_MAX_RETRIES, retry_queue=None):
+        self.embeddings = embeddings
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.retry_queue = retry_queue
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.failures = 0
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _wait_for_pause(self):
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _pause(self, seconds):
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def embed(self, texts, tokens):
+        """
+        Embed one batch, retrying retryable errors
+        Args:
+            texts: strings sent in a single embed_documents call
+            tokens: estimated token count of the batch, charged to the TPM bucket
+        Returns:
+            One vector per text
+        """
+        attempt = 0
+        while True:
+            self._wait_for_pause()
+            self.request_bucket.acquire(1)
+            self.token_bucket.acquire(tokens)
+            with self._lock:
+                self.requests += 1
+            try:
+                return self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e) or backoff_delay(attempt)
+                with self._lock:
+                    self.retries += 1
+                    if status_code(e) == 429:
+                        self.rate_limited += 1
+                if status_code(e) == 429:
+                    self._pause(delay)
+                attempt += 1
+                time.sleep(delay)
+
+    def run(self, batches, texts, tokens, on_result):
+        """
+        Embed batches concurrently
+        Args:
+            batches: lists of items to embed
+            texts: function mapping a batch to the strings to embed
+            tokens: function mapping a batch to its estimated token count
+            on_result: called from a worker thread with (batch, vectors); an
+                exception here fails the batch like a provider error would
+        Returns:
+            List of (batch, exception) for the batches that failed
+        """
+        def work(batch):
+            try:
+                on_result(batch, self.embed(texts(batch), tokens(batch)))
+            except Exception as e:
+                return batch, e
+            return None
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            failed = [result for result in pool.map(work, batches) if result is not None]
+        with self._lock:
+            self.failures += len(failed)
+        return failed
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'retries': self.retries,
+            'rate_limited': self.rate_limited,
+            'failed_batches': self.failures,
+            'request_wait_seconds': round(self.request_bucket.waited_seconds, 2),
+            'token_wait_seconds': round(self.token_bucket.waited_seconds, 2),
+        }
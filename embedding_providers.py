@@ -0,0 +1,281 @@
+from dotenv import load_dotenv
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+from lexical_index import tokenize
+
+load_dotenv('.env', override=True)
+OPENAI_API_KEY = os.getenv('OPENAIAPIKEY')
+# 'openai' calls the OpenAI API; 'local' runs a TF-IDF + SVD model fitted on
+# the course catalog; 'hashing' is the feature-hashing stand-in from offline.py
+EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'openai')
+EMBEDDING_PROVIDERS = ('openai', 'local', 'hashing')
+OPENAI_EMBEDDING_DIMENSIONS = int(os.getenv('OPENAI_EMBEDDING_DIMENSIONS', 1536))
+HASHING_EMBEDDING_DIMENSIONS = int(os.getenv('HASHING_EMBEDDING_DIMENSIONS', 1536))
+# Fitted local model directory, its output dimension, and vocabulary limits
+LOCAL_EMBEDDING_PATH = os.getenv(
+    'LOCAL_EMBEDDING_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'local_embeddings')
+)
+LOCAL_EMBEDDING_DIMENSIONS = int(os.getenv('LOCAL_EMBEDDING_DIMENSIONS', 256))
+LOCAL_EMBEDDING_MAX_FEATURES = int(os.getenv('LOCAL_EMBEDDING_MAX_FEATURES', 100000))
+LOCAL_EMBEDDING_MIN_DF = int(os.getenv('LOCAL_EMBEDDING_MIN_DF', 2))
+
+LOCAL_FORMAT_VERSION = 1
+LOCAL_MANIFEST_FILE = 'manifest.json'
+LOCAL_VOCABULARY_FILE = 'vocabulary.json'
+LOCAL_ARRAYS_FILE = 'model.npz'
+
+
+def local_terms(text):
+    """Unigram and bigram terms of a text, with course codes joined"""
+    words = tokenize(text)
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+class LocalEmbeddings:
+    """
+    CPU-only embeddings from a TF-IDF model with a truncated SVD projection,
+    fitted on the course catalog. A text's sublinear TF-IDF vector is
+    multiplied by the (terms, dimensions) projection and normalized, so a
+    query costs a few dictionary lookups and one small matrix product.
+    Implements the embed_documents / embed_query interface of OpenAIEmbeddings.
+    """
+
+    def __init__(self, vocabulary, idf, projection, fingerprint=''):
+        """
+        Args:
+            vocabulary: term -> column
+            idf: (terms,) inverse document frequencies
+            projection: (terms, dimensions) float32 SVD components
+            fingerprint: identifies the fit, so cached vectors from another fit are not reused
+        """
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.projection = np.ascontiguousarray(projection, dtype=np.float32)
+        self.dimensions = self.projection.shape[1]
+        self.fingerprint = fingerprint
+        self.model = f"local-tfidf-svd-{self.dimensions}-{fingerprint}"
+
+    def _term_weights(self, text):
+        counts = Counter(
+            self.vocabulary[term] for term in local_terms(text) if term in self.vocabulary
+        )
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        columns = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        weights = (1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts))))
+        weights *= self.idf[columns]
+        return columns, weights / np.linalg.norm(weights)
+
+    def _tfidf_matrix(self, texts):
+        from scipy.sparse import csr_matrix
+
+        indptr, indices, data = [0], [], []
+        for text in texts:
+            columns, weights = self._term_weights(text)
+            indices.append(columns)
+            data.append(weights)
+            indptr.append(indptr[-1] + len(columns))
+        return csr_matrix(
+            (np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+             np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+             indptr),
+            shape=(len(texts), len(self.vocabulary))
+        )
+
+    @staticmethod
+    def _normalize(vectors):
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def embed_documents(self, texts):
+        """Embed a batch with one sparse-dense matrix product"""
+        if not texts:
+            return []
+        vectors = self._tfidf_matrix(texts) @ self.projection
+        return self._normalize(np.asarray(vectors, dtype=np.float32)).tolist()
+
+    def embed_query(self, text):
+        columns, weights = self._term_weights(text)
+        vector = weights @ self.projection[columns] if len(columns) else np.zeros(self.dimensions, dtype=np.float32)
+        return self._normalize(vector).tolist()
+
+    @classmethod
+    def fit(cls, texts, dimensions=LOCAL_EMBEDDING_DIMENSIONS, max_features=LOCAL_EMBEDDING_MAX_FEATURES,
+            min_df=LOCAL_EMBEDDING_MIN_DF):
+        """
+        Fit the vocabulary, IDF weights and SVD projection on a corpus
+        Args:
+            texts: course descriptions (the same texts db_setup.py embeds)
+            dimensions: output dimension, capped by the corpus and vocabulary size
+            max_features: most frequent terms kept
+            min_df: terms in fewer documents are dropped
+        """
+        from scipy.sparse.linalg import svds
+
+        texts = [text if isinstance(text, str) else '' for text in texts]
+        document_frequency = Counter()
+        for text in texts:
+            document_frequency.update(set(local_terms(text)))
+        terms = [term for term, df in document_frequency.items() if df >= min_df]
+        terms.sort(key=lambda term: (-document_frequency[term], term))
+        terms = sorted(terms[:max_features])
+        if not terms:
+            raise ValueError("No terms left to fit the local embeddings on")
+        vocabulary = {term: column for column, term in enumerate(terms)}
+        df = np.array([document_frequency[term] for term in terms], dtype=np.float32)
+        idf = np.log((1.0 + len(texts)) / (1.0 + df)) + 1.0
+
+        # Weight the corpus exactly as inference will, then factorize it
+        matrix = cls(vocabulary, idf, np.zeros((len(terms), 1), dtype=np.float32))._tfidf_matrix(texts)
+        k = max(1, min(dimensions, min(matrix.shape) - 1))
+        _, singular_values, components = svds(matrix.astype(np.float64), k=k)
+        # svds returns ascending singular values; keep the strongest first
+        order = np.argsort(-singular_values)
+        projection = components[order].T.astype(np.float32)
+
+        digest = hashlib.blake2b(digest_size=6)
+        digest.update(json.dumps(terms).encode('utf-8'))
+        digest.update(projection.tobytes())
+        return cls(vocabulary, idf, projection, fingerprint=digest.hexdigest())
+
+    def save(self, path=LOCAL_EMBEDDING_PATH):
+        """Write the model directory, swapped in atomically"""
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        with open(os.path.join(tmp_path, LOCAL_VOCABULARY_FILE), 'w', encoding='utf-8') as f:
+            json.dump(terms, f, ensure_ascii=False, separators=(',', ':'))
+        np.savez(os.path.join(tmp_path, LOCAL_ARRAYS_FILE), idf=self.idf, projection=self.projection)
+        with open(os.path.join(tmp_path, LOCAL_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+            json.dump({
+                'formatVersion': LOCAL_FORMAT_VERSION,
+                'createdAt': time.time(),
+                'terms': len(terms),
+                'dimensions': self.dimensions,
+                'fingerprint': self.fingerprint,
+            }, f, indent=2)
+
+        old_path = f"{path}.old-{os.getpid()}"
+        if os.path.exists(path):
+            os.rename(path, old_path)
+        os.rename(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path=LOCAL_EMBEDDING_PATH):
+        with open(os.path.join(path, LOCAL_MANIFEST_FILE), encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('formatVersion') != LOCAL_FORMAT_VERSION:
+            raise ValueError(
+                f"Local embeddings {path} have format version {manifest.get('formatVersion')}, "
+                f"expected {LOCAL_FORMAT_VERSION}"
+            )
+        with open(os.path.join(path, LOCAL_VOCABULARY_FILE), encoding='utf-8') as f:
+            terms = json.load(f)
+        arrays = np.load(os.path.join(path, LOCAL_ARRAYS_FILE))
+        return cls(
+            {term: column for column, term in enumerate(terms)},
+            arrays['idf'], arrays['projection'], fingerprint=manifest['fingerprint']
+        )
+
+
+def create_embeddings(provider=EMBEDDING_PROVIDER, local_path=LOCAL_EMBEDDING_PATH, **openai_options):
+    """
+    Embeddings client for the configured provider
+    Args:
+        provider: 'openai', 'local' or 'hashing'
+        local_path: fitted model directory for the local provider
+        openai_options: extra OpenAIEmbeddings arguments (max_retries, http_client, ...)
+    """
+    if provider == 'openai':
+        from langchain_openai import OpenAIEmbeddings
+
+        return OpenAIEmbeddings(api_key=OPENAI_API_KEY, **openai_options)
+    if provider == 'local':
+        if not os.path.exists(local_path):
+            raise FileNotFoundError(
+                f"No local embedding model at {local_path}; fit one with "
+                f"'python embedding_providers.py fit'"
+            )
+        return LocalEmbeddings.load(local_path)
+    if provider == 'hashing':
+        from offline import HashingEmbeddings
+
+        return HashingEmbeddings(HASHING_EMBEDDING_DIMENSIONS)
+    raise ValueError(f"Unknown embedding provider: {provider}")
+
+
+def embedding_model_name(embeddings):
+    """Name used to key cached vectors for an embeddings client"""
+    return getattr(embeddings, 'model', None) or type(embeddings).__name__
+
+
+def embedding_dimensions(embeddings):
+    """Vector size an embeddings client produces, for the Neo4j vector index"""
+    return getattr(embeddings, 'dimensions', None) or OPENAI_EMBEDDING_DIMENSIONS
+
+
+def fit_local_embeddings(texts, path=LOCAL_EMBEDDING_PATH, dimensions=LOCAL_EMBEDDING_DIMENSIONS):
+    """Fit the local provider on course descriptions and save it"""
+    start = time.perf_counter()
+    embeddings = LocalEmbeddings.fit(texts, dimensions=dimensions)
+    embeddings.save(path)
+    print(
+        f"Fitted {embeddings.dimensions}-dimension local embeddings on {len(texts)} texts "
+        f"({len(embeddings.vocabulary)} terms) in {time.perf_counter() - start:.1f}s, saved to {path}"
+    )
+    return embeddings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fit and time the local embedding provider")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    fit_parser = subparsers.add_parser('fit', help="fit TF-IDF + SVD embeddings on the course CSV")
+    fit_parser.add_argument('--csv', help="course CSV (default: the one db_setup.py loads)")
+    fit_parser.add_argument('--path', default=LOCAL_EMBEDDING_PATH)
+    fit_parser.add_argument('--dimensions', type=int, default=LOCAL_EMBEDDING_DIMENSIONS)
+    time_parser = subparsers.add_parser('time', help="per-query and batch embedding latency")
+    time_parser.add_argument('--provider', choices=EMBEDDING_PROVIDERS, default='local')
+    time_parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'fit':
+        from db_setup import COURSES_CSV_PATH, read_courses_csv
+
+        courses_df = read_courses_csv(args.csv or COURSES_CSV_PATH)
+        fit_local_embeddings(courses_df['description'].tolist(), path=args.path, dimensions=args.dimensions)
+        return
+
+    embeddings = create_embeddings(args.provider)
+    questions = [f"introduction to topic {i} with statistics and data analysis" for i in range(args.queries)]
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        embeddings.embed_query(question)
+        latencies.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    embeddings.embed_documents(questions)
+    batch_seconds = time.perf_counter() - start
+    json.dump({
+        'provider': args.provider,
+        'dimensions': embedding_dimensions(embeddings),
+        'query_p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'query_p95_ms': float(np.percentile(latencies, 95) * 1000),
+        'batch_texts_per_second': len(questions) / batch_seconds if batch_seconds > 0 else 0.0,
+    }, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+from catalog import CourseCatalog
+from vector_search import normalize_rows
+
+SNAPSHOT_FORMAT_VERSION = 1
+SNAPSHOT_DTYPES = ('float32', 'float16')
+
+# Default snapshot directory shared by every app process on the host
+SNAPSHOT_PATH = os.getenv(
+    'SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'snapshot')
+)
+
+MANIFEST_FILE = 'manifest.json'
+EMBEDDINGS_FILE = 'embeddings.bin'
+CODES_FILE = 'codes.bin'
+OFFSETS_FILE = 'codes.offsets'
+METADATA_FILE = 'metadata.json'
+COMPACT_FILE = 'compact.bin'
+COMPACT_SCALES_FILE = 'compact.scales'
+
+
+def write_snapshot(catalog, path=SNAPSHOT_PATH, dtype='float32', dataset_stamp=None,
+                   compact_dimensions=0, compact_dtype='int8'):
+    """
+    Write the catalog as a memory-mappable snapshot directory
+    Args:
+        catalog: CourseCatalog with an embedding matrix
+        path: snapshot directory, replaced atomically if it already exists
+        dtype: 'float32' or 'float16' storage for the unit-length vectors
+        dataset_stamp: dataset version the catalog was read at, for result caching
+        compact_dimensions: also store vectors truncated to this many leading
+            dimensions for two-stage search (0 skips them)
+        compact_dtype: 'int8', 'float16' or 'float32' storage for the compact vectors
+    Returns:
+        The manifest dict written alongside the data files
+    """
+    if dtype not in SNAPSHOT_DTYPES:
+        raise ValueError(f"Unsupported snapshot dtype: {dtype}")
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    matrix = normalize_rows(catalog.embeddings).astype(dtype)
+    matrix.tofile(os.path.join(tmp_path, EMBEDDINGS_FILE))
+
+    # Course codes as one UTF-8 blob plus int64 offsets, so the ID table can
+    # also be mapped without parsing
+    encoded = [code.encode('utf-8') for code in catalog.codes]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(code) for code in encoded])
+    offsets.tofile(os.path.join(tmp_path, OFFSETS_FILE))
+    with open(os.path.join(tmp_path, CODES_FILE), 'wb') as f:
+        f.write(b''.join(encoded))
+
+    with open(os.path.join(tmp_path, METADATA_FILE), 'w', encoding='utf-8') as f:
+        json.dump(
+            {
+                'names': catalog.names,
+                'descriptions': catalog.descriptions,
+                'attributes': catalog.attributes,
+            },
+            f, ensure_ascii=False, separators=(',', ':')
+        )
+
+    compact = None
+    if compact_dimensions and matrix.shape[0]:
+        from compact_index import compact_vectors
+
+        compact_codes, compact_scales = compact_vectors(matrix, compact_dimensions, compact_dtype)
+        compact_codes.tofile(os.path.join(tmp_path, COMPACT_FILE))
+        if compact_scales is not None:
+            compact_scales.tofile(os.path.join(tmp_path, COMPACT_SCALES_FILE))
+        compact = {'dimension': int(compact_codes.shape[1]), 'dtype': compact_dtype}
+
+    manifest = {
+        'formatVersion': SNAPSHOT_FORMAT_VERSION,
+        'createdAt': time.time(),
+        'count': int(matrix.shape[0]),
+        'dimension': int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+        'dtype': dtype,
+        'normalized': True,
+        'datasetStamp': dataset_stamp,
+        'compact': compact,
+    }
+    with open(os.path.join(tmp_path, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory into place so readers never see a partial snapshot
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(path=SNAPSHOT_PATH):
+    with open(os.path.join(path, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('formatVersion') != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Snapshot {path} has format version {manifest.get('formatVersion')}, "
+            f"expected {SNAPSHOT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def load_snapshot(path=SNAPSHOT_PATH):
+    """
+    Open a snapshot with its embedding matrix memory-mapped read-only, so every
+    process on the host shares the same page-cache pages
+    Returns:
+        CourseCatalog whose embeddings are unit-length rows
+    """
+    manifest = read_manifest(path)
+    count, dimension = manifest['count'], manifest['dimension']
+
+    if count:
+        embeddings = np.memmap(
+            os.path.join(path, EMBEDDINGS_FILE),
+            dtype=manifest['dtype'], mode='r', shape=(count, dimension)
+        )
+    else:
+        embeddings = np.zeros((0, dimension), dtype=manifest['dtype'])
+
+    offsets = np.fromfile(os.path.join(path, OFFSETS_FILE), dtype=np.int64)
+    with open(os.path.join(path, CODES_FILE), 'rb') as f:
+        blob = f.read()
+    codes = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(count)]
+
+    with open(os.path.join(path, METADATA_FILE), encoding='utf-8') as f:
+        metadata = json.load(f)
+
+    return CourseCatalog(
+        codes, metadata['names'], metadata['descriptions'], embeddings,
+        metadata.get('attributes')
+    )
+
+
+def load_compact(path=SNAPSHOT_PATH):
+    """
+    Memory-map the snapshot's compact vectors
+    Returns:
+        (codes, scales) as written by compact_index.compact_vectors, or None
+        if the snapshot was exported without them
+    """
+    manifest = read_manifest(path)
+    compact = manifest.get('compact')
+    if not compact:
+        return None
+    codes = np.memmap(
+        os.path.join(path, COMPACT_FILE),
+        dtype=compact['dtype'], mode='r', shape=(manifest['count'], compact['dimension'])
+    )
+    scales = None
+    if compact['dtype'] == 'int8':
+        scales = np.fromfile(os.path.join(path, COMPACT_SCALES_FILE), dtype=np.float32)
+    return codes, scales
@@ -0,0 +1,152 @@
+import os
+
+import numpy as np
+
+from query_cache import LRUCache
+
+# Blend weight of the graph score (0 turns reranking off), courses fetched for
+# the rerank, and personalized PageRank settings
+GRAPH_RERANK_WEIGHT = float(os.getenv('GRAPH_RERANK_WEIGHT', 0.3))
+GRAPH_RERANK_CANDIDATES = int(os.getenv('GRAPH_RERANK_CANDIDATES', 50))
+PAGERANK_DAMPING = float(os.getenv('PAGERANK_DAMPING', 0.85))
+PAGERANK_MAX_ITERATIONS = int(os.getenv('PAGERANK_MAX_ITERATIONS', 50))
+PAGERANK_TOLERANCE = float(os.getenv('PAGERANK_TOLERANCE', 1e-6))
+PAGERANK_CACHE_SIZE = int(os.getenv('PAGERANK_CACHE_SIZE', 1000))
+
+# Walk weights: mostly forward to the courses a course unlocks, sideways to
+# equivalents and corequisites, and a little back to prerequisites so courses
+# that share a prerequisite with a completed one are reached too
+EDGE_WEIGHTS = {
+    'unlocks': 1.0,
+    'equivalents': 1.0,
+    'coreqs': 0.5,
+    'prereqs': 0.2,
+}
+
+
+def csr_edges(csr):
+    """(sources, targets) arrays of a CSR adjacency from prereq_graph.build_csr"""
+    indptr, indices = csr
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr)), indices.astype(np.int64)
+
+
+class GraphRanker:
+    """
+    Personalized PageRank over the course relationship graph, seeded from the
+    courses a student has completed. The graph is a row-normalized SciPy
+    sparse transition matrix and each ranking is a vectorized power
+    iteration; rankings are cached per completed-course set.
+    """
+
+    def __init__(self, prereq_graph, damping=PAGERANK_DAMPING, max_iterations=PAGERANK_MAX_ITERATIONS,
+                 tolerance=PAGERANK_TOLERANCE, cache_size=PAGERANK_CACHE_SIZE):
+        from scipy.sparse import csr_matrix
+
+        self.graph = prereq_graph
+        self.damping = damping
+        self.max_iterations = max_iterations
+        self.tolerance = tolerance
+        self.cache = LRUCache(max_entries=cache_size)
+
+        num_nodes = len(prereq_graph)
+        sources, targets, weights = [], [], []
+        for name, csr in (
+            ('unlocks', prereq_graph.unlocks_csr),
+            ('equivalents', prereq_graph.equivalents_csr),
+            ('coreqs', prereq_graph.coreqs_csr),
+            ('prereqs', prereq_graph.prereqs_csr),
+        ):
+            edge_sources, edge_targets = csr_edges(csr)
+            sources.append(edge_sources)
+            targets.append(edge_targets)
+            weights.append(np.full(edge_sources.size, EDGE_WEIGHTS[name], dtype=np.float64))
+            if name == 'coreqs':
+                # Corequisites are taken together whichever way the CSV listed them
+                sources.append(edge_targets)
+                targets.append(edge_sources)
+                weights.append(weights[-1])
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        weights = np.concatenate(weights)
+
+        out_weight = np.bincount(sources, weights=weights, minlength=num_nodes)
+        self.dangling = out_weight == 0
+        # Transposed so one iteration is a single sparse matrix-vector product
+        self.transition_t = csr_matrix(
+            (weights / out_weight[sources], (targets, sources)), shape=(num_nodes, num_nodes)
+        )
+
+    def pagerank(self, completed):
+        """
+        Personalized PageRank of every course in the graph
+        Args:
+            completed: course codes the walk restarts from
+        Returns:
+            Array indexed by prerequisite-graph id, scaled so the best course
+            the student has not completed scores 1, or None if no completed
+            course is in the graph
+        """
+        key = frozenset(completed)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        seeds = self.graph.taken_ids(key)
+        if seeds.size == 0:
+            return None
+        restart = np.zeros(len(self.graph), dtype=np.float64)
+        restart[seeds] = 1.0 / seeds.size
+        rank = restart.copy()
+        for _ in range(self.max_iterations):
+            # Mass at courses with no outgoing edges jumps back to the seeds
+            leaked = rank[self.dangling].sum()
+            updated = (1.0 - self.damping) * restart + self.damping * (self.transition_t @ rank + leaked * restart)
+            converged = np.abs(updated - rank).sum() < self.tolerance
+            rank = updated
+            if converged:
+                break
+
+        # Completed courses need no recommending, so they get no boost
+        rank[seeds] = 0.0
+        top = rank.max()
+        if top > 0:
+            rank /= top
+        self.cache.put(key, rank)
+        return rank
+
+    def graph_scores(self, codes, completed):
+        """Graph score in [0, 1] for each course code (0 outside the graph)"""
+        rank = self.pagerank(completed)
+        if rank is None:
+            return np.zeros(len(codes))
+        ids = [self.graph.ids.get(code) for code in codes]
+        return np.array([0.0 if course_id is None else rank[course_id] for course_id in ids])
+
+    def rerank(self, results, completed, top_k, weight=GRAPH_RERANK_WEIGHT):
+        """
+        Blend search similarity with closeness to the completed courses
+        Args:
+            results: search_courses results, best first
+            completed: course codes the student has taken
+            top_k: results to keep
+            weight: share of the graph score in the blended score
+        Returns:
+            The top_k results by blended score; each keeps its original
+            score as 'similarity' and gains 'graphScore'. When no completed
+            course is in the graph or no result is near one, the top_k
+            results are returned unchanged.
+        """
+        graph_scores = self.graph_scores([result['courseCode'] for result in results], completed)
+        if not np.any(graph_scores):
+            return results[:top_k]
+        reranked = []
+        for result, graph_score in zip(results, graph_scores):
+            similarity = result['score']
+            reranked.append({
+                **result,
+                'score': float((1.0 - weight) * similarity + weight * graph_score),
+                'similarity': similarity,
+                'graphScore': float(graph_score),
+            })
+        reranked.sort(key=lambda result: -result['score'])
+        return reranked[:top_k]
@@ -0,0 +1,341 @@
+"""
+Columnar backup of the whole course graph.
+
+export_graph writes every Course node to courses.parquet (typed property
+columns plus the embedding as a fixed-size list of float32) and every
+PREREQ_OF, COREQ_WITH and EQUIVALENT_TO relationship to relationships.parquet.
+restore_graph loads them back with large UNWIND batches and recreates the
+vector index, without re-running the CSV ingest or any embedding call:
+
+    python db_setup.py export-graph --path backups/graph
+    python db_setup.py restore-graph --path backups/graph
+"""
+import json
+import math
+import os
+import shutil
+import time
+
+from prereq_graph import relationship_edges_query
+from result_cache import read_dataset_stamp, write_dataset_stamp
+
+# Default snapshot directory and rows per export page / restore transaction
+GRAPH_SNAPSHOT_PATH = os.getenv(
+    'GRAPH_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(__file__), '.cache', 'graph_snapshot')
+)
+GRAPH_EXPORT_PAGE_SIZE = int(os.getenv('GRAPH_EXPORT_PAGE_SIZE', 5000))
+GRAPH_RESTORE_BATCH_SIZE = int(os.getenv('GRAPH_RESTORE_BATCH_SIZE', 2000))
+GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE = int(os.getenv('GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE', 20000))
+
+GRAPH_SNAPSHOT_FORMAT_VERSION = 1
+GRAPH_MANIFEST_FILE = 'manifest.json'
+COURSES_FILE = 'courses.parquet'
+RELATIONSHIPS_FILE = 'relationships.parquet'
+RELATIONSHIP_TYPES = ('PREREQ_OF', 'COREQ_WITH', 'EQUIVALENT_TO')
+
+# Course properties written by db_setup.py and their column types. Anything
+# else on a node (or a value of another type) is kept in extraProperties as JSON.
+COURSE_COLUMNS = (
+    ('courseCode', 'string'),
+    ('id', 'string'),
+    ('campus', 'string'),
+    ('year', 'int64'),
+    ('name', 'string'),
+    ('description', 'string'),
+    ('credits', 'int64'),
+    ('isHonours', 'bool'),
+    ('restrictions', 'string'),
+    ('winterTerm1', 'bool'),
+    ('winterTerm2', 'bool'),
+    ('summerTerm1', 'bool'),
+    ('summerTerm2', 'bool'),
+    ('durationTerms', 'string'),
+    ('embeddingHash', 'string'),
+)
+COLUMN_PYTHON_TYPES = {'string': str, 'int64': int, 'bool': bool}
+
+# Every Course node, a page at a time in courseCode order
+export_course_page_query = """
+MATCH (course:Course)
+WHERE course.courseCode > $after
+RETURN course.courseCode AS courseCode, properties(course) AS properties
+ORDER BY course.courseCode
+LIMIT $limit
+"""
+
+embedding_dimension_query = """
+MATCH (course:Course)
+WHERE course.embedding IS NOT NULL
+RETURN size(course.embedding) AS dimension
+LIMIT 1
+"""
+
+restore_courses_query = """
+UNWIND $rows AS row
+MERGE (course:Course {courseCode: row.courseCode})
+SET course += row.properties
+"""
+
+# Relationship types cannot be parameters, so there is one statement per type
+restore_relationship_queries = {
+    relationship: """
+UNWIND $rows AS row
+MATCH (source:Course {courseCode: row.source})
+MATCH (target:Course {courseCode: row.target})
+MERGE (source)-[:%s]->(target)
+""" % relationship
+    for relationship in RELATIONSHIP_TYPES
+}
+
+
+def _fits(value, column_type):
+    python_type = COLUMN_PYTHON_TYPES[column_type]
+    # bool is an int subclass, so check it explicitly
+    if column_type == 'int64' and isinstance(value, bool):
+        return False
+    return isinstance(value, python_type)
+
+
+def split_properties(properties, dimension):
+    """
+    Split a node's properties into typed column values, the embedding, and
+    the JSON text of any other properties (None if there are none). An
+    embedding of another dimension is kept with the other properties.
+    """
+    properties = dict(properties)
+    embedding = properties.get('embedding')
+    if embedding is not None and len(embedding) == dimension:
+        del properties['embedding']
+    else:
+        embedding = None
+    columns = {}
+    for name, column_type in COURSE_COLUMNS:
+        value = properties.get(name)
+        if value is None or _fits(value, column_type):
+            columns[name] = properties.pop(name, None)
+    extra = json.dumps(properties, ensure_ascii=False, default=str) if properties else None
+    return columns, embedding, extra
+
+
+def course_schema(dimension):
+    import pyarrow as pa
+
+    types = {'string': pa.string(), 'int64': pa.int64(), 'bool': pa.bool_()}
+    fields = [pa.field(name, types[column_type]) for name, column_type in COURSE_COLUMNS]
+    fields.append(pa.field('extraProperties', pa.string()))
+    fields.append(pa.field('hasEmbedding', pa.bool_()))
+    fields.append(pa.field('embedding', pa.list_(pa.float32(), dimension)))
+    return pa.schema(fields)
+
+
+def course_table(rows, schema, dimension):
+    """Arrow table for one page of exported nodes"""
+    import numpy as np
+    import pyarrow as pa
+
+    columns = {name: [] for name, _ in COURSE_COLUMNS}
+    extras = []
+    vectors = np.zeros((len(rows), dimension), dtype=np.float32)
+    has_embedding = np.zeros(len(rows), dtype=bool)
+    for i, row in enumerate(rows):
+        values, embedding, extra = split_properties(row['properties'], dimension)
+        for name in columns:
+            columns[name].append(values.get(name))
+        extras.append(extra)
+        if embedding is not None:
+            vectors[i] = embedding
+            has_embedding[i] = True
+
+    # Fixed-size list built straight from the contiguous float32 matrix. Missing
+    # embeddings are zero rows flagged by hasEmbedding rather than nulls, which
+    # Parquet readers do not handle in fixed-size lists.
+    embeddings = pa.FixedSizeListArray.from_arrays(pa.array(vectors.reshape(-1)), dimension)
+    arrays = [pa.array(columns[name], type=schema.field(name).type) for name, _ in COURSE_COLUMNS]
+    arrays.append(pa.array(extras, type=pa.string()))
+    arrays.append(pa.array(has_embedding))
+    arrays.append(embeddings)
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def export_graph(kg, path=GRAPH_SNAPSHOT_PATH, page_size=GRAPH_EXPORT_PAGE_SIZE):
+    """
+    Write every Course node and course relationship to a Parquet snapshot
+    Args:
+        kg: Neo4jGraph connection
+        path: snapshot directory, replaced atomically if it already exists
+        page_size: nodes read per query and written per row group
+    Returns:
+        The manifest dict
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    start = time.perf_counter()
+    stamp = read_dataset_stamp(kg)
+    rows = kg.query(embedding_dimension_query)
+    # Without any embeddings a one-wide, all-null column keeps the schema valid
+    dimension = int(rows[0]['dimension']) if rows else 1
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    schema = course_schema(dimension)
+    num_courses = 0
+    num_embeddings = 0
+    after = ''
+    with pq.ParquetWriter(os.path.join(tmp_path, COURSES_FILE), schema) as writer:
+        while True:
+            page = kg.query(export_course_page_query, params={'after': after, 'limit': page_size})
+            if page:
+                table = course_table(page, schema, dimension)
+                writer.write_table(table)
+                num_courses += len(page)
+                num_embeddings += sum(table.column('hasEmbedding').to_pylist())
+                print(f"Exported {num_courses} courses")
+            if len(page) < page_size:
+                break
+            after = page[-1]['courseCode']
+
+    edges = kg.query(relationship_edges_query)
+    relationships = pa.table({
+        'source': pa.array([edge['source'] for edge in edges], type=pa.string()),
+        'type': pa.array([edge['type'] for edge in edges], type=pa.string()).dictionary_encode(),
+        'target': pa.array([edge['target'] for edge in edges], type=pa.string()),
+    })
+    pq.write_table(relationships, os.path.join(tmp_path, RELATIONSHIPS_FILE))
+
+    manifest = {
+        'formatVersion': GRAPH_SNAPSHOT_FORMAT_VERSION,
+        'createdAt': time.time(),
+        'courses': num_courses,
+        'embeddings': num_embeddings,
+        'relationships': len(edges),
+        'dimension': dimension,
+        'datasetStamp': stamp,
+    }
+    with open(os.path.join(tmp_path, GRAPH_MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the finished directory into place so a restore never reads a partial export
+    old_path = f"{path}.old-{os.getpid()}"
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Exported {num_courses} courses ({num_embeddings} with embeddings) and "
+        f"{len(edges)} relationships to {path} in {elapsed:.1f}s"
+    )
+    return manifest
+
+
+def read_graph_manifest(path=GRAPH_SNAPSHOT_PATH):
+    with open(os.path.join(path, GRAPH_MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('formatVersion') != GRAPH_SNAPSHOT_FORMAT_VERSION:
+        raise ValueError(
+            f"Graph snapshot {path} has format version {manifest.get('formatVersion')}, "
+            f"expected {GRAPH_SNAPSHOT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def course_rows(batch):
+    """restore_courses_query rows for one Arrow record batch"""
+    import numpy as np
+
+    columns = {name: batch.column(name).to_pylist() for name, _ in COURSE_COLUMNS}
+    extras = batch.column('extraProperties').to_pylist()
+    embedding_column = batch.column('embedding')
+    # One flat float32 buffer for the batch instead of a Python list per value
+    vectors = embedding_column.flatten().to_numpy(zero_copy_only=False).reshape(len(batch), -1)
+    valid = batch.column('hasEmbedding').to_numpy(zero_copy_only=False)
+
+    rows = []
+    for i in range(len(batch)):
+        properties = {name: values[i] for name, values in columns.items() if values[i] is not None}
+        if extras[i]:
+            properties.update(json.loads(extras[i]))
+        if valid[i]:
+            properties['embedding'] = vectors[i].tolist()
+        rows.append({'courseCode': properties['courseCode'], 'properties': properties})
+    return rows
+
+
+def restore_graph(kg, path=GRAPH_SNAPSHOT_PATH, batch_size=GRAPH_RESTORE_BATCH_SIZE,
+                  relationship_batch_size=GRAPH_RESTORE_RELATIONSHIP_BATCH_SIZE):
+    """
+    Load a Parquet graph snapshot into Neo4j and recreate the vector index
+    Args:
+        kg: Neo4jGraph connection
+        path: directory written by export_graph
+        batch_size: nodes per UNWIND transaction
+        relationship_batch_size: relationships per UNWIND transaction
+    Returns:
+        Dict with counts, seconds and rows per second for each phase
+    """
+    import pyarrow.parquet as pq
+
+    # Imported here because db_setup.py imports this module for its commands
+    from db_setup import create_property_indexes, create_vector_index
+
+    manifest = read_graph_manifest(path)
+    start = time.perf_counter()
+    # Restore lookups and relationship MERGEs go through the course_code index
+    create_property_indexes(kg)
+
+    num_courses = 0
+    courses_file = pq.ParquetFile(os.path.join(path, COURSES_FILE))
+    for batch in courses_file.iter_batches(batch_size=batch_size):
+        kg.query(restore_courses_query, params={'rows': course_rows(batch)})
+        num_courses += len(batch)
+        print(f"Restored {num_courses}/{manifest['courses']} courses")
+    courses_done = time.perf_counter()
+
+    num_relationships = 0
+    relationships = pq.read_table(os.path.join(path, RELATIONSHIPS_FILE))
+    sources = relationships.column('source').to_pylist()
+    types = relationships.column('type').to_pylist()
+    targets = relationships.column('target').to_pylist()
+    by_type = {relationship: [] for relationship in RELATIONSHIP_TYPES}
+    for source, relationship, target in zip(sources, types, targets):
+        by_type[relationship].append({'source': source, 'target': target})
+    for relationship, rows in by_type.items():
+        for offset in range(0, len(rows), relationship_batch_size):
+            chunk = rows[offset:offset + relationship_batch_size]
+            kg.query(restore_relationship_queries[relationship], params={'rows': chunk})
+            num_relationships += len(chunk)
+        if rows:
+            print(f"Restored {len(rows)} {relationship} relationships")
+    relationships_done = time.perf_counter()
+
+    if manifest['embeddings']:
+        create_vector_index(kg, manifest['dimension'])
+    # The restored data may differ from what was there, so cached results are dropped
+    stamp = write_dataset_stamp(kg)
+    end = time.perf_counter()
+
+    course_seconds = courses_done - start
+    relationship_seconds = relationships_done - courses_done
+    summary = {
+        'courses': num_courses,
+        'relationships': num_relationships,
+        'course_seconds': course_seconds,
+        'courses_per_second': num_courses / course_seconds if course_seconds > 0 else math.inf,
+        'relationship_seconds': relationship_seconds,
+        'relationships_per_second': (
+            num_relationships / relationship_seconds if relationship_seconds > 0 else math.inf
+        ),
+        'total_seconds': end - start,
+        'dataset_stamp': stamp,
+    }
+    print(
+        f"Restored {num_courses} courses ({summary['courses_per_second']:.0f}/s) and "
+        f"{num_relationships} relationships ({summary['relationships_per_second']:.0f}/s) "
+        f"in {summary['total_seconds']:.1f}s; dataset version is now {stamp}"
+    )
+    return summary
@@ -0,0 +1,234 @@
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from db_setup import (
+    COURSES_CSV_PATH, EMBEDDING_BATCH_SIZE, EMBEDDING_MAX_TOKENS, INGEST_BATCH_SIZE,
+    create_embedding_executor, embed_courses, embedding_hash, ingest_courses_single, prepare_course_params,
+    upsert_course_batch_query
+)
+
+# Rows read from the CSV per chunk, and batches allowed to wait between stages
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', 1000))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 4))
+
+_END = object()
+
+
+class StageStats:
+    """Throughput counters for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, rows, seconds):
+        with self._lock:
+            self.rows += rows
+            self.batches += 1
+            self.busy_seconds += seconds
+
+    def summary(self, elapsed):
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'rows_per_second': self.rows / elapsed if elapsed > 0 else 0.0,
+            'busy_seconds': self.busy_seconds,
+        }
+
+
+class IngestPipeline:
+    """
+    Streams the course CSV into Neo4j through four concurrent stages joined by
+    bounded queues:
+
+        read CSV chunks -> parse/validate -> graph upsert -> embed + write-back
+
+    Each queue holds at most `queue_size` batches, so memory stays flat however
+    large the CSV is. Courses are written with the upsert query so the graph
+    holds the CSV text that gets embedded; descriptions whose stored hash
+    already matches are not re-embedded.
+    """
+
+    def __init__(self, kg, embeddings, csv_path=COURSES_CSV_PATH, chunk_size=INGEST_CHUNK_SIZE,
+                 batch_size=INGEST_BATCH_SIZE, embedding_batch_size=EMBEDDING_BATCH_SIZE,
+                 embedding_max_tokens=EMBEDDING_MAX_TOKENS, cache=None,
+                 queue_size=INGEST_QUEUE_SIZE, report_interval=5.0, executor=None):
+        self.kg = kg
+        self.embeddings = embeddings
+        self.csv_path = csv_path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_max_tokens = embedding_max_tokens
+        self.cache = cache
+        # One executor for the whole run, so every embed batch shares its rate limits
+        self.executor = executor or create_embedding_executor(embeddings)
+        self.report_interval = report_interval
+
+        self.queues = {
+            'parse': queue.Queue(maxsize=queue_size),
+            'write': queue.Queue(maxsize=queue_size),
+            'embed': queue.Queue(maxsize=queue_size),
+        }
+        self.max_depth = {name: 0 for name in self.queues}
+        self.stats = {name: StageStats(name) for name in ('read', 'parse', 'write', 'embed')}
+        self.invalid_rows = 0
+        self.failed_codes = []
+        self.embedded = 0
+        self._abort = threading.Event()
+        self._done = threading.Event()
+        self._errors = []
+
+    def _put(self, name, item):
+        """Block until the downstream queue has room, unless the run was aborted"""
+        q = self.queues[name]
+        while not self._abort.is_set():
+            try:
+                q.put(item, timeout=0.1)
+            except queue.Full:
+                continue
+            self.max_depth[name] = max(self.max_depth[name], q.qsize())
+            return
+
+    def _get(self, name):
+        q = self.queues[name]
+        while not self._abort.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def _run_stage(self, target, downstream):
+        """Run a stage, aborting the whole pipeline if it raises"""
+        try:
+            target()
+        except Exception as e:
+            self._errors.append(e)
+            self._abort.set()
+        finally:
+            if downstream is not None:
+                self._put(downstream, _END)
+
+    def _read(self):
+        for chunk in pd.read_csv(self.csv_path, chunksize=self.chunk_size):
+            self.stats['read'].record(len(chunk), 0.0)
+            self._put('parse', chunk)
+
+    def _parse(self):
+        pending = []
+        while True:
+            chunk = self._get('parse')
+            if chunk is _END:
+                break
+            start = time.perf_counter()
+            for _, row in chunk.iterrows():
+                code = row['course_code']
+                if not isinstance(code, str) or not code.strip():
+                    self.invalid_rows += 1
+                    continue
+                pending.append(prepare_course_params(row))
+                if len(pending) >= self.batch_size:
+                    self._put('write', pending)
+                    pending = []
+            self.stats['parse'].record(len(chunk), time.perf_counter() - start)
+        if pending:
+            self._put('write', pending)
+
+    def _write(self):
+        while True:
+            batch = self._get('write')
+            if batch is _END:
+                break
+            start = time.perf_counter()
+            try:
+                rows = self.kg.query(upsert_course_batch_query, params={"courseParams": batch})
+                stored_hashes = {row['courseCode']: row['embeddingHash'] for row in rows}
+            except Exception as e:
+                print(f"Batch of {len(batch)} courses failed ({e}); retrying row by row...")
+                failed, rows = ingest_courses_single(self.kg, batch, upsert_course_batch_query)
+                self.failed_codes.extend(failed)
+                batch = [course for course in batch if course['courseCode'] not in failed]
+                stored_hashes = {row['courseCode']: row['embeddingHash'] for row in rows}
+            self.stats['write'].record(len(batch), time.perf_counter() - start)
+
+            to_embed = [
+                {'courseCode': course['courseCode'], 'description': course['description']}
+                for course in batch
+                if isinstance(course['description'], str) and course['description'].strip()
+                and stored_hashes.get(course['courseCode']) != embedding_hash(self.embeddings, course['description'])
+            ]
+            if to_embed:
+                self._put('embed', to_embed)
+
+    def _embed(self):
+        while True:
+            courses = self._get('embed')
+            if courses is _END:
+                break
+            start = time.perf_counter()
+            self.embedded += embed_courses(
+                self.kg, self.embeddings, courses,
+                batch_size=self.embedding_batch_size,
+                max_tokens=self.embedding_max_tokens,
+                cache=self.cache,
+                executor=self.executor
+            )
+            self.stats['embed'].record(len(courses), time.perf_counter() - start)
+
+    def _report(self, started):
+        while not self._done.wait(self.report_interval):
+            elapsed = time.perf_counter() - started
+            rates = ', '.join(
+                f"{name} {stats.rows} ({stats.rows / elapsed:.0f}/s)" for name, stats in self.stats.items()
+            )
+            depths = ', '.join(
+                f"{name} {q.qsize()}/{q.maxsize}" for name, q in self.queues.items()
+            )
+            print(f"[pipeline] rows: {rates} | queues: {depths}")
+
+    def run(self):
+        """
+        Run every stage to completion
+        Returns:
+            Dict with per-stage throughput, peak queue depths and row counts
+        """
+        started = time.perf_counter()
+        stages = [
+            (self._read, 'parse'),
+            (self._parse, 'write'),
+            (self._write, 'embed'),
+            (self._embed, None),
+        ]
+        threads = [
+            threading.Thread(target=self._run_stage, args=stage, daemon=True)
+            for stage in stages
+        ]
+        reporter = threading.Thread(target=self._report, args=(started,), daemon=True)
+        reporter.start()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self._done.set()
+        reporter.join()
+
+        if self._errors:
+            raise self._errors[0]
+
+        elapsed = time.perf_counter() - started
+        return {
+            'elapsed_seconds': elapsed,
+            'stages': {name: stats.summary(elapsed) for name, stats in self.stats.items()},
+            'max_queue_depth': dict(self.max_depth),
+            'invalid_rows': self.invalid_rows,
+            'failed': len(self.failed_codes),
+            'embedded': self.embedded,
+        }
@@ -0,0 +1,120 @@
+import re
+from itertools import chain
+
+import numpy as np
+
+from vector_search import top_k_indices
+
+_TOKEN = re.compile(r'[a-z]+|\d+')
+# "CPSC 320", "cpsc320", "MATH 100A" -> one extra token for the whole code
+_COURSE_CODE = re.compile(r'\b([a-z]{2,5})\s*(\d{3}[a-z]?)\b')
+_DIGIT = re.compile(r'\d')
+
+# Field boosts applied as term-frequency multipliers
+CODE_WEIGHT = 3
+NAME_WEIGHT = 2
+DESCRIPTION_WEIGHT = 1
+
+
+def tokenize(text, join_codes=True):
+    """Lower-cased word and number tokens, plus a joined token for each course code"""
+    if not isinstance(text, str):
+        return []
+    text = text.lower()
+    tokens = _TOKEN.findall(text)
+    if join_codes and _DIGIT.search(text):
+        tokens.extend(subject + number for subject, number in _COURSE_CODE.findall(text))
+    return tokens
+
+
+class BM25Index:
+    """
+    BM25 inverted index over course code, name and description.
+    Postings are stored CSR-style: the postings of term t are
+    doc_ids[indptr[t]:indptr[t + 1]] with matching term_freqs.
+    """
+
+    def __init__(self, catalog, k1=1.2, b=0.75):
+        self.catalog = catalog
+        self.k1 = k1
+        self.b = b
+
+        num_docs = len(catalog)
+        # Descriptions skip joined course-code tokens: codes they mention still
+        # match on their subject and number tokens, and the extra pass is the
+        # slowest part of the build
+        fields = (
+            (catalog.codes, CODE_WEIGHT, True),
+            (catalog.names, NAME_WEIGHT, True),
+            (catalog.descriptions, DESCRIPTION_WEIGHT, False),
+        )
+        field_tokens = [
+            ([tokenize(text, join_codes) for text in texts], weight)
+            for texts, weight, join_codes in fields
+        ]
+        unique_tokens = dict.fromkeys(chain.from_iterable(
+            chain.from_iterable(token_lists) for token_lists, _ in field_tokens
+        ))
+        self.vocabulary = {token: term_id for term_id, token in enumerate(unique_tokens)}
+
+        term_parts, doc_parts, weight_parts = [], [], []
+        for token_lists, weight in field_tokens:
+            lengths = np.fromiter(map(len, token_lists), dtype=np.int64, count=num_docs)
+            total = int(lengths.sum())
+            term_parts.append(np.fromiter(
+                map(self.vocabulary.__getitem__, chain.from_iterable(token_lists)),
+                dtype=np.int64, count=total
+            ))
+            doc_parts.append(np.repeat(np.arange(num_docs, dtype=np.int64), lengths))
+            weight_parts.append(np.full(total, weight, dtype=np.float32))
+
+        terms = np.concatenate(term_parts)
+        docs = np.concatenate(doc_parts)
+        weights = np.concatenate(weight_parts)
+
+        # Sum the weighted occurrences of each (term, document) pair; sorting the
+        # combined key leaves postings grouped by term, ready for CSR slicing
+        pair_keys, pair_index = np.unique(terms * max(num_docs, 1) + docs, return_inverse=True)
+        term_ids = pair_keys // max(num_docs, 1)
+        self.doc_ids = (pair_keys % max(num_docs, 1)).astype(np.int32)
+        self.term_freqs = np.bincount(pair_index, weights=weights).astype(np.float32)
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.indptr[1:])
+        doc_lengths = np.bincount(docs, weights=weights, minlength=num_docs).astype(np.float32)
+
+        doc_freqs = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log(1.0 + (num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+        average_length = doc_lengths.mean() if num_docs else 1.0
+        # Per-document length normalization term of the BM25 denominator
+        self.length_norm = k1 * (1.0 - b + b * doc_lengths / max(average_length, 1e-9))
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def scores(self, question):
+        """BM25 score of every document for the query"""
+        scores = np.zeros(len(self.catalog), dtype=np.float32)
+        for token in set(tokenize(question)):
+            term_id = self.vocabulary.get(token)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1.0) / (tf + self.length_norm[docs])
+        return scores
+
+    def search(self, question, top_k=10, mask=None):
+        """
+        Rank catalog rows by BM25
+        Args:
+            mask: optional boolean array of catalog rows eligible to match
+        Returns:
+            Tuple of (row indices, scores), best first, excluding zero scores
+        """
+        scores = self.scores(question)
+        if mask is not None:
+            scores[~mask] = 0.0
+        indices = top_k_indices(scores, top_k)
+        indices = indices[scores[indices] > 0]
+        return indices, scores[indices]
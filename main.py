@@ -1,18 +1,8 @@
 from dotenv import load_dotenv
 import os
 
-# Common data processing
-import json
-import textwrap
-import pandas as pd
-
-# Langchain
-from langchain_community.graphs import Neo4jGraph
-from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.chains import RetrievalQAWithSourcesChain
-from langchain_openai import ChatOpenAI
+from db_setup import connect_embeddings, create_vector_index, embed_courses
+from embedding_providers import embedding_dimensions
 
 load_dotenv('.env', override=True)
 NEO4J_URI = os.getenv('NEO4J_URI')
@@ -29,17 +19,24 @@ VECTOR_EMBEDDING_PROPERTY = 'textEmbedding'
 
 # Load the CSV file using proper path handling
 csv_path = os.path.join(os.path.dirname(__file__), 'courses_info copy.csv')
-courses_df = pd.read_csv(csv_path)
 
-# Configure the text splitter
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size = 2000,
-    chunk_overlap  = 200,
-)
+def load_course_texts(csv_path=csv_path):
+    """Read the course CSV and split each course's combined text into documents"""
+    # pandas and the text splitter are only needed by this script's setup path
+    import pandas as pd
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
 
-# Prepare the course documents for splitting by combining all relevant information
-courses_texts = courses_df.apply(
-    lambda x: f"""ID: {x['id']}
+    courses_df = pd.read_csv(csv_path)
+
+    # Configure the text splitter
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size = 2000,
+        chunk_overlap  = 200,
+    )
+
+    # Prepare the course documents for splitting by combining all relevant information
+    courses_texts = courses_df.apply(
+        lambda x: f"""ID: {x['id']}
 Course Code: {x['course_code']}
 Campus: {x['campus']}
 Year: {x['year']}
@@ -60,11 +57,11 @@ Summer Term 1: {x['summer_term_1']}
 Summer Term 2: {x['summer_term_2']}
 Duration Terms: {x['duration_terms//']}
 Source: {x['source']}""",
-    axis=1
-).tolist()
+        axis=1
+    ).tolist()
 
-# Split the texts
-split_texts = text_splitter.create_documents(courses_texts)
+    # Split the texts
+    return courses_df, text_splitter.create_documents(courses_texts)
 
 # Neo4j Cypher query for creating course nodes and relationships
 merge_course_node_query = """
@@ -107,6 +104,8 @@ RETURN course
 
 # Prepare course data for Neo4j
 def prepare_course_params(row):
+    import pandas as pd
+
     return {
         "courseCode": row['course_code'],
         "id": row['id'],
@@ -127,36 +126,8 @@ def prepare_course_params(row):
         "equivalents": row['courses_in_equivalent_string'].split(',') if pd.notna(row['courses_in_equivalent_string']) else []
     }
 
-#Set up connection to graph instance using LangChain use the connection details from .env file
-kg = Neo4jGraph(
-    url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD, database=NEO4J_DATABASE
-)
-
-# Create vector index for course embeddings
-kg.query("""
-    CREATE VECTOR INDEX course_embeddings IF NOT EXISTS
-    FOR (c:Course) ON (c.embedding)
-    OPTIONS { indexConfig: {
-        `vector.dimensions`: 1536,
-        `vector.similarity_function`: 'cosine'
-    }}
-""")
-
-print("Vector index created successfully!")
-
-# Create course nodes and relationships in Neo4j
-for i, split_text in enumerate(split_texts):
-    course_data = prepare_course_params(courses_df.iloc[i])
-    kg.query(
-        merge_course_node_query, 
-        params={"courseParam": course_data}  # Wrap parameter in a params dictionary
-    )
-
-# Initialize OpenAI embeddings
-embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
-
 # Calculate embeddings for courses
-def update_embeddings():
+def update_embeddings(kg, embeddings):
     embedding_query = """
     MATCH (course:Course) 
     WHERE course.embedding IS NULL AND course.description IS NOT NULL
@@ -166,47 +137,15 @@ def update_embeddings():
     # Get courses needing embeddings
     courses_to_embed = kg.query(embedding_query)
     
-    for course in courses_to_embed:
-        if not course['description']:  # Skip if description is empty
-            continue
-            
-        try:
-            # Generate embedding using OpenAI
-            embedding_vector = embeddings.embed_query(course['description'])
-            
-            # Update course node with embedding
-            update_query = """
-            MATCH (course:Course {courseCode: $courseCode})
-            SET course.embedding = $embedding
-            """
-            
-            kg.query(
-                update_query,
-                params={
-                    "courseCode": course['courseCode'],
-                    "embedding": embedding_vector
-                }
-            )
-            print(f"Created embedding for {course['courseCode']}")
-        except Exception as e:
-            print(f"Error creating embedding for {course['courseCode']}: {e}")
-    
-    return len(courses_to_embed)
-
-try:
-    num_embeddings = update_embeddings()
-    print(f"Created embeddings for {num_embeddings} courses")
-except Exception as e:
-    print(f"Error creating embeddings: {e}")
-    print(f"Using API key: {'Present' if OPENAI_API_KEY else 'Missing'}")
+    # Embed in bulk and write each batch back in one statement
+    return embed_courses(kg, embeddings, courses_to_embed)
 
-print("Embeddings created successfully!")
-kg.refresh_schema()
-
-def neo4j_vector_search(question, top_k=10):
+def neo4j_vector_search(kg, embeddings, question, top_k=10):
     """
     Search for similar course nodes using the Neo4j vector index
     Args:
+        kg: Neo4jGraph connection
+        embeddings: embeddings client used for the question
         question: search query text
         top_k: number of similar results to return
     Returns:
@@ -234,12 +173,49 @@ def neo4j_vector_search(question, top_k=10):
         }
     )
 
-# Example usage:
-results = neo4j_vector_search("What is the teach machine learning?")
-for result in results:
-     print(f"Score: {result['score']}")
-     print(f"Course: {result['courseCode']} - {result['name']}")
-     print(f"Description: {result['description']}\n")
+def main():
+    # Heavy client libraries load here rather than when the module is imported
+    from langchain_community.graphs import Neo4jGraph
 
+    courses_df, split_texts = load_course_texts()
 
+    #Set up connection to graph instance using LangChain use the connection details from .env file
+    kg = Neo4jGraph(
+        url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD, database=NEO4J_DATABASE
+    )
 
+    # Initialize the configured embeddings provider (EMBEDDING_PROVIDER)
+    embeddings = connect_embeddings(fit_texts=courses_df['description'].tolist())
+
+    # Create vector index for course embeddings, sized for the provider
+    create_vector_index(kg, embedding_dimensions(embeddings))
+
+    print("Vector index created successfully!")
+
+    # Create course nodes and relationships in Neo4j
+    for i, split_text in enumerate(split_texts):
+        course_data = prepare_course_params(courses_df.iloc[i])
+        kg.query(
+            merge_course_node_query, 
+            params={"courseParam": course_data}  # Wrap parameter in a params dictionary
+        )
+
+    try:
+        num_embeddings = update_embeddings(kg, embeddings)
+        print(f"Created embeddings for {num_embeddings} courses")
+    except Exception as e:
+        print(f"Error creating embeddings: {e}")
+        print(f"Using API key: {'Present' if OPENAI_API_KEY else 'Missing'}")
+
+    print("Embeddings created successfully!")
+    kg.refresh_schema()
+
+    # Example usage:
+    results = neo4j_vector_search(kg, embeddings, "What is the teach machine learning?")
+    for result in results:
+         print(f"Score: {result['score']}")
+         print(f"Course: {result['courseCode']} - {result['name']}")
+         print(f"Description: {result['description']}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import bisect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+# Port of the local Prometheus endpoint (0 disables it) and an optional file
+# the app rewrites with the same text after every request
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_FILE = os.getenv('METRICS_FILE')
+# Observations kept per series for the recent percentiles
+METRICS_WINDOW = int(os.getenv('METRICS_WINDOW', 1000))
+
+# Upper bounds in seconds, from cache hits to slow provider calls
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram plus a ring buffer of recent observations.
+    The buckets give cumulative counts for Prometheus; the ring buffer gives
+    percentiles over the last `window` calls for the debug panel.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, window=METRICS_WINDOW):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.recent.append(value)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.sum, list(self.recent)
+
+    def percentiles(self, quantiles=(50, 95)):
+        """Recent percentiles in seconds, or None before the first observation"""
+        with self._lock:
+            recent = list(self.recent)
+        if not recent:
+            return None
+        return dict(zip(quantiles, np.percentile(recent, quantiles).tolist()))
+
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and label values"""
+
+    def __init__(self):
+        self.descriptions = {}
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name, description):
+        self.descriptions[name] = description
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self._series.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._series.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        self.histogram(name, **labels).observe(seconds)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Record the duration of the with-block, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name, **labels).observe(time.perf_counter() - start)
+
+    def summary(self, name):
+        """
+        Recent latency per label set of one metric
+        Returns:
+            List of dicts with the labels, count, p50_ms and p95_ms
+        """
+        rows = []
+        for (series_name, labels), histogram in sorted(self._series.items()):
+            if series_name != name:
+                continue
+            recent = histogram.percentiles()
+            if recent is None:
+                continue
+            rows.append({
+                **dict(labels),
+                'count': histogram.count,
+                'p50_ms': recent[50] * 1000.0,
+                'p95_ms': recent[95] * 1000.0,
+            })
+        return rows
+
+    def prometheus_text(self):
+        """All histograms in the Prometheus text exposition format"""
+        lines = []
+        current = None
+        for (name, labels), histogram in sorted(self._series.items()):
+            if name != current:
+                current = name
+                if name in self.descriptions:
+                    lines.append(f"# HELP {name} {self.descriptions[name]}")
+                lines.append(f"# TYPE {name} histogram")
+            counts, count, total, _ = histogram.snapshot()
+            label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+            separator = ',' if label_text else ''
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{{{label_text}{separator}le="{le}"}} {cumulative}')
+            suffix = f"{{{label_text}}}" if label_text else ''
+            lines.append(f"{name}_sum{suffix} {total}")
+            lines.append(f"{name}_count{suffix} {count}")
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path=METRICS_FILE):
+        """Atomically write the Prometheus text to a file, e.g. for node_exporter's textfile collector"""
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+# Process-wide registry shared by query.py and app.py
+registry = MetricsRegistry()
+registry.describe('course_search_seconds', "End-to-end CourseQuery.search_courses latency")
+registry.describe('course_search_stage_seconds', "Latency of each stage inside CourseQuery.search_courses")
+registry.describe('answer_generation_seconds', "Time to the first generated token and to the end of the answer")
+registry.describe('app_request_stage_seconds', "Latency of each stage of a Streamlit search request")
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_http_server(port=METRICS_PORT, host=METRICS_HOST, metrics=registry):
+    """
+    Serve the registry at http://host:port/metrics from a daemon thread.
+    Only one server is started per process; later calls return it.
+    """
+    global _server
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = metrics.prometheus_text().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), MetricsHandler)
+            threading.Thread(target=_server.serve_forever, daemon=True).start()
+            print(f"Serving metrics on http://{host}:{_server.server_port}/metrics")
+    return _server
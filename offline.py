@@ -0,0 +1,423 @@
+import bisect
+import hashlib
+import re
+import threading
+import time
+
+import numpy as np
+
+from attribute_index import normalize_value
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+RELATIONSHIP_TYPES = ('PREREQ_OF', 'COREQ_WITH', 'EQUIVALENT_TO')
+# Keys of a prepared course row that become relationships rather than properties
+RELATIONSHIP_PARAMS = {
+    'prerequisites': 'PREREQ_OF',
+    'corequisites': 'COREQ_WITH',
+    'equivalents': 'EQUIVALENT_TO',
+}
+
+
+class HashingEmbeddings:
+    """
+    Deterministic stand-in for OpenAIEmbeddings. Word unigrams and bigrams are
+    feature-hashed with a stable hash into a signed, unit-length vector, so
+    texts sharing words land close together and every run produces the same
+    vectors without network access.
+    """
+
+    def __init__(self, dimensions=1536):
+        self.dimensions = dimensions
+        self.model = f"hashing-{dimensions}"
+        self.requests = 0
+        self._features = {}
+        self._lock = threading.Lock()
+
+    def _feature(self, token):
+        feature = self._features.get(token)
+        if feature is None:
+            digest = int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest(), 'little')
+            feature = self._features[token] = (digest % self.dimensions, 1.0 if digest >> 63 else -1.0)
+        return feature
+
+    def _embed(self, text):
+        words = _TOKEN.findall(text.lower())
+        tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if tokens:
+            indices, signs = zip(*(self._feature(token) for token in tokens))
+            np.add.at(vector, np.asarray(indices), np.asarray(signs, dtype=np.float32))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.requests += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        with self._lock:
+            self.requests += 1
+        return self._embed(text)
+
+
+class ExtractiveChatModel:
+    """
+    Stand-in for a streaming chat model. It answers from the course blocks
+    CourseQuery.answer_context puts in the prompt, naming each course and its
+    prerequisites, and streams the answer word by word. The optional delays
+    imitate a hosted model's time to first token and per-token latency.
+    """
+
+    def __init__(self, first_token_delay=0.0, token_delay=0.0):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def _answer(self, prompt):
+        sentences = []
+        for block in prompt.split('Courses:\n', 1)[-1].split('\n\nQuestion:')[0].split('\n\n'):
+            lines = block.splitlines()
+            if not lines:
+                continue
+            title = lines[0].split(' (match')[0]
+            sentence = f"{title} looks relevant."
+            for line in lines[1:]:
+                if line.startswith('Prerequisites: ') and line != 'Prerequisites: none':
+                    sentence += f" It requires {line[len('Prerequisites: '):]}."
+                if line.startswith('Still needed: ') and line != 'Still needed: none':
+                    sentence += f" You still need {line[len('Still needed: '):]}."
+            sentences.append(sentence)
+        return ' '.join(sentences) or "No courses matched."
+
+    def stream(self, messages):
+        with self._lock:
+            self.requests += 1
+        prompt = messages[-1][1] if isinstance(messages[-1], tuple) else str(messages[-1])
+        words = self._answer(prompt).split(' ')
+        time.sleep(self.first_token_delay)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            yield word if i == 0 else ' ' + word
+
+    def invoke(self, messages):
+        return ''.join(self.stream(messages))
+
+
+class InMemoryGraph:
+    """
+    Stand-in for Neo4jGraph that understands the project's own Cypher
+    statements. Each query constant is mapped to a Python handler with the
+    same effect on an in-memory node and relationship store; any other
+    statement raises NotImplementedError. Vector search is an exact NumPy scan
+    reported on Neo4j's (1 + cosine) / 2 scale.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+        self.outgoing = {relationship: {} for relationship in RELATIONSHIP_TYPES}
+        self.incoming = {relationship: {} for relationship in RELATIONSHIP_TYPES}
+        self.query_count = 0
+        self.dataset_stamp = None
+        self.vector_index_dimensions = None
+        self._sorted_codes = None
+        self._vectors = None
+        self._handlers = None
+        self._lock = threading.RLock()
+
+    def _load_handlers(self):
+        # Imported on the first query so importing this module (as the hashing
+        # embedding provider does) does not pull in the ingest and query modules
+        from catalog import catalog_page_query
+        from db_setup import (
+            delete_courses_query, embedding_candidates_query, merge_course_batch_query,
+            stamp_embedding_hash_query, upsert_course_batch_query, vector_index_dimensions_query,
+            write_embeddings_query
+        )
+        from graph_snapshot import (
+            embedding_dimension_query, export_course_page_query,
+            restore_courses_query, restore_relationship_queries
+        )
+        from prereq_graph import relationship_edges_query
+        from query import vector_search_query
+        from result_cache import read_dataset_stamp_query, write_dataset_stamp_query
+
+        handlers = {
+            merge_course_batch_query: lambda params: self._merge_courses(params, overwrite=False),
+            upsert_course_batch_query: lambda params: self._merge_courses(params, overwrite=True),
+            delete_courses_query: self._delete_courses,
+            write_embeddings_query: self._write_embeddings,
+            stamp_embedding_hash_query: self._stamp_embedding_hashes,
+            embedding_candidates_query: self._embedding_candidates,
+            catalog_page_query: self._catalog_page,
+            relationship_edges_query: self._relationship_edges,
+            vector_search_query: self._vector_search,
+            read_dataset_stamp_query: self._read_dataset_stamp,
+            write_dataset_stamp_query: self._write_dataset_stamp,
+            vector_index_dimensions_query: lambda params: (
+                [] if self.vector_index_dimensions is None
+                else [{'dimensions': self.vector_index_dimensions}]
+            ),
+            export_course_page_query: self._export_course_page,
+            embedding_dimension_query: self._embedding_dimension,
+            restore_courses_query: self._restore_courses,
+        }
+        for relationship, restore_query in restore_relationship_queries.items():
+            handlers[restore_query] = lambda params, relationship=relationship: (
+                self._restore_relationships(params, relationship)
+            )
+        return handlers
+
+    def query(self, query, params=None):
+        params = params or {}
+        with self._lock:
+            self.query_count += 1
+            if self._handlers is None:
+                self._handlers = self._load_handlers()
+            handler = self._handlers.get(query)
+            if handler is not None:
+                return handler(params)
+            if query.strip().startswith('CREATE VECTOR INDEX'):
+                if self.vector_index_dimensions is None:
+                    self.vector_index_dimensions = int(re.search(r'vector\.dimensions`:\s*(\d+)', query).group(1))
+                return []
+            if query.strip().startswith(('CREATE INDEX', 'DROP INDEX')):
+                if 'course_embeddings' in query:
+                    self.vector_index_dimensions = None
+                return []
+            # CourseQuery builds its filtered search per request
+            if 'vector.similarity.cosine' in query or 'db.index.vector.queryNodes' in query:
+                return self._vector_search(params)
+            raise NotImplementedError(f"InMemoryGraph does not support: {query.strip().splitlines()[0]}")
+
+    def refresh_schema(self):
+        pass
+
+    def _merge_node(self, code):
+        if code not in self.nodes:
+            self.nodes[code] = {'courseCode': code}
+            self._sorted_codes = None
+        return self.nodes[code]
+
+    def _link(self, relationship, source, target):
+        self.outgoing[relationship].setdefault(source, set()).add(target)
+        self.incoming[relationship].setdefault(target, set()).add(source)
+
+    def _unlink(self, relationship, source, target):
+        self.outgoing[relationship].get(source, set()).discard(target)
+        self.incoming[relationship].get(target, set()).discard(source)
+
+    def _drop_row_relationships(self, code):
+        """Incoming PREREQ_OF and outgoing COREQ_WITH/EQUIVALENT_TO, as the upsert query does"""
+        for source in list(self.incoming['PREREQ_OF'].get(code, ())):
+            self._unlink('PREREQ_OF', source, code)
+        for relationship in ('COREQ_WITH', 'EQUIVALENT_TO'):
+            for target in list(self.outgoing[relationship].get(code, ())):
+                self._unlink(relationship, code, target)
+
+    def _merge_courses(self, params, overwrite):
+        rows = []
+        for course_param in params['courseParams']:
+            code = course_param['courseCode']
+            created = code not in self.nodes
+            node = self._merge_node(code)
+            if created or overwrite:
+                node.update({
+                    key: value for key, value in course_param.items()
+                    if key not in RELATIONSHIP_PARAMS
+                })
+                self._vectors = None
+            if overwrite:
+                self._drop_row_relationships(code)
+            for key, relationship in RELATIONSHIP_PARAMS.items():
+                for other in course_param[key]:
+                    self._merge_node(other)
+                    if relationship == 'PREREQ_OF':
+                        self._link(relationship, other, code)
+                    else:
+                        self._link(relationship, code, other)
+            rows.append({'courseCode': code, 'embeddingHash': node.get('embeddingHash')})
+        if overwrite:
+            return rows
+        return [{'courseCount': len(rows)}]
+
+    def _delete_courses(self, params):
+        for code in params['courseCodes']:
+            if code not in self.nodes:
+                continue
+            self._drop_row_relationships(code)
+            referenced = any(
+                self.outgoing[relationship].get(code) or self.incoming[relationship].get(code)
+                for relationship in RELATIONSHIP_TYPES
+            )
+            if referenced:
+                self.nodes[code] = {'courseCode': code}
+            else:
+                del self.nodes[code]
+                self._sorted_codes = None
+            self._vectors = None
+        return []
+
+    def _write_embeddings(self, params):
+        for row in params['rows']:
+            node = self.nodes.get(row['courseCode'])
+            if node is not None:
+                node['embedding'] = np.asarray(row['embedding'], dtype=np.float32)
+                node['embeddingHash'] = row['embeddingHash']
+        self._vectors = None
+        return []
+
+    def _stamp_embedding_hashes(self, params):
+        for row in params['rows']:
+            node = self.nodes.get(row['courseCode'])
+            if node is not None:
+                node['embeddingHash'] = row['embeddingHash']
+        return []
+
+    def _embedding_candidates(self, params):
+        codes = params.get('courseCodes')
+        nodes = self.nodes.values() if codes is None else (
+            self.nodes[code] for code in codes if code in self.nodes
+        )
+        return [
+            {
+                'courseCode': node['courseCode'],
+                'description': node['description'],
+                'embeddingHash': node.get('embeddingHash'),
+                'hasEmbedding': node.get('embedding') is not None,
+            }
+            for node in nodes
+            if node.get('description') is not None and node.get('description') != ''
+        ]
+
+    def _catalog_page(self, params):
+        from catalog import ATTRIBUTE_PROPERTIES
+
+        if self._sorted_codes is None:
+            self._sorted_codes = sorted(self.nodes)
+        with_embeddings = params['withEmbeddings']
+        rows = []
+        for code in self._sorted_codes[bisect.bisect_right(self._sorted_codes, params['after']):]:
+            node = self.nodes[code]
+            if with_embeddings and node.get('embedding') is None:
+                continue
+            if not with_embeddings and node.get('description') is None:
+                continue
+            rows.append({
+                'courseCode': code,
+                'name': node.get('name'),
+                'description': node.get('description'),
+                'attributes': {name: node.get(name) for name in ATTRIBUTE_PROPERTIES},
+                'embedding': node['embedding'].tolist() if with_embeddings else None,
+            })
+            if len(rows) >= params['limit']:
+                break
+        return rows
+
+    def _export_course_page(self, params):
+        if self._sorted_codes is None:
+            self._sorted_codes = sorted(self.nodes)
+        start = bisect.bisect_right(self._sorted_codes, params['after'])
+        rows = []
+        for code in self._sorted_codes[start:start + params['limit']]:
+            properties = dict(self.nodes[code])
+            if properties.get('embedding') is not None:
+                properties['embedding'] = properties['embedding'].tolist()
+            rows.append({'courseCode': code, 'properties': properties})
+        return rows
+
+    def _embedding_dimension(self, params):
+        for node in self.nodes.values():
+            if node.get('embedding') is not None:
+                return [{'dimension': len(node['embedding'])}]
+        return []
+
+    def _restore_courses(self, params):
+        for row in params['rows']:
+            node = self._merge_node(row['courseCode'])
+            properties = dict(row['properties'])
+            if properties.get('embedding') is not None:
+                properties['embedding'] = np.asarray(properties['embedding'], dtype=np.float32)
+            node.update(properties)
+        self._vectors = None
+        return []
+
+    def _restore_relationships(self, params, relationship):
+        for row in params['rows']:
+            if row['source'] in self.nodes and row['target'] in self.nodes:
+                self._link(relationship, row['source'], row['target'])
+        return []
+
+    def _relationship_edges(self, params):
+        return [
+            {'source': source, 'type': relationship, 'target': target}
+            for relationship in RELATIONSHIP_TYPES
+            for source, targets in self.outgoing[relationship].items()
+            for target in targets
+        ]
+
+    def _read_dataset_stamp(self, params):
+        return [] if self.dataset_stamp is None else [{'stamp': self.dataset_stamp}]
+
+    def _write_dataset_stamp(self, params):
+        self.dataset_stamp = params['stamp']
+        return [{'stamp': self.dataset_stamp}]
+
+    def _vector_matrix(self):
+        if self._vectors is None:
+            codes = [code for code, node in self.nodes.items() if node.get('embedding') is not None]
+            if codes:
+                matrix = np.stack([self.nodes[code]['embedding'] for code in codes])
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix = matrix / np.where(norms > 0, norms, 1.0)
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+            self._vectors = (codes, matrix)
+        return self._vectors
+
+    def _vector_search(self, params):
+        codes, matrix = self._vector_matrix()
+        if not codes:
+            return []
+        query_vector = np.asarray(params['embedding'], dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        scores = (1.0 + matrix @ (query_vector / norm if norm > 0 else query_vector)) / 2.0
+
+        # An index query scores only its nearest candidates before filtering
+        if 'candidates' in params and params['candidates'] < len(codes):
+            nearest = np.argpartition(-scores, params['candidates'] - 1)[:params['candidates']]
+            scores = np.where(np.isin(np.arange(len(codes)), nearest), scores, -np.inf)
+        if 'courseCodes' in params:
+            allowed = set(params['courseCodes'])
+            scores = np.where([code in allowed for code in codes], scores, -np.inf)
+
+        # Filter parameters are named filter_<attribute> by CourseQuery
+        for key, accepted in params.items():
+            if not key.startswith('filter_'):
+                continue
+            name = key[len('filter_'):]
+            accepted = {normalize_value(value) for value in accepted}
+            mask = np.fromiter(
+                (normalize_value(self.nodes[code].get(name)) in accepted for code in codes),
+                dtype=bool, count=len(codes)
+            )
+            scores = np.where(mask, scores, -np.inf)
+
+        top_k = min(int(params['top_k']), len(codes))
+        if top_k <= 0:
+            return []
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [
+            {
+                'score': float(scores[i]),
+                'courseCode': codes[i],
+                'name': self.nodes[codes[i]].get('name'),
+                'description': self.nodes[codes[i]].get('description'),
+            }
+            for i in top if np.isfinite(scores[i])
+        ]
@@ -0,0 +1,257 @@
+import threading
+
+import numpy as np
+
+# Every course-to-course relationship created by db_setup.py
+relationship_edges_query = """
+MATCH (source:Course)-[relationship:PREREQ_OF|COREQ_WITH|EQUIVALENT_TO]->(target:Course)
+RETURN source.courseCode AS source, type(relationship) AS type, target.courseCode AS target
+"""
+
+
+def build_csr(sources, targets, num_nodes):
+    """CSR adjacency (indptr, indices) for directed edges between integer ids"""
+    sources = np.asarray(sources, dtype=np.int64)
+    targets = np.asarray(targets, dtype=np.int64)
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return indptr, targets[order].astype(np.int32)
+
+
+def gather_neighbors(indptr, indices, nodes):
+    """Concatenated neighbor lists of `nodes`, without a Python loop"""
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.zeros(0, dtype=indices.dtype)
+    offsets = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+    return indices[offsets]
+
+
+class PrereqGraph:
+    """
+    Prerequisite, corequisite and equivalence relationships between courses,
+    held as CSR adjacency arrays over integer course ids. Transitive closures
+    are memoized per course, and topological levels are computed once.
+    """
+
+    def __init__(self, edges):
+        """
+        Args:
+            edges: iterable of (source code, relationship type, target code)
+        """
+        self.codes = []
+        self.ids = {}
+        columns = {'PREREQ_OF': ([], []), 'COREQ_WITH': ([], []), 'EQUIVALENT_TO': ([], [])}
+        for source, relationship, target in edges:
+            if relationship not in columns:
+                continue
+            sources, targets = columns[relationship]
+            sources.append(self._id(source))
+            targets.append(self._id(target))
+        num_nodes = len(self.codes)
+
+        prereq_sources, prereq_targets = columns['PREREQ_OF']
+        # course -> courses it unlocks, and course -> its direct prerequisites
+        self.unlocks_csr = build_csr(prereq_sources, prereq_targets, num_nodes)
+        self.prereqs_csr = build_csr(prereq_targets, prereq_sources, num_nodes)
+        self.coreqs_csr = build_csr(*columns['COREQ_WITH'], num_nodes)
+        equiv_sources, equiv_targets = columns['EQUIVALENT_TO']
+        # Equivalence is symmetric whichever direction the CSV listed it in
+        self.equivalents_csr = build_csr(
+            equiv_sources + equiv_targets, equiv_targets + equiv_sources, num_nodes
+        )
+
+        self.levels = self._topological_levels()
+        # Alphabetical rank of each code, for cheap ordering of query results
+        self._code_rank = np.empty(num_nodes, dtype=np.int64)
+        self._code_rank[np.argsort(np.asarray(self.codes, dtype=object), kind='stable')] = np.arange(num_nodes)
+        self._closures = {'prereqs': {}, 'unlocks': {}}
+        self._lock = threading.Lock()
+
+    def _id(self, code):
+        course_id = self.ids.get(code)
+        if course_id is None:
+            course_id = self.ids[code] = len(self.codes)
+            self.codes.append(code)
+        return course_id
+
+    @classmethod
+    def from_graph(cls, kg):
+        """Load the relationship edges from Neo4j in one query"""
+        rows = kg.query(relationship_edges_query)
+        return cls((row['source'], row['type'], row['target']) for row in rows)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self.ids
+
+    def _topological_levels(self):
+        """
+        Level 0 for courses without prerequisites, otherwise one more than the
+        deepest prerequisite. Courses caught in a prerequisite cycle are placed
+        one level above the deepest prerequisite that could be resolved.
+        """
+        num_nodes = len(self.codes)
+        levels = np.full(num_nodes, -1, dtype=np.int32)
+        indptr, indices = self.unlocks_csr
+        indegree = np.diff(self.prereqs_csr[0]).astype(np.int64)
+        frontier = np.flatnonzero(indegree == 0)
+        level = 0
+        while frontier.size:
+            levels[frontier] = level
+            unlocked = gather_neighbors(indptr, indices, frontier)
+            np.subtract.at(indegree, unlocked, 1)
+            frontier = np.unique(unlocked[indegree[unlocked] == 0])
+            level += 1
+
+        prereq_indptr, prereq_indices = self.prereqs_csr
+        for course_id in np.flatnonzero(levels < 0):
+            prereqs = prereq_indices[prereq_indptr[course_id]:prereq_indptr[course_id + 1]]
+            resolved = levels[prereqs]
+            resolved = resolved[resolved >= 0]
+            levels[course_id] = resolved.max() + 1 if resolved.size else 0
+        return levels
+
+    def _reachable(self, csr, start_ids):
+        """Ids reachable from start_ids along csr edges, excluding the start ids"""
+        indptr, indices = csr
+        visited = np.zeros(len(self.codes), dtype=bool)
+        frontier = np.unique(np.asarray(start_ids, dtype=np.int64))
+        visited[frontier] = True
+        start = frontier
+        while frontier.size:
+            neighbors = gather_neighbors(indptr, indices, frontier)
+            neighbors = np.unique(neighbors[~visited[neighbors]])
+            visited[neighbors] = True
+            frontier = neighbors
+        visited[start] = False
+        return np.flatnonzero(visited)
+
+    def _closure(self, direction, course_id):
+        closures = self._closures[direction]
+        closure = closures.get(course_id)
+        if closure is None:
+            csr = self.prereqs_csr if direction == 'prereqs' else self.unlocks_csr
+            closure = self._reachable(csr, [course_id])
+            with self._lock:
+                closures[course_id] = closure
+        return closure
+
+    def precompute(self):
+        """Memoize the prerequisite and unlock closures of every course up front"""
+        for course_id in range(len(self.codes)):
+            self._closure('prereqs', course_id)
+            self._closure('unlocks', course_id)
+
+    def _sorted_codes(self, ids):
+        """Codes ordered by topological level, then alphabetically"""
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.lexsort((self._code_rank[ids], self.levels[ids]))
+        return [self.codes[i] for i in ids[order]]
+
+    def _neighbors(self, csr, code):
+        course_id = self.ids.get(code)
+        if course_id is None:
+            return []
+        indptr, indices = csr
+        return self._sorted_codes(indices[indptr[course_id]:indptr[course_id + 1]])
+
+    def level(self, code):
+        """Topological level of a course (0 = no prerequisites), or None if unknown"""
+        course_id = self.ids.get(code)
+        return None if course_id is None else int(self.levels[course_id])
+
+    def prerequisites(self, code, transitive=True):
+        """Everything needed before a course, foundational prerequisites first"""
+        if not transitive:
+            return self._neighbors(self.prereqs_csr, code)
+        course_id = self.ids.get(code)
+        if course_id is None:
+            return []
+        return self._sorted_codes(self._closure('prereqs', course_id))
+
+    def unlocks(self, code, transitive=True):
+        """Courses that list this course as a (direct or indirect) prerequisite"""
+        if not transitive:
+            return self._neighbors(self.unlocks_csr, code)
+        course_id = self.ids.get(code)
+        if course_id is None:
+            return []
+        return self._sorted_codes(self._closure('unlocks', course_id))
+
+    def corequisites(self, code):
+        return self._neighbors(self.coreqs_csr, code)
+
+    def equivalents(self, code):
+        return self._neighbors(self.equivalents_csr, code)
+
+    def taken_ids(self, taken):
+        """Ids of the taken courses plus their equivalents"""
+        ids = np.asarray([self.ids[code] for code in taken if code in self.ids], dtype=np.int64)
+        if ids.size == 0:
+            return ids
+        equivalent = gather_neighbors(*self.equivalents_csr, ids)
+        return np.unique(np.concatenate([ids, equivalent]))
+
+    def remaining_prerequisites(self, code, taken):
+        """
+        Prerequisites of a course still missing given the courses already taken;
+        prerequisites of taken courses count as satisfied
+        """
+        course_id = self.ids.get(code)
+        if course_id is None:
+            return []
+        needed = self._closure('prereqs', course_id)
+        taken_ids = self.taken_ids(taken)
+        if taken_ids.size:
+            satisfied = np.union1d(taken_ids, self._reachable(self.prereqs_csr, taken_ids))
+            needed = np.setdiff1d(needed, satisfied, assume_unique=True)
+        return self._sorted_codes(needed)
+
+    def path_to(self, code, taken=()):
+        """
+        Shortest prerequisite chain leading to a course
+        Args:
+            code: target course code
+            taken: course codes already completed
+        Returns:
+            Codes from a taken course (or, failing that, a course without
+            prerequisites) through to the target; [] if the course is unknown
+        """
+        target = self.ids.get(code)
+        if target is None:
+            return []
+        closure = self._closure('prereqs', target)
+        taken_ids = self.taken_ids(taken)
+        if target in taken_ids:
+            return [code]
+        sources = np.intersect1d(taken_ids, closure)
+        if sources.size == 0:
+            sources = closure[self.levels[closure] == 0]
+        if sources.size == 0:
+            return [code]
+
+        indptr, indices = self.unlocks_csr
+        parent = np.full(len(self.codes), -1, dtype=np.int64)
+        parent[sources] = sources
+        frontier = sources
+        while frontier.size and parent[target] < 0:
+            next_frontier = []
+            for node in frontier:
+                for neighbor in indices[indptr[node]:indptr[node + 1]]:
+                    if parent[neighbor] < 0:
+                        parent[neighbor] = node
+                        next_frontier.append(neighbor)
+            frontier = np.asarray(next_frontier, dtype=np.int64)
+
+        if parent[target] < 0:
+            return [code]
+        path = [target]
+        while parent[path[-1]] != path[-1]:
+            path.append(parent[path[-1]])
+        return [self.codes[i] for i in reversed(path)]
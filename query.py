@@ -1,7 +1,27 @@
 from dotenv import load_dotenv
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
 import os
-from langchain_community.graphs import Neo4jGraph
-from langchain_openai import OpenAIEmbeddings
+import sys
+import threading
+import time
+
+import numpy as np
+
+from attribute_index import AttributeIndex, normalize_value
+from catalog import ATTRIBUTE_PROPERTIES, CourseCatalog
+from embedding_snapshot import SNAPSHOT_PATH, load_snapshot, read_manifest
+from graph_rank import GRAPH_RERANK_CANDIDATES, GRAPH_RERANK_WEIGHT, GraphRanker
+from lexical_index import BM25Index
+from metrics import registry as metrics
+from prereq_graph import PrereqGraph
+from query_cache import normalize_query, shared_query_embedding_cache
+from result_cache import (
+    DATASET_STAMP_TTL, RESULT_CACHE_SIZE, ResultCache, read_dataset_stamp, read_dataset_stamp_query,
+    result_cache_key
+)
+from vector_search import VectorIndex
 
 # Load environment variables
 load_dotenv('.env', override=True)
@@ -10,46 +30,608 @@ NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 NEO4J_DATABASE = os.getenv('NEO4J_DATABASE')
 OPENAI_API_KEY = os.getenv('OPENAIAPIKEY')
+# 'neo4j' queries the course_embeddings index; 'numpy' scores an in-memory copy;
+# 'ann' searches an in-process IVF-PQ index (see ann_index.py); 'two_stage'
+# scans compact vectors and reranks the best candidates exactly (see compact_index.py)
+SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'neo4j')
+# 'vector' ranks by embedding similarity; 'hybrid' fuses it with BM25 keyword ranks
+SEARCH_MODE = os.getenv('SEARCH_MODE', 'vector')
+# Reciprocal-rank fusion settings for hybrid search
+RRF_K = int(os.getenv('RRF_K', 60))
+RRF_VECTOR_WEIGHT = float(os.getenv('RRF_VECTOR_WEIGHT', 1.0))
+RRF_LEXICAL_WEIGHT = float(os.getenv('RRF_LEXICAL_WEIGHT', 1.0))
+RRF_CANDIDATES = int(os.getenv('RRF_CANDIDATES', 50))
+# Connection pool limits for the shared Neo4j driver and embedding HTTP client
+NEO4J_MAX_POOL_SIZE = int(os.getenv('NEO4J_MAX_POOL_SIZE', 20))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv('NEO4J_ACQUISITION_TIMEOUT', 30))
+NEO4J_LIVENESS_CHECK_TIMEOUT = float(os.getenv('NEO4J_LIVENESS_CHECK_TIMEOUT', 60))
+EMBEDDING_HTTP_MAX_CONNECTIONS = int(os.getenv('EMBEDDING_HTTP_MAX_CONNECTIONS', 20))
+# Batch mode: concurrent searches, questions embedded per request, questions
+# per checkpoint
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 8))
+BATCH_EMBED_SIZE = int(os.getenv('BATCH_EMBED_SIZE', 256))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 1024))
+# Chat model for generated answers, and how much of each description goes into its prompt
+ANSWER_MODEL = os.getenv('ANSWER_MODEL', 'gpt-4o-mini')
+ANSWER_TEMPERATURE = float(os.getenv('ANSWER_TEMPERATURE', 0.2))
+ANSWER_DESCRIPTION_CHARS = int(os.getenv('ANSWER_DESCRIPTION_CHARS', 400))
+# Filtered search on the neo4j backend: index candidates fetched per expected
+# match (widened until top_k match), and the number of matching courses at or
+# below which they are scored directly instead
+FILTER_OVERSAMPLE = int(os.getenv('FILTER_OVERSAMPLE', 4))
+FILTER_EXACT_MAX = int(os.getenv('FILTER_EXACT_MAX', 2000))
+
+answer_system_prompt = (
+    "You are a UBC course advisor. Answer the student's question using only the "
+    "courses listed. Mention course codes, point out prerequisites they still need, "
+    "and keep the answer under 150 words."
+)
+
+# Top-k courses from the course_embeddings vector index
+vector_search_query = """
+CALL db.index.vector.queryNodes('course_embeddings', $top_k, $embedding) 
+YIELD node, score
+RETURN 
+    score,
+    node.courseCode AS courseCode,
+    node.name AS name,
+    node.description AS description
+ORDER BY score DESC
+"""
+
+# Exact top-k over a short list of courses, found through the course_code index
+filtered_exact_search_query = """
+MATCH (node:Course)
+WHERE node.courseCode IN $courseCodes AND node.embedding IS NOT NULL
+WITH node, vector.similarity.cosine(node.embedding, $embedding) AS score
+ORDER BY score DESC
+LIMIT $top_k
+RETURN
+    score,
+    node.courseCode AS courseCode,
+    node.name AS name,
+    node.description AS description
+"""
+
+class TrackedGraph:
+    """
+    Neo4jGraph-like view of a CourseQuery's connection that runs every query
+    through CourseQuery.graph_query, so catalog paging, prerequisite loading
+    and dataset-stamp reads are counted in pool_stats too
+    """
+
+    def __init__(self, querier):
+        self.querier = querier
+
+    def query(self, query, params=None):
+        return self.querier.graph_query(query, params=params)
 
 class CourseQuery:
-    def __init__(self):
-        self.kg = Neo4jGraph(
+    """
+    Course search over Neo4j and the embedding provider. One instance is meant
+    to be shared by every thread in a process: the Neo4j driver pools its
+    connections and the embeddings client reuses one HTTP connection pool.
+    """
+
+    def __init__(self, embedding_cache=None, backend=SEARCH_BACKEND, snapshot_path=SNAPSHOT_PATH,
+                 max_pool_size=NEO4J_MAX_POOL_SIZE, search_mode=SEARCH_MODE, kg=None, embeddings=None,
+                 result_cache=None, llm=None, ann_index_path=None):
+        """
+        kg and embeddings default to Neo4j and OpenAI clients built from .env;
+        pass stand-ins (see offline.py) to run without either service.
+        llm is any chat model with a LangChain-style stream(messages); it
+        defaults to ChatOpenAI, connected on the first generated answer.
+        result_cache defaults to a per-instance ResultCache (RESULT_CACHE_SIZE
+        entries, shared through RESULT_CACHE_PATH if set).
+        ann_index_path overrides ANN_INDEX_PATH for the 'ann' backend.
+        """
+        self.max_pool_size = max_pool_size
+        self.kg = kg if kg is not None else self._connect_graph(max_pool_size)
+        # Hand this, not self.kg, to loaders so their queries are counted
+        self.tracked_kg = TrackedGraph(self)
+        self.embeddings = embeddings if embeddings is not None else self._connect_embeddings()
+        self._llm = llm
+        self._pool_lock = threading.Lock()
+        self._queries_in_flight = 0
+        self._peak_in_flight = 0
+        self._query_count = 0
+        # Query embeddings are cached process-wide unless a cache is supplied
+        self.embedding_cache = embedding_cache if embedding_cache is not None else shared_query_embedding_cache
+        if result_cache is None and RESULT_CACHE_SIZE > 0:
+            result_cache = ResultCache()
+        self.result_cache = result_cache
+        # Dataset stamp the cached results are tagged with. An in-process index
+        # keeps the stamp of the data it loaded; the Neo4j backend re-reads it.
+        self._stamp = None
+        self._stamp_fixed = False
+        self._stamp_checked = float('-inf')
+
+        if backend not in ('neo4j', 'numpy', 'ann', 'two_stage'):
+            raise ValueError(f"Unknown search backend: {backend}")
+        self.backend = backend
+        self.vector_index = None
+        if backend in ('numpy', 'ann', 'two_stage'):
+            self.vector_index = self._load_vector_index(snapshot_path)
+        if backend == 'ann':
+            from ann_index import ANN_INDEX_PATH, load_ann_index
+            from embedding_providers import embedding_model_name
+
+            self.vector_index = load_ann_index(
+                self.vector_index.catalog, path=ann_index_path or ANN_INDEX_PATH,
+                model=embedding_model_name(self.embeddings)
+            )
+        if backend == 'two_stage':
+            from compact_index import load_two_stage_index
+
+            self.vector_index = load_two_stage_index(self.vector_index.catalog, snapshot_path)
+
+        if search_mode not in ('vector', 'hybrid'):
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        self.search_mode = search_mode
+        self._catalog = None
+        self._lexical_index = None
+        self._attribute_index = None
+        self._prereq_graph = None
+        self._graph_ranker = None
+        self._index_lock = threading.RLock()
+        if search_mode == 'hybrid':
+            self.lexical_index
+
+    @staticmethod
+    def _connect_graph(max_pool_size):
+        # The client libraries are imported on first use, so importing this
+        # module (or running it against stand-ins) stays fast
+        from langchain_community.graphs import Neo4jGraph
+
+        return Neo4jGraph(
             url=NEO4J_URI,
             username=NEO4J_USERNAME,
             password=NEO4J_PASSWORD,
-            database=NEO4J_DATABASE
+            database=NEO4J_DATABASE,
+            driver_config={
+                'max_connection_pool_size': max_pool_size,
+                'connection_acquisition_timeout': NEO4J_ACQUISITION_TIMEOUT,
+                'liveness_check_timeout': NEO4J_LIVENESS_CHECK_TIMEOUT,
+            }
         )
-        self.embeddings = OpenAIEmbeddings(api_key=OPENAI_API_KEY)
 
-    def search_courses(self, question, top_k=2):  # Changed default to 2
+    @staticmethod
+    def _connect_embeddings():
+        from embedding_providers import EMBEDDING_PROVIDER, create_embeddings
+
+        if EMBEDDING_PROVIDER != 'openai':
+            return create_embeddings(EMBEDDING_PROVIDER)
+        import httpx
+
+        return create_embeddings(
+            EMBEDDING_PROVIDER,
+            http_client=httpx.Client(limits=httpx.Limits(
+                max_connections=EMBEDDING_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=EMBEDDING_HTTP_MAX_CONNECTIONS
+            ))
+        )
+
+    @staticmethod
+    def _connect_llm():
+        from langchain_openai import ChatOpenAI
+
+        return ChatOpenAI(
+            api_key=OPENAI_API_KEY, model=ANSWER_MODEL, temperature=ANSWER_TEMPERATURE, streaming=True
+        )
+
+    @property
+    def llm(self):
+        """Chat model for generated answers, connected on first use"""
+        if self._llm is None:
+            with self._index_lock:
+                if self._llm is None:
+                    self._llm = self._connect_llm()
+        return self._llm
+
+    def _load_vector_index(self, snapshot_path):
+        """Map the exported snapshot if there is one, otherwise read vectors from Neo4j"""
+        self._stamp_fixed = True
+        if snapshot_path and os.path.exists(snapshot_path):
+            self._stamp = read_manifest(snapshot_path).get('datasetStamp')
+            return VectorIndex(load_snapshot(snapshot_path), normalized=True)
+        self._stamp = read_dataset_stamp(self.tracked_kg)
+        return VectorIndex(CourseCatalog.from_graph(self.tracked_kg))
+
+    @property
+    def catalog(self):
+        """In-process course catalog: the vector index's, or a text-only copy from Neo4j"""
+        if self._catalog is None:
+            with self._index_lock:
+                if self._catalog is None:
+                    if self.vector_index is not None:
+                        self._catalog = self.vector_index.catalog
+                    else:
+                        self._catalog = CourseCatalog.from_graph(self.tracked_kg, with_embeddings=False)
+        return self._catalog
+
+    @property
+    def lexical_index(self):
+        """BM25 index over the catalog, built on first use"""
+        if self._lexical_index is None:
+            with self._index_lock:
+                if self._lexical_index is None:
+                    self._lexical_index = BM25Index(self.catalog)
+        return self._lexical_index
+
+    @property
+    def attribute_index(self):
+        """Per-value boolean row masks over the catalog, built on first use"""
+        if self._attribute_index is None:
+            with self._index_lock:
+                if self._attribute_index is None:
+                    self._attribute_index = AttributeIndex(self.catalog)
+        return self._attribute_index
+
+    @property
+    def prereq_graph(self):
+        """Prerequisite graph loaded from Neo4j on first use"""
+        if self._prereq_graph is None:
+            with self._index_lock:
+                if self._prereq_graph is None:
+                    self._prereq_graph = PrereqGraph.from_graph(self.tracked_kg)
+        return self._prereq_graph
+
+    @property
+    def graph_ranker(self):
+        """Personalized PageRank over the prerequisite graph, built on first use"""
+        if self._graph_ranker is None:
+            with self._index_lock:
+                if self._graph_ranker is None:
+                    self._graph_ranker = GraphRanker(self.prereq_graph)
+        return self._graph_ranker
+
+    def prerequisites(self, course_code, transitive=True):
+        """Courses needed before course_code (all of them unless transitive=False)"""
+        return self.prereq_graph.prerequisites(course_code, transitive=transitive)
+
+    def unlocks(self, course_code, transitive=True):
+        """Courses that course_code leads to"""
+        return self.prereq_graph.unlocks(course_code, transitive=transitive)
+
+    def path_to(self, course_code, completed=()):
+        """Shortest prerequisite chain to course_code from the completed courses"""
+        return self.prereq_graph.path_to(course_code, completed)
+
+    def remaining_prerequisites(self, course_code, completed=()):
+        """Prerequisites of course_code not yet covered by the completed courses"""
+        return self.prereq_graph.remaining_prerequisites(course_code, completed)
+
+    def filter_options(self):
+        """Distinct values of each filterable attribute"""
+        return {name: self.attribute_index.values(name) for name in ATTRIBUTE_PROPERTIES}
+
+    def graph_query(self, query, params=None):
+        """Run a Cypher query, tracking how many pooled connections are in use"""
+        with self._pool_lock:
+            self._queries_in_flight += 1
+            self._query_count += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._queries_in_flight)
+        try:
+            return self.kg.query(query, params=params or {})
+        finally:
+            with self._pool_lock:
+                self._queries_in_flight -= 1
+
+    def pool_stats(self):
+        """
+        Neo4j connection pool use by this CourseQuery: every query it runs goes
+        through graph_query and holds one pooled connection while in flight
         """
-        Search for similar course nodes using the Neo4j vector index
+        with self._pool_lock:
+            return {
+                'in_use': self._queries_in_flight,
+                'peak_in_use': self._peak_in_flight,
+                'max_size': self.max_pool_size,
+                'queries': self._query_count,
+            }
+
+    def embed_question(self, question):
+        """Embed a search query, reusing the cached vector for equivalent queries"""
+        with metrics.timer('course_search_stage_seconds', stage='embed_query'):
+            key = (getattr(self.embeddings, 'model', None), normalize_query(question))
+            embedding = self.embedding_cache.get(key)
+            if embedding is None:
+                embedding = self.embeddings.embed_query(question)
+                self.embedding_cache.put(key, embedding)
+        return embedding
+
+    def embed_questions(self, questions, batch_size=BATCH_EMBED_SIZE):
+        """
+        Embed many search queries with one embed_documents call per batch,
+        skipping cached and repeated questions, and cache the vectors so
+        search_courses reuses them
+        Returns:
+            One embedding per question, in input order
+        """
+        model = getattr(self.embeddings, 'model', None)
+        keys = [(model, normalize_query(question)) for question in questions]
+        vectors = {}
+        missing = {}
+        for key, question in zip(keys, questions):
+            if key in vectors or key in missing:
+                continue
+            embedding = self.embedding_cache.get(key)
+            if embedding is None:
+                missing[key] = question
+            else:
+                vectors[key] = embedding
+        pending = list(missing.items())
+        with metrics.timer('course_search_stage_seconds', stage='embed_batch'):
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                embedded = self.embeddings.embed_documents([question for _, question in batch])
+                for (key, _), embedding in zip(batch, embedded):
+                    self.embedding_cache.put(key, embedding)
+                    vectors[key] = embedding
+        return [vectors[key] for key in keys]
+
+    def search_courses(self, question, top_k=2, mode=None, filters=None, completed=None):
+        """
+        Search for courses matching a question with the instance's backend
+        (Neo4j index, numpy, ANN or two-stage) and search mode, through the
+        result cache
         Args:
             question: search query text
             top_k: number of similar results to return (default: 2)
+            mode: 'vector' or 'hybrid' (default: the instance's search_mode)
+            filters: optional dict of Course property (campus, year, credits,
+                isHonours, winterTerm1, ...) to an accepted value or list of values
+            completed: optional course codes the student has taken; the best
+                GRAPH_RERANK_CANDIDATES matches are then reranked by closeness
+                to them in the prerequisite graph
         Returns:
             List of similar courses with their similarity scores
         """
-        question_embedding = self.embeddings.embed_query(question)
-        
-        vector_search_query = """
-        CALL db.index.vector.queryNodes('course_embeddings', $top_k, $embedding) 
+        mode = mode or self.search_mode
+        rerank = bool(completed) and GRAPH_RERANK_WEIGHT > 0
+        with metrics.timer('course_search_seconds', mode=mode):
+            results = self._cached_search(
+                question, max(top_k, GRAPH_RERANK_CANDIDATES) if rerank else top_k, mode, filters
+            )
+            if rerank:
+                with metrics.timer('course_search_stage_seconds', stage='graph_rerank'):
+                    results = self.graph_ranker.rerank(results, completed, top_k)
+            return results
+
+    def _cached_search(self, question, top_k, mode, filters):
+        """Search results from the result cache, or computed and cached"""
+        if self.result_cache is not None:
+            key = result_cache_key(question, top_k, filters, mode)
+            stamp = self.dataset_stamp()
+            results = self.result_cache.get(key, stamp)
+            if results is not None:
+                return results
+        if mode == 'hybrid':
+            results = self.hybrid_search(question, top_k=top_k, filters=filters)
+        else:
+            results = self._vector_search(question, top_k, filters)
+        if self.result_cache is not None:
+            self.result_cache.put(key, stamp, results)
+        return results
+
+    def dataset_stamp(self):
+        """
+        Version stamp of the data searches run against, written by db_setup.py
+        after each ingest. Re-read from Neo4j at most every DATASET_STAMP_TTL seconds.
+        """
+        if self._stamp_fixed:
+            return self._stamp
+        now = time.monotonic()
+        if now - self._stamp_checked >= DATASET_STAMP_TTL:
+            rows = self.graph_query(read_dataset_stamp_query)
+            self._stamp = rows[0]['stamp'] if rows else None
+            self._stamp_checked = now
+        return self._stamp
+
+    def _vector_search(self, question, top_k, filters):
+        """Rank courses by embedding similarity with the configured backend"""
+        question_embedding = self.embed_question(question)
+        if self.vector_index is not None:
+            with metrics.timer('course_search_stage_seconds', stage='filter_mask'):
+                mask = self.attribute_index.mask(filters) if filters else None
+            with metrics.timer('course_search_stage_seconds', stage='vector_search'):
+                return self.vector_index.search(question_embedding, top_k=top_k, mask=mask)
+        with metrics.timer('course_search_stage_seconds', stage='vector_search'):
+            if filters:
+                return self._filtered_graph_search(question_embedding, top_k, filters)
+            return self.graph_query(
+                vector_search_query,
+                params={
+                    'embedding': question_embedding,
+                    'top_k': top_k
+                }
+            )
+
+    def _filtered_graph_search(self, question_embedding, top_k, filters):
+        """
+        Top-k search in Neo4j over only the courses matching the filters. The
+        in-memory attribute index counts the matches first: a few are scored
+        directly by course code, otherwise the vector index is queried for
+        enough candidates to hold top_k matches at the filter's selectivity,
+        widening until they do.
+        """
+        conditions, params = self._filter_conditions(filters)
+        params.update({'embedding': question_embedding, 'top_k': top_k})
+        mask = self.attribute_index.mask(filters)
+        if mask is None:
+            return self.graph_query(vector_search_query, params=params)
+        matches = int(mask.sum())
+        if matches == 0:
+            return []
+        if matches <= FILTER_EXACT_MAX:
+            params['courseCodes'] = [self.catalog.codes[row] for row in np.flatnonzero(mask)]
+            return self.graph_query(filtered_exact_search_query, params=params)
+
+        total = mask.size
+        candidates = min(total, int(np.ceil(top_k * FILTER_OVERSAMPLE * total / matches)))
+        # Attribute names come from the whitelist in _filter_conditions, values are parameters
+        filtered_search_query = f"""
+        CALL db.index.vector.queryNodes('course_embeddings', $candidates, $embedding)
         YIELD node, score
-        RETURN 
+        WHERE {' AND '.join(conditions)}
+        RETURN
             score,
             node.courseCode AS courseCode,
             node.name AS name,
             node.description AS description
         ORDER BY score DESC
+        LIMIT $top_k
         """
-        
-        return self.kg.query(
-            vector_search_query,
-            params={
-                'embedding': question_embedding,
-                'top_k': top_k
+        while True:
+            params['candidates'] = candidates
+            results = self.graph_query(filtered_search_query, params=params)
+            if len(results) >= top_k or candidates >= total:
+                return results
+            candidates = min(total, candidates * 4)
+
+    @staticmethod
+    def _filter_conditions(filters):
+        """Cypher conditions on node and their parameters for a filters dict"""
+        conditions = []
+        params = {}
+        for name, accepted in filters.items():
+            if name not in ATTRIBUTE_PROPERTIES:
+                raise ValueError(f"Unknown filter attribute: {name}")
+            if accepted is None:
+                continue
+            if not isinstance(accepted, (list, tuple, set)):
+                accepted = [accepted]
+            if not accepted:
+                continue
+            # Attribute names come from the whitelist above, values are parameters
+            conditions.append(f"node.{name} IN $filter_{name}")
+            params[f'filter_{name}'] = [normalize_value(value) for value in accepted]
+        return conditions, params
+
+    def hybrid_search(self, question, top_k=2, vector_weight=RRF_VECTOR_WEIGHT,
+                      lexical_weight=RRF_LEXICAL_WEIGHT, candidates=RRF_CANDIDATES, rrf_k=RRF_K,
+                      filters=None):
+        """
+        Fuse vector and BM25 rankings with reciprocal-rank fusion
+        Args:
+            question: search query text
+            top_k: number of results to return
+            vector_weight: weight of the embedding-similarity ranking
+            lexical_weight: weight of the BM25 keyword ranking
+            candidates: results taken from each ranking before fusion
+            rrf_k: rank offset; larger values flatten the fusion curve
+            filters: optional attribute filters, as for search_courses
+        Returns:
+            Result dicts as from search_courses; score is the fused score scaled
+            so a course ranked first by both rankings scores 1.0
+        """
+        pool = max(candidates, top_k)
+        vector_results = self._vector_search(question, pool, filters)
+        lexical = self.lexical_index
+        with metrics.timer('course_search_stage_seconds', stage='filter_mask'):
+            mask = self.attribute_index.mask(filters) if filters else None
+        with metrics.timer('course_search_stage_seconds', stage='lexical_search'):
+            lexical_rows, _ = lexical.search(question, top_k=pool, mask=mask)
+
+        with metrics.timer('course_search_stage_seconds', stage='fusion'):
+            return self._fuse(vector_results, lexical, lexical_rows, top_k,
+                              vector_weight, lexical_weight, rrf_k)
+
+    def _fuse(self, vector_results, lexical, lexical_rows, top_k, vector_weight, lexical_weight, rrf_k):
+        """Reciprocal-rank fusion of the vector results and BM25 rows"""
+        fused = {}
+        for rank, result in enumerate(vector_results, start=1):
+            fused[result['courseCode']] = {
+                'result': result,
+                'score': vector_weight / (rrf_k + rank),
             }
-        )
+        for rank, row in enumerate(lexical_rows, start=1):
+            record = lexical.catalog.record(int(row))
+            entry = fused.setdefault(record['courseCode'], {'result': record, 'score': 0.0})
+            entry['score'] += lexical_weight / (rrf_k + rank)
+
+        best_possible = (vector_weight + lexical_weight) / (rrf_k + 1)
+        ranked = sorted(fused.values(), key=lambda entry: entry['score'], reverse=True)[:top_k]
+        results = []
+        for entry in ranked:
+            result = {
+                'courseCode': entry['result']['courseCode'],
+                'name': entry['result']['name'],
+                'description': entry['result']['description'],
+                'score': entry['score'] / best_possible if best_possible > 0 else 0.0,
+            }
+            results.append(result)
+        return results
+
+    def answer_context(self, results, completed=()):
+        """
+        Compact prompt context: per course, its code, name, score, a trimmed
+        description and its prerequisites
+        """
+        blocks = []
+        for result in results:
+            code = result['courseCode']
+            description = result['description'] or ''
+            if len(description) > ANSWER_DESCRIPTION_CHARS:
+                description = description[:ANSWER_DESCRIPTION_CHARS].rsplit(' ', 1)[0] + '...'
+            lines = [f"{code}: {result['name']} (match {result['score']:.2f})", description]
+            lines.append(f"Prerequisites: {', '.join(self.prerequisites(code, transitive=False)) or 'none'}")
+            if completed:
+                remaining = self.remaining_prerequisites(code, completed)
+                lines.append(f"Still needed: {', '.join(remaining) or 'none'}")
+            blocks.append('\n'.join(lines))
+        return '\n\n'.join(blocks)
+
+    def stream_answer(self, question, results=None, top_k=2, filters=None, completed=()):
+        """
+        Generate an answer from the top courses, yielding text as the model
+        produces it. Time to first token and total generation time are
+        recorded under answer_generation_seconds.
+        Args:
+            question: the student's question
+            results: search_courses results to answer from (searched if None)
+            top_k, filters: passed to search_courses when results is None
+            completed: course codes the student has taken
+        """
+        if results is None:
+            results = self.search_courses(question, top_k=top_k, filters=filters, completed=completed)
+        if not results:
+            yield "I couldn't find any courses matching that question."
+            return
+        messages = [
+            ('system', answer_system_prompt),
+            ('human', f"Courses:\n{self.answer_context(results, completed)}\n\nQuestion: {question}"),
+        ]
+        start = time.perf_counter()
+        first_token = False
+        try:
+            for chunk in self.llm.stream(messages):
+                # Chat models yield message chunks; simple stand-ins may yield strings
+                text = getattr(chunk, 'content', chunk)
+                if not text:
+                    continue
+                if not first_token:
+                    first_token = True
+                    metrics.observe('answer_generation_seconds', time.perf_counter() - start, stage='first_token')
+                yield text
+        finally:
+            metrics.observe('answer_generation_seconds', time.perf_counter() - start, stage='total')
+
+    def search_courses_batch(self, questions, top_k=2, filters=None):
+        """
+        Search several questions at once
+        Args:
+            questions: list of search query texts
+            top_k: number of similar results to return per question
+            filters: optional attribute filters applied to every question
+        Returns:
+            One list of results per question, in input order
+        """
+        if self.vector_index is None or self.search_mode == 'hybrid':
+            return [self.search_courses(question, top_k=top_k, filters=filters) for question in questions]
+        question_embeddings = self.embed_questions(questions)
+        mask = self.attribute_index.mask(filters) if filters else None
+        return self.vector_index.search_batch(question_embeddings, top_k=top_k, mask=mask)
 
     def display_results(self, results):
         """Display search results in a formatted way"""
@@ -58,7 +640,184 @@ class CourseQuery:
             print(f"Course: {result['courseCode']} - {result['name']}")
             print(f"Description: {result['description']}\n")
 
-def main():
+def read_batch_questions(lines):
+    """
+    Parse batch input: one JSON object per line with a "question" and
+    optional "id", "top_k", "filters" and "completed", or a bare JSON string.
+    A record without an id gets "line-<number>". A line that is not valid
+    JSON, has no question or repeats an earlier id yields a record with an
+    "error" instead, so it is reported in place without stopping the batch.
+    """
+    seen = set()
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        default_id = f"line-{number}"
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield {'id': default_id, 'question': None, 'error': f"invalid JSON: {e}"}
+            continue
+        if isinstance(record, str):
+            record = {'question': record}
+        if not isinstance(record, dict):
+            yield {'id': default_id, 'question': None, 'error': "expected a JSON object or string"}
+            continue
+        record.setdefault('id', default_id)
+        if not isinstance(record.get('question'), str) or not record['question'].strip():
+            record['error'] = "missing question"
+            record.setdefault('question', None)
+        try:
+            duplicate = record['id'] in seen
+            seen.add(record['id'])
+        except TypeError:
+            record['error'] = "id must be a string or number"
+            record['id'] = default_id
+        else:
+            if duplicate:
+                record['error'] = f"duplicate id {record['id']!r}"
+        yield record
+
+
+def read_checkpoint(path):
+    if not os.path.exists(path):
+        return {'done': 0, 'offset': 0}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_checkpoint(path, done, offset):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'done': done, 'offset': offset}, f)
+    os.replace(tmp_path, path)
+
+
+def run_batch(querier, records, output, top_k=2, workers=BATCH_WORKERS, chunk_size=BATCH_CHUNK_SIZE,
+              checkpoint_path=None, skip=0):
+    """
+    Search many questions concurrently and write one JSON line per question
+    in input order
+    Args:
+        querier: CourseQuery
+        records: dicts from read_batch_questions
+        output: writable text file
+        top_k: results per question unless a record sets its own
+        workers: searches run at once
+        chunk_size: questions embedded together and checkpointed together
+        checkpoint_path: file recording how many questions are written
+        skip: questions already written by an interrupted run
+    Returns:
+        Summary dict with counts, throughput and latency percentiles
+    """
+    latencies = []
+    done = skip
+    errors = 0
+    start = time.perf_counter()
+
+    def search(record):
+        query_start = time.perf_counter()
+        line = {'id': record['id'], 'question': record['question']}
+        if 'error' in record:
+            line['error'] = record['error']
+            return line
+        try:
+            line['results'] = querier.search_courses(
+                record['question'], top_k=record.get('top_k', top_k), filters=record.get('filters'),
+                completed=record.get('completed')
+            )
+        except Exception as e:
+            line['error'] = f"{type(e).__name__}: {e}"
+        line['latency_ms'] = round((time.perf_counter() - query_start) * 1000.0, 3)
+        return line
+
+    def chunks():
+        chunk = []
+        for i, record in enumerate(records):
+            if i < skip:
+                continue
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in chunks():
+            # One bulk embedding call per batch instead of one request per question
+            valid = [record['question'] for record in chunk if 'error' not in record]
+            if valid:
+                querier.embed_questions(valid)
+            for line in pool.map(search, chunk):
+                output.write(json.dumps(line, ensure_ascii=False) + '\n')
+                # Records rejected on input were never searched, so they have no latency
+                if 'latency_ms' in line:
+                    latencies.append(line['latency_ms'])
+                errors += 'error' in line
+            output.flush()
+            done += len(chunk)
+            if checkpoint_path:
+                write_checkpoint(checkpoint_path, done, output.tell())
+            print(
+                f"Processed {done} questions: {done - skip - errors} answered, {errors} failed",
+                file=sys.stderr
+            )
+
+    elapsed = time.perf_counter() - start
+    searched = len(latencies)
+    summary = {
+        'questions': searched,
+        'skipped': skip,
+        'answered': done - skip - errors,
+        'errors': errors,
+        'workers': workers,
+        'seconds': elapsed,
+        'questions_per_second': searched / elapsed if elapsed > 0 else 0.0,
+    }
+    if latencies:
+        summary.update({
+            f'p{q}_ms': float(value)
+            for q, value in zip((50, 95, 99), np.percentile(latencies, (50, 95, 99)))
+        })
+    return summary
+
+
+def batch_main(args):
+    """Run batch mode from parsed command-line arguments"""
+    querier = CourseQuery(max_pool_size=max(NEO4J_MAX_POOL_SIZE, args.workers))
+    checkpoint_path = None if args.output == '-' else (args.checkpoint or f"{args.output}.checkpoint")
+    skip = 0
+    if args.output == '-':
+        output = sys.stdout
+    elif args.resume and checkpoint_path and os.path.exists(checkpoint_path):
+        checkpoint = read_checkpoint(checkpoint_path)
+        skip = checkpoint['done']
+        output = open(args.output, 'r+', encoding='utf-8')
+        # Drop anything written after the last checkpoint
+        output.truncate(checkpoint['offset'])
+        output.seek(checkpoint['offset'])
+        print(f"Resuming after {skip} questions", file=sys.stderr)
+    else:
+        output = open(args.output, 'w', encoding='utf-8')
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    try:
+        summary = run_batch(
+            querier, read_batch_questions(source), output, top_k=args.top_k, workers=args.workers,
+            chunk_size=args.chunk_size, checkpoint_path=checkpoint_path, skip=skip
+        )
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    return summary
+
+
+def interactive_main():
     querier = CourseQuery()
     while True:
         question = input("\nEnter your question (or 'quit' to exit): ")
@@ -73,5 +832,24 @@ def main():
         results = querier.search_courses(question, top_k=num_results)
         querier.display_results(results)
 
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search UBC courses")
+    subparsers = parser.add_subparsers(dest='command')
+    batch_parser = subparsers.add_parser('batch', help="answer questions from a JSONL file")
+    batch_parser.add_argument('--input', default='-', help="JSONL questions, or - for stdin")
+    batch_parser.add_argument('--output', default='-', help="JSONL results, or - for stdout")
+    batch_parser.add_argument('--top-k', type=int, default=2)
+    batch_parser.add_argument('--workers', type=int, default=BATCH_WORKERS, help="concurrent searches")
+    batch_parser.add_argument('--chunk-size', type=int, default=BATCH_CHUNK_SIZE, help="questions per checkpoint")
+    batch_parser.add_argument('--checkpoint', help="checkpoint file (default: <output>.checkpoint)")
+    batch_parser.add_argument('--resume', action='store_true', help="continue after the last checkpoint")
+    args = parser.parse_args(argv)
+
+    if args.command == 'batch':
+        batch_main(args)
+    else:
+        interactive_main()
+
 if __name__ == "__main__":
     main()
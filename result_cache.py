@@ -0,0 +1,234 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from attribute_index import normalize_value
+from query_cache import LRUCache, normalize_query
+
+# In-process result cache size (0 disables it), optional SQLite file shared by
+# every app process on the host, and how often the dataset stamp is re-read
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', 5000))
+RESULT_CACHE_PATH = os.getenv('RESULT_CACHE_PATH')
+RESULT_CACHE_SHARED_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_SHARED_MAX_ENTRIES', 100000))
+DATASET_STAMP_TTL = float(os.getenv('DATASET_STAMP_TTL', 30))
+
+# The dataset version is a single node whose stamp changes after every ingest
+read_dataset_stamp_query = """
+MATCH (version:DatasetVersion {name: 'courses'})
+RETURN version.stamp AS stamp
+"""
+
+write_dataset_stamp_query = """
+MERGE (version:DatasetVersion {name: 'courses'})
+SET version.stamp = $stamp,
+    version.updatedAt = timestamp()
+RETURN version.stamp AS stamp
+"""
+
+
+def new_dataset_stamp():
+    """Unique stamp for a freshly ingested dataset"""
+    return f"{int(time.time())}-{uuid.uuid4().hex[:12]}"
+
+
+def read_dataset_stamp(kg):
+    """Current dataset stamp in the graph, or None if no ingest has written one"""
+    rows = kg.query(read_dataset_stamp_query)
+    return rows[0]['stamp'] if rows else None
+
+
+def write_dataset_stamp(kg, stamp=None):
+    """Record a new dataset stamp, invalidating every cached search result"""
+    stamp = stamp or new_dataset_stamp()
+    kg.query(write_dataset_stamp_query, params={'stamp': stamp})
+    return stamp
+
+
+def result_cache_key(question, top_k, filters, mode):
+    """
+    Cache key shared by equivalent searches: the normalized question, and the
+    filters with values normalized and sorted so their order does not matter
+    """
+    canonical_filters = {}
+    for name, accepted in sorted((filters or {}).items()):
+        if accepted is None:
+            continue
+        if not isinstance(accepted, (list, tuple, set)):
+            accepted = [accepted]
+        if not accepted:
+            continue
+        values = {normalize_value(value) for value in accepted}
+        canonical_filters[name] = sorted(values, key=lambda value: (str(type(value)), value))
+    return json.dumps(
+        [normalize_query(question), int(top_k), mode, canonical_filters],
+        separators=(',', ':'), sort_keys=True
+    )
+
+
+class SQLiteResultStore:
+    """
+    Search results stored as JSON in SQLite so several processes on one host
+    share them. Rows are keyed by (dataset stamp, cache key). The store records
+    when each stamp was first seen, rows for stamps older than the newest are
+    deleted, and the least recently used rows are dropped beyond max_entries.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=RESULT_CACHE_SHARED_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                stamp TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (stamp, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)")
+        # Stamps are kept after expiry so a worker still on an old stamp can
+        # never make it look newer than the one that replaced it
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS stamps (
+                stamp TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get(self, stamp, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM results WHERE stamp = ? AND key = ?", (stamp or '', key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute(
+                "UPDATE results SET last_used = ? WHERE stamp = ? AND key = ?",
+                (time.time(), stamp or '', key)
+            )
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, stamp, key, results):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (stamp, key, payload, last_used) VALUES (?, ?, ?, ?)",
+                (stamp or '', key, json.dumps(results, separators=(',', ':')), time.time())
+            )
+            excess = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM results WHERE rowid IN "
+                    "(SELECT rowid FROM results ORDER BY last_used LIMIT ?)",
+                    (excess,)
+                )
+                self.evictions += excess
+            self._conn.commit()
+
+    def expire_old_stamps(self, stamp):
+        """
+        Record the dataset stamp and delete results cached for stamps seen
+        before the newest one. Rows of the newest stamp are never touched, so
+        workers on either side of a sync do not wipe each other's results.
+        """
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO stamps (stamp, first_seen) VALUES (?, ?)",
+                (stamp or '', time.time())
+            )
+            removed = self._conn.execute(
+                "DELETE FROM results WHERE stamp NOT IN "
+                "(SELECT stamp FROM stamps WHERE first_seen = (SELECT MAX(first_seen) FROM stamps))"
+            ).rowcount
+            self._conn.commit()
+        return removed
+
+    def stats(self):
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'size': size,
+                'max_entries': self.max_entries,
+                'path': self.path,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResultCache:
+    """
+    Search results keyed by result_cache_key and tagged with the dataset
+    stamp they were computed against. An in-process LRU answers first, then
+    the optional shared SQLite store. Seeing a new stamp clears the LRU and
+    expires older stamps from the store, so results never outlive the data
+    they came from.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, shared_path=RESULT_CACHE_PATH):
+        self.memory = LRUCache(max_entries=max_entries)
+        self.shared = SQLiteResultStore(shared_path) if shared_path else None
+        self.stamp = None
+        self.invalidations = 0
+        self._lock = threading.Lock()
+
+    def _check_stamp(self, stamp):
+        if stamp == self.stamp:
+            return
+        with self._lock:
+            if stamp == self.stamp:
+                return
+            self.memory.clear()
+            if self.shared is not None:
+                self.shared.expire_old_stamps(stamp)
+            self.stamp = stamp
+            self.invalidations += 1
+
+    def get(self, key, stamp):
+        """Cached results for the key under this dataset stamp, or None"""
+        self._check_stamp(stamp)
+        results = self.memory.get(key)
+        if results is None and self.shared is not None:
+            results = self.shared.get(stamp, key)
+            if results is not None:
+                self.memory.put(key, results)
+        # Copies, so callers can annotate results without touching the cache
+        return None if results is None else [dict(result) for result in results]
+
+    def put(self, key, stamp, results):
+        self._check_stamp(stamp)
+        results = [dict(result) for result in results]
+        self.memory.put(key, results)
+        if self.shared is not None:
+            self.shared.put(stamp, key, results)
+
+    def stats(self):
+        stats = {
+            'stamp': self.stamp,
+            'invalidations': self.invalidations,
+            'memory': self.memory.stats(),
+        }
+        if self.shared is not None:
+            stats['shared'] = self.shared.stats()
+        return stats
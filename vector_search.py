@@ -0,0 +1,86 @@
+import numpy as np
+
+# Rows converted to float32 at a time when scoring a float16 matrix
+SCORE_CHUNK_ROWS = 65536
+
+
+def normalize_rows(matrix):
+    """Scale each row to unit length so a dot product equals cosine similarity"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores, top_k):
+    """Indices of the top_k highest scores, best first"""
+    top_k = min(top_k, scores.shape[-1])
+    if top_k <= 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+    candidates = np.argpartition(-scores, top_k - 1, axis=-1)[..., :top_k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=-1), axis=-1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=-1)
+
+
+class VectorIndex:
+    """
+    Exact cosine search over the catalog embeddings held in memory.
+    Scores use the same (1 + cosine) / 2 scale as the Neo4j vector index so
+    results are interchangeable with the Neo4j backend.
+    """
+
+    def __init__(self, catalog, normalized=False):
+        self.catalog = catalog
+        self.matrix = catalog.embeddings if normalized else normalize_rows(catalog.embeddings)
+
+    def __len__(self):
+        return len(self.catalog)
+
+    def _scores(self, queries, rows=None):
+        """
+        Cosine similarity of each unit-length query row against every course,
+        or only against the catalog rows listed in `rows`
+        """
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype == np.float32:
+            return queries @ matrix.T
+        # Half-precision snapshots are upcast in bounded chunks, not all at once
+        scores = np.empty((queries.shape[0], matrix.shape[0]), dtype=np.float32)
+        for start in range(0, matrix.shape[0], SCORE_CHUNK_ROWS):
+            block = np.asarray(matrix[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores[:, start:start + SCORE_CHUNK_ROWS] = queries @ block.T
+        return scores
+
+    def _results(self, scores, indices, rows=None):
+        results = []
+        for i in indices:
+            result = {'score': float((1.0 + scores[i]) / 2.0)}
+            result.update(self.catalog.record(int(i if rows is None else rows[i])))
+            results.append(result)
+        return results
+
+    def search(self, query_vector, top_k=2, mask=None):
+        """
+        Find the catalog courses closest to one query embedding
+        Args:
+            query_vector: embedding of the search query
+            top_k: number of results to return
+            mask: optional boolean array of catalog rows eligible for scoring
+        Returns:
+            List of dicts with score, courseCode, name and description
+        """
+        rows = None if mask is None else np.flatnonzero(mask)
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32)[None, :])
+        scores = self._scores(query, rows)[0]
+        return self._results(scores, top_k_indices(scores, top_k), rows)
+
+    def search_batch(self, query_vectors, top_k=2, mask=None):
+        """Search several query embeddings at once with one matrix-matrix product"""
+        rows = None if mask is None else np.flatnonzero(mask)
+        queries = normalize_rows(np.asarray(query_vectors, dtype=np.float32))
+        scores = self._scores(queries, rows)
+        indices = top_k_indices(scores, top_k)
+        return [
+            self._results(row_scores, row_indices, rows)
+            for row_scores, row_indices in zip(scores, indices)
+        ]